@@ -0,0 +1,15 @@
+"""Shared FastAPI dependencies"""
+
+from app.repositories import get_storage
+from app.repositories.base import Storage
+from app.services.analytics_service import AnalyticsService, analytics_service
+
+
+def get_repositories() -> Storage:
+    """Repositories of the storage backend opened in the lifespan"""
+    return get_storage()
+
+
+def get_analytics() -> AnalyticsService:
+    """The shared analytics service"""
+    return analytics_service
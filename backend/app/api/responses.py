@@ -0,0 +1,26 @@
+"""Response classes shared by the API routes"""
+
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class DocumentResponse(ORJSONResponse):
+    """
+    JSON response for MongoDB documents returned as they are read
+
+    Encodes ObjectIds as strings and datetimes and enums natively with
+    orjson, in one pass. Routes returning it skip response_model
+    validation, so their documents must already have the response shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
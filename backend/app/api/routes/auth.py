@@ -1,8 +1,10 @@
 """Authentication routes"""
 
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import bearer_scheme, hash_password, verify_password, create_access_token, revoke_token
 
 router = APIRouter()
 
@@ -32,6 +34,8 @@ async def register(email: EmailStr, password: str):
     )
 
 @router.post("/logout")
-async def logout():
-    """User logout endpoint"""
+async def logout(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    """User logout endpoint; the bearer token is revoked"""
+    if credentials:
+        revoke_token(credentials.credentials)
     return {"message": "Logged out successfully"}
\ No newline at end of file
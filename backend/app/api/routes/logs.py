@@ -1,15 +1,23 @@
 """Logs and analytics routes"""
 
 from fastapi import APIRouter, Query, HTTPException, Depends
-from typing import Optional
+from typing import List, Optional, Tuple, Type
 from datetime import datetime
+from pydantic import BaseModel
+from app.api.deps import get_analytics
+from app.api.responses import DocumentResponse
 from app.services.analytics_service import AnalyticsService
+from app.services.local_time import UnknownTimezoneError
+from app.services.log_cursor import InvalidCursorError
 from app.models.schemas import (
     DashboardStatsSchema,
     PaginatedLogsSchema,
+    PaginatedDMLogsSchema,
     CommentLogSchema,
     DMLogSchema,
-    PaginationSchema
+    PaginationSchema,
+    TimezoneSchema,
+    WeeklyActivitySchema
 )
 from app.core.security import get_current_user
 
@@ -17,7 +25,10 @@ router = APIRouter()
 
 
 @router.get("/stats", response_model=DashboardStatsSchema)
-async def get_statistics(current_user: str = Depends(get_current_user)):
+async def get_statistics(
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
+):
     """
     Get comprehensive dashboard statistics
     
@@ -28,120 +39,167 @@ async def get_statistics(current_user: str = Depends(get_current_user)):
     - engagement_rate: Overall engagement rate
     - today_comments: Comments processed today
     - today_dms_sent: DMs sent today
-    - response_time_avg: Average response time in seconds
+    - response_time_avg: Average response time in seconds (last 7 days)
+    - response_time_p50/p95/p99: Response time percentiles in seconds
     - success_rate: Success rate percentage
     - failed_actions: Total failed actions
     - weekly_activity: Weekly activity data for charts
     - today_date: Today's date (YYYY-MM-DD)
     """
     try:
-        analytics = AnalyticsService()
         stats = await analytics.get_dashboard_stats(current_user)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch statistics: {str(e)}")
 
 
+@router.get("/activity", response_model=WeeklyActivitySchema)
+async def get_activity(
+    days: int = Query(7, ge=1, le=90),
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
+):
+    """
+    Get per-day activity data for charts
+    
+    Parameters:
+    - days: Number of days to include (default: 7, max: 90)
+    
+    Returns one data point per day (in the user's timezone) with sent
+    comments, sent DMs and failures
+    """
+    try:
+        return await analytics.get_activity(current_user, days=days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch activity: {str(e)}")
+
+
+def _display_fields(schema: Type[BaseModel]) -> Tuple[str, ...]:
+    """Document fields shown for a log schema"""
+    return tuple(field.alias or name for name, field in schema.model_fields.items())
+
+
+COMMENT_LOG_FIELDS = _display_fields(CommentLogSchema)
+DM_LOG_FIELDS = _display_fields(DMLogSchema)
+
+
+def _projection(displayed: Tuple[str, ...], fields: Optional[str]) -> List[str]:
+    """
+    Fields to read for a page of logs: the displayed ones, or the
+    comma-separated subset requested with fields=
+    """
+    if not fields:
+        return list(displayed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in displayed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _paginated(logs, total, next_cursor, page, limit):
+    """
+    Build a paginated logs response from one page of logs
+    The logs are projected to their displayed fields, so they are encoded
+    as read instead of being validated against the schema; the schema's
+    Projected* items leave every field but timestamp optional to match
+    """
+    return DocumentResponse({
+        "data": logs,
+        "pagination": {
+            "total": total,
+            "page": page,
+            "page_size": limit,
+            "has_next": next_cursor is not None,
+            "has_previous": page > 1,
+            "total_pages": (total + limit - 1) // limit if total is not None else None,
+            "next_cursor": next_cursor
+        }
+    })
+
+
 @router.get("/comments", response_model=PaginatedLogsSchema)
 async def get_comment_logs(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     days: int = Query(7, ge=1, le=90),
-    current_user: str = Depends(get_current_user)
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    fields: Optional[str] = Query(None),
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
 ):
     """
     Get paginated comment activity logs
     
     Parameters:
-    - skip: Number of records to skip (default: 0)
+    - skip: Number of records to skip (default: 0); prefer cursor
     - limit: Number of records to return (default: 20, max: 100)
     - days: Filter logs from last N days (default: 7)
+    - cursor: next_cursor of the previous page
+    - include_total: Also count all matching logs (default: false)
+    - fields: Comma-separated fields to return, e.g. username,comment_text
+      (default: all); _id and timestamp are always returned
     
     Returns paginated comment logs with timestamps and details
     """
+    projection = _projection(COMMENT_LOG_FIELDS, fields)
     try:
-        analytics = AnalyticsService()
-        logs, total = await analytics.get_comment_logs(
+        logs, total, next_cursor, page = await analytics.get_comment_logs(
             user_id=current_user,
             skip=skip,
             limit=limit,
-            days=days
+            days=days,
+            cursor=cursor,
+            include_total=include_total,
+            fields=projection
         )
-
-        # Convert ObjectId to string for response
-        for log in logs:
-            if "_id" in log:
-                log["_id"] = str(log["_id"])
-
-        # Calculate pagination info
-        total_pages = (total + limit - 1) // limit
-        current_page = (skip // limit) + 1
-        has_next = current_page < total_pages
-        has_previous = current_page > 1
-
-        return {
-            "data": logs,
-            "pagination": {
-                "total": total,
-                "page": current_page,
-                "page_size": limit,
-                "has_next": has_next,
-                "has_previous": has_previous,
-                "total_pages": total_pages
-            }
-        }
+        return _paginated(logs, total, next_cursor, page, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch comment logs: {str(e)}")
 
 
-@router.get("/dms", response_model=PaginatedLogsSchema)
+@router.get("/dms", response_model=PaginatedDMLogsSchema)
 async def get_dm_logs(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     days: int = Query(7, ge=1, le=90),
-    current_user: str = Depends(get_current_user)
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    fields: Optional[str] = Query(None),
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
 ):
     """
     Get paginated DM activity logs
     
     Parameters:
-    - skip: Number of records to skip (default: 0)
+    - skip: Number of records to skip (default: 0); prefer cursor
     - limit: Number of records to return (default: 20, max: 100)
     - days: Filter logs from last N days (default: 7)
+    - cursor: next_cursor of the previous page
+    - include_total: Also count all matching logs (default: false)
+    - fields: Comma-separated fields to return, e.g. recipient_username,status
+      (default: all); _id and timestamp are always returned
     
     Returns paginated DM logs with automation mode and status
     """
+    projection = _projection(DM_LOG_FIELDS, fields)
     try:
-        analytics = AnalyticsService()
-        logs, total = await analytics.get_dm_logs(
+        logs, total, next_cursor, page = await analytics.get_dm_logs(
             user_id=current_user,
             skip=skip,
             limit=limit,
-            days=days
+            days=days,
+            cursor=cursor,
+            include_total=include_total,
+            fields=projection
         )
-
-        # Convert ObjectId to string for response
-        for log in logs:
-            if "_id" in log:
-                log["_id"] = str(log["_id"])
-
-        # Calculate pagination info
-        total_pages = (total + limit - 1) // limit
-        current_page = (skip // limit) + 1
-        has_next = current_page < total_pages
-        has_previous = current_page > 1
-
-        return {
-            "data": logs,
-            "pagination": {
-                "total": total,
-                "page": current_page,
-                "page_size": limit,
-                "has_next": has_next,
-                "has_previous": has_previous,
-                "total_pages": total_pages
-            }
-        }
+        return _paginated(logs, total, next_cursor, page, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch DM logs: {str(e)}")
 
@@ -149,13 +207,15 @@ async def get_dm_logs(
 @router.get("/activity-summary")
 async def get_activity_summary(
     days: int = Query(7, ge=1, le=90),
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
 ):
     """
     Get activity summary for specified number of days
+    Computed from the daily rollups, so totals are exact at any volume
     
     Parameters:
-    - days: Number of days to include (default: 7)
+    - days: Number of days to include, today included (default: 7, max: 90)
     
     Returns:
     - total_comments: Total comments in period
@@ -166,44 +226,47 @@ async def get_activity_summary(
     - avg_daily_dms: Average DMs per day
     """
     try:
-        analytics = AnalyticsService()
-        logs, _ = await analytics.get_comment_logs(
-            user_id=current_user,
-            skip=0,
-            limit=1000,
-            days=days
-        )
-        dm_logs, _ = await analytics.get_dm_logs(
-            user_id=current_user,
-            skip=0,
-            limit=1000,
-            days=days
-        )
-
-        from app.models.models import StatusEnum
-        
-        total_comments = len([l for l in logs if l["status"] == StatusEnum.SENT])
-        total_dms = len([l for l in dm_logs if l["status"] == StatusEnum.SENT])
-        failed_comments = len([l for l in logs if l["status"] == StatusEnum.FAILED])
-        failed_dms = len([l for l in dm_logs if l["status"] == StatusEnum.FAILED])
-
-        total_actions = total_comments + total_dms + failed_comments + failed_dms
-        success_count = total_comments + total_dms
-        success_rate = (success_count / total_actions * 100) if total_actions > 0 else 0
-
-        return {
-            "total_comments": total_comments,
-            "total_dms": total_dms,
-            "success_rate": round(success_rate, 2),
-            "failed_count": failed_comments + failed_dms,
-            "avg_daily_comments": round(total_comments / days, 2),
-            "avg_daily_dms": round(total_dms / days, 2),
-            "days": days
-        }
+        return await analytics.get_activity_summary(current_user, days=days)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch activity summary: {str(e)}")
 
 
+@router.get("/timezone", response_model=TimezoneSchema)
+async def get_timezone(
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
+):
+    """
+    Get the timezone used for "today" and the per-day charts
+    Defaults to the server's TIMEZONE setting
+    """
+    try:
+        tz = await analytics.get_user_timezone(current_user)
+        return {"timezone": tz.key}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch timezone: {str(e)}")
+
+
+@router.put("/timezone", response_model=TimezoneSchema)
+async def set_timezone(
+    body: TimezoneSchema,
+    current_user: str = Depends(get_current_user),
+    analytics: AnalyticsService = Depends(get_analytics)
+):
+    """
+    Set the timezone used for "today" and the per-day charts
+    
+    Parameters:
+    - timezone: IANA timezone name, e.g. Asia/Kolkata
+    """
+    try:
+        return {"timezone": await analytics.set_user_timezone(current_user, body.timezone)}
+    except UnknownTimezoneError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to set timezone: {str(e)}")
+
+
 @router.get("/health")
 async def health_check():
     """
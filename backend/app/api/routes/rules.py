@@ -1,8 +1,15 @@
 """Rules management routes"""
 
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from bson import ObjectId
+from app.core.security import get_current_user
+from app.api.deps import get_repositories
+from app.repositories.base import Storage
+from app.services.rule_cache import rule_cache
+from app.services.stats_cache import stats_cache
 
 router = APIRouter()
 
@@ -20,29 +27,66 @@ class Rule(BaseModel):
     comment_reply: str
     toggle: RuleToggle
     is_active: bool = True
+    priority: int = 0           # higher wins when several rules match
     created_at: Optional[str] = None
 
+def _rule_id(rule_id: str) -> ObjectId:
+    """Parse a rule id; a malformed one cannot name an existing rule"""
+    if not ObjectId.is_valid(rule_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+    return ObjectId(rule_id)
+
+def _serialize_rule(doc: Dict) -> Dict:
+    """Convert a rule document to the API shape"""
+    doc["id"] = str(doc.pop("_id"))
+    for field in ("created_at", "updated_at"):
+        if isinstance(doc.get(field), datetime):
+            doc[field] = doc[field].isoformat()
+    return doc
+
 @router.get("/")
-async def get_rules():
+async def get_rules(current_user: str = Depends(get_current_user), repos: Storage = Depends(get_repositories)):
     """Get all rules"""
-    return {"rules": [], "message": "Endpoint not yet implemented"}
+    rules = await repos.rules.list(current_user)
+    return {"rules": [_serialize_rule(r) for r in rules]}
 
 @router.post("/")
-async def create_rule(rule: Rule):
+async def create_rule(rule: Rule, current_user: str = Depends(get_current_user), repos: Storage = Depends(get_repositories)):
     """Create new rule"""
-    return {"message": "Rule creation not yet implemented"}
+    now = datetime.utcnow()
+    doc = rule.model_dump(exclude={"id", "created_at"})
+    doc.update({"user_id": current_user, "created_at": now, "updated_at": now})
+
+    rule_id = await repos.rules.create(doc)
+    rule_cache.invalidate(current_user)
+    stats_cache.invalidate(current_user)
+    return {"id": str(rule_id), "message": "Rule created successfully"}
 
 @router.get("/{rule_id}")
-async def get_rule(rule_id: str):
+async def get_rule(rule_id: str, current_user: str = Depends(get_current_user), repos: Storage = Depends(get_repositories)):
     """Get specific rule"""
-    return {"message": "Get rule endpoint not yet implemented"}
+    rule = await repos.rules.get(current_user, _rule_id(rule_id))
+    if rule is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+    return _serialize_rule(rule)
 
 @router.put("/{rule_id}")
-async def update_rule(rule_id: str, rule: Rule):
+async def update_rule(rule_id: str, rule: Rule, current_user: str = Depends(get_current_user), repos: Storage = Depends(get_repositories)):
     """Update rule including toggles"""
-    return {"message": "Rule update endpoint not yet implemented"}
+    changes = rule.model_dump(exclude={"id", "created_at"})
+    changes["updated_at"] = datetime.utcnow()
+
+    if not await repos.rules.update(current_user, _rule_id(rule_id), changes):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+    rule_cache.invalidate(current_user)
+    stats_cache.invalidate(current_user)
+    return {"id": rule_id, "message": "Rule updated successfully"}
 
 @router.delete("/{rule_id}")
-async def delete_rule(rule_id: str):
+async def delete_rule(rule_id: str, current_user: str = Depends(get_current_user), repos: Storage = Depends(get_repositories)):
     """Delete rule"""
-    return {"message": "Rule deletion not yet implemented"}
\ No newline at end of file
+    if not await repos.rules.delete(current_user, _rule_id(rule_id)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+    rule_cache.invalidate(current_user)
+    stats_cache.invalidate(current_user)
+    return {"message": "Rule deleted successfully"}
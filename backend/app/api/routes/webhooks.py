@@ -1,7 +1,15 @@
 """Webhook routes for Instagram events"""
 
+import time
 from fastapi import APIRouter, Request, HTTPException
 from app.core.config import settings
+from app.core.security import is_account_id
+from app.services.event_dedup import recent_events
+from app.services.log_buffer import log_buffer
+from app.services.stats_cache import stats_cache
+from app.services.retry_queue import retry_queue
+from app.services.send_scheduler import send_scheduler
+from app.services.webhook_queue import webhook_queue
 
 router = APIRouter()
 
@@ -14,7 +22,7 @@ async def verify_webhook(request: Request):
     mode = request.query_params.get("hub.mode")
     verify_token = request.query_params.get("hub.verify_token")
     challenge = request.query_params.get("hub.challenge")
-    
+
     if mode == "subscribe" and verify_token == settings.INSTAGRAM_WEBHOOK_VERIFY_TOKEN:
         return int(challenge)
     else:
@@ -24,21 +32,74 @@ async def verify_webhook(request: Request):
 async def handle_webhook(request: Request):
     """
     Handle Instagram webhook events
+
+    Events are validated and queued for the worker pool; the request is
+    acknowledged before any processing happens. Returns 503 with
+    Retry-After when the queue is full so Meta redelivers later.
     """
-    data = await request.json()
-    
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    if not isinstance(data, dict) or not isinstance(data.get("entry", []), list):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+
+    received_at = time.time()
+    events = []
     for entry in data.get("entry", []):
-        for change in entry.get("changes", []):
-            value = change["value"]
-            
-            # Check if this is a comment event
-            if value.get("item") == "comment":
-                # TODO: Process comment with toggle logic
-                print(f"📝 Comment received: {value.get('comment_text')}")
-            
-            # Check if this is a DM event
-            elif value.get("item") == "message":
-                # TODO: Process DM
-                print(f"💬 DM received from {value.get('from', {}).get('username')}")
-    
-    return {"status": "ok"}
\ No newline at end of file
+        # The entry id is the account whose rules apply, see is_account_id
+        if not isinstance(entry, dict) or not is_account_id(entry.get("id")):
+            raise HTTPException(status_code=400, detail="Invalid webhook entry")
+        changes = entry.get("changes", [])
+        if not isinstance(changes, list):
+            raise HTTPException(status_code=400, detail="Invalid webhook changes")
+        for change in changes:
+            if not isinstance(change, dict) or not isinstance(change.get("value"), dict):
+                raise HTTPException(status_code=400, detail="Invalid webhook change")
+            events.append({
+                "object": data.get("object"),
+                "account_id": entry.get("id"),
+                "field": change.get("field"),
+                "value": change["value"],
+                "received_at": received_at
+            })
+
+    if events and not webhook_queue.enqueue_many(events):
+        raise HTTPException(
+            status_code=503,
+            detail="Webhook queue is full",
+            headers={"Retry-After": str(settings.WEBHOOK_RETRY_AFTER_SECONDS)}
+        )
+
+    return {"status": "ok", "queued": len(events)}
+
+@router.get("/stats")
+async def get_queue_stats():
+    """
+    Webhook queue depth, lag and worker counters for monitoring
+    """
+    return {
+        **webhook_queue.stats(),
+        "dedup_cache_size": len(recent_events),
+        "duplicates_dropped": recent_events.duplicates,
+        "log_buffer": log_buffer.stats(),
+        "stats_cache": stats_cache.stats()
+    }
+
+
+@router.get("/send-stats")
+async def get_send_stats():
+    """
+    Per-account send queue lengths and wait times
+    Shows which accounts are saturating the send budget
+    """
+    return send_scheduler.stats()
+
+
+@router.get("/retry-stats")
+async def get_retry_stats():
+    """
+    Number of queued, leased and dead-lettered retry jobs
+    """
+    return await retry_queue.stats()
@@ -16,8 +16,18 @@ class Settings(BaseSettings):
     SERVER_PORT: int = int(os.getenv("SERVER_PORT", 8000))
     
     # Database
+    # "mongo", or "memory" to run without a database (profiling, benchmarks)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "mongo")
     MONGODB_URI: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME", "instagram_automation")
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", 10))
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 300000))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 5000))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 30000))
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib")
     
     # Instagram API
     INSTAGRAM_BUSINESS_ACCOUNT_ID: str = os.getenv("INSTAGRAM_BUSINESS_ACCOUNT_ID", "")
@@ -26,10 +36,50 @@ class Settings(BaseSettings):
     INSTAGRAM_APP_SECRET: str = os.getenv("INSTAGRAM_APP_SECRET", "")
     INSTAGRAM_WEBHOOK_VERIFY_TOKEN: str = os.getenv("INSTAGRAM_WEBHOOK_VERIFY_TOKEN", "")
     
+    # Graph API client
+    GRAPH_API_BASE_URL: str = os.getenv("GRAPH_API_BASE_URL", "https://graph.facebook.com")
+    GRAPH_API_VERSION: str = os.getenv("GRAPH_API_VERSION", "v19.0")
+    GRAPH_API_CALLS_PER_HOUR: int = int(os.getenv("GRAPH_API_CALLS_PER_HOUR", 200))
+    GRAPH_API_BURST: int = int(os.getenv("GRAPH_API_BURST", 20))
+    GRAPH_API_TIMEOUT: float = float(os.getenv("GRAPH_API_TIMEOUT", 10))
+    GRAPH_API_MAX_CONNECTIONS: int = int(os.getenv("GRAPH_API_MAX_CONNECTIONS", 100))
+    
+    # Send scheduler
+    SEND_WORKERS: int = int(os.getenv("SEND_WORKERS", 16))
+    SEND_BATCH_SIZE: int = int(os.getenv("SEND_BATCH_SIZE", 10))
+    SEND_MAX_INFLIGHT_PER_ACCOUNT: int = int(os.getenv("SEND_MAX_INFLIGHT_PER_ACCOUNT", 2))
+    
+    # Retry queue
+    RETRY_MAX_ATTEMPTS: int = int(os.getenv("RETRY_MAX_ATTEMPTS", 6))
+    RETRY_BASE_DELAY_SECONDS: float = float(os.getenv("RETRY_BASE_DELAY_SECONDS", 5))
+    RETRY_MAX_DELAY_SECONDS: float = float(os.getenv("RETRY_MAX_DELAY_SECONDS", 900))
+    RETRY_VISIBILITY_TIMEOUT_SECONDS: float = float(os.getenv("RETRY_VISIBILITY_TIMEOUT_SECONDS", 120))
+    RETRY_POLL_INTERVAL_SECONDS: float = float(os.getenv("RETRY_POLL_INTERVAL_SECONDS", 2))
+    RETRY_LEASE_BATCH: int = int(os.getenv("RETRY_LEASE_BATCH", 50))
+    # Days a job that ran out of attempts is kept for inspection
+    RETRY_DEAD_TTL_DAYS: int = int(os.getenv("RETRY_DEAD_TTL_DAYS", 14))
+    
+    # Log write buffer
+    LOG_BUFFER_MAX_BATCH: int = int(os.getenv("LOG_BUFFER_MAX_BATCH", 500))
+    LOG_BUFFER_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("LOG_BUFFER_FLUSH_INTERVAL_SECONDS", 1))
+    LOG_BUFFER_MAX_ATTEMPTS: int = int(os.getenv("LOG_BUFFER_MAX_ATTEMPTS", 5))
+    LOG_BUFFER_RETRY_MAX_DELAY_SECONDS: float = float(os.getenv("LOG_BUFFER_RETRY_MAX_DELAY_SECONDS", 30))
+    LOG_BUFFER_SPILL_DIR: str = os.getenv("LOG_BUFFER_SPILL_DIR", "spill")
+    
+    # Daily rollups
+    DAILY_STATS_RECONCILE_HOUR_UTC: int = int(os.getenv("DAILY_STATS_RECONCILE_HOUR_UTC", 0))
+    
+    # Log retention
+    LOG_RETENTION_DAYS: int = int(os.getenv("LOG_RETENTION_DAYS", 120))
+    LOG_ARCHIVE_DIR: str = os.getenv("LOG_ARCHIVE_DIR", "archive")
+    LOG_ARCHIVE_BATCH_SIZE: int = int(os.getenv("LOG_ARCHIVE_BATCH_SIZE", 1000))
+    LOG_RETENTION_HOUR_UTC: int = int(os.getenv("LOG_RETENTION_HOUR_UTC", 1))
+    
     # JWT
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    JWT_CACHE_SIZE: int = int(os.getenv("JWT_CACHE_SIZE", 10000))
     
     # CORS
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -45,6 +95,23 @@ class Settings(BaseSettings):
     # Timezone
     TIMEZONE: str = os.getenv("TIMEZONE", "Asia/Kolkata")
     
+    # Webhook processing
+    WEBHOOK_QUEUE_MAXSIZE: int = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", 10000))
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", 8))
+    WEBHOOK_RETRY_AFTER_SECONDS: int = int(os.getenv("WEBHOOK_RETRY_AFTER_SECONDS", 5))
+    WEBHOOK_SHUTDOWN_TIMEOUT: float = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", 10))
+    WEBHOOK_DEDUP_CACHE_SIZE: int = int(os.getenv("WEBHOOK_DEDUP_CACHE_SIZE", 100000))
+    
+    # Rule cache
+    RULE_CACHE_TTL_SECONDS: float = float(os.getenv("RULE_CACHE_TTL_SECONDS", 60))
+    RULE_CACHE_MAXSIZE: int = int(os.getenv("RULE_CACHE_MAXSIZE", 10000))
+    RULE_CACHE_CHANGE_STREAM: bool = os.getenv("RULE_CACHE_CHANGE_STREAM", "False") == "True"
+    
+    # Dashboard stats cache
+    STATS_CACHE_TTL_SECONDS: float = float(os.getenv("STATS_CACHE_TTL_SECONDS", 10))
+    STATS_CACHE_STALE_SECONDS: float = float(os.getenv("STATS_CACHE_STALE_SECONDS", 60))
+    STATS_CACHE_MAXSIZE: int = int(os.getenv("STATS_CACHE_MAXSIZE", 10000))
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
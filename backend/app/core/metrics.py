@@ -0,0 +1,73 @@
+"""Prometheus metrics, exposed at /metrics"""
+
+from typing import Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Sub-millisecond resolution for in-process work, up to seconds for I/O
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+IO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by route template",
+    ["method", "route", "status"],
+    buckets=IO_BUCKETS
+)
+
+WEBHOOK_EVENTS = Counter(
+    "webhook_events_total",
+    "Webhook changes by outcome: enqueued, rejected (queue full), processed, failed or dropped (shutdown)",
+    ["outcome"]
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "webhook_queue_depth",
+    "Webhook changes waiting for a worker"
+)
+WEBHOOK_QUEUE_LAG_SECONDS = Histogram(
+    "webhook_queue_lag_seconds",
+    "Time from webhook receipt until a worker picks the change up",
+    buckets=IO_BUCKETS
+)
+RULE_MATCH_SECONDS = Histogram(
+    "rule_match_duration_seconds",
+    "Time to match a comment against an account's rules",
+    buckets=FAST_BUCKETS
+)
+
+SEND_QUEUE_PENDING = Gauge(
+    "send_queue_pending",
+    "Replies and DMs waiting in the send scheduler"
+)
+GRAPH_API_REQUEST_SECONDS = Histogram(
+    "graph_api_request_duration_seconds",
+    "Graph API call latency, rate limiting excluded",
+    ["endpoint"],
+    buckets=IO_BUCKETS
+)
+GRAPH_API_ERRORS = Counter(
+    "graph_api_errors_total",
+    "Failed Graph API requests by endpoint and status code",
+    ["endpoint", "code"]
+)
+
+LOG_BUFFER_PENDING = Gauge(
+    "log_buffer_pending",
+    "Log writes waiting for the next flush"
+)
+MONGODB_COMMAND_SECONDS = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "command"],
+    buckets=IO_BUCKETS
+)
+MONGODB_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by collection and command",
+    ["collection", "command"]
+)
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,11 +1,20 @@
 """Security utilities for JWT and password hashing"""
 
+import hashlib
+import heapq
+import math
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 import bcrypt
 from app.core.config import settings
 
+bearer_scheme = HTTPBearer(auto_error=False)
+
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
     salt = bcrypt.gensalt()
@@ -41,4 +50,119 @@ def decode_token(token: str) -> Optional[dict]:
         )
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def token_key(token: str) -> bytes:
+    """Cache key of a token; the token itself is never stored"""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified JWT payloads, keyed by token_key()
+
+    An entry is dropped at the token's exp claim, so an expired token is
+    decoded again and rejected instead of being served from the cache.
+    Payloads are copied in and out, so callers cannot alter a cached one.
+    Revoked tokens are removed and remembered until they expire; expired
+    revocations are pruned on every lookup. Both are local to this process.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._revoked: Dict[bytes, float] = {}
+        # (expires_at, key) of the revoked tokens, soonest first
+        self._revoked_expiry: List[Tuple[float, bytes]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[dict]:
+        """Payload of a verified token that has not expired yet"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, payload: dict) -> None:
+        """Remember a verified token until its exp claim"""
+        # Tokens without exp could never be evicted on time
+        if "exp" not in payload:
+            return
+        self._entries[key] = (float(payload["exp"]), dict(payload))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _prune_revoked(self, now: float) -> None:
+        # Expired tokens fail verification anyway
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            _, key = heapq.heappop(self._revoked_expiry)
+            self._revoked.pop(key, None)
+
+    def revoke(self, key: bytes, expires_at: float) -> None:
+        """Reject a token from now on; it is forgotten once it has expired"""
+        self._entries.pop(key, None)
+        self._prune_revoked(time.time())
+        if key not in self._revoked:
+            self._revoked[key] = expires_at
+            heapq.heappush(self._revoked_expiry, (expires_at, key))
+
+    def is_revoked(self, key: bytes) -> bool:
+        self._prune_revoked(time.time())
+        return key in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+token_cache = VerifiedTokenCache(maxsize=settings.JWT_CACHE_SIZE)
+
+def verify_token(token: str) -> Optional[dict]:
+    """
+    Decode JWT token, skipping the signature check for tokens verified before
+    Returns None for invalid, expired and revoked tokens
+    """
+    key = token_key(token)
+    if token_cache.is_revoked(key):
+        return None
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload is None:
+            return None
+        token_cache.put(key, payload)
+    return payload
+
+def revoke_token(token: str) -> None:
+    """Make a token fail verification in this process until it expires"""
+    payload = decode_token(token)
+    # Invalid and expired tokens are rejected already
+    if payload is not None:
+        token_cache.revoke(token_key(token), float(payload.get("exp", math.inf)))
+
+def is_account_id(value: Any) -> bool:
+    """
+    Whether value is an Instagram account id
+    A user is the Instagram professional account they manage: the sub claim
+    of their tokens is its id, the same id webhook entries carry, and their
+    rules, logs and stats are stored under it
+    """
+    return isinstance(value, str) and value.isdigit()
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> str:
+    """User id (sub claim) of the request's bearer token; an Instagram account id"""
+    payload = verify_token(credentials.credentials) if credentials else None
+    user_id = payload.get("sub") if payload else None
+    if not is_account_id(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user_id
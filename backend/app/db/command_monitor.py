@@ -0,0 +1,51 @@
+"""Per-collection MongoDB command timings for the shared Motor client"""
+
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+from app.core import metrics
+
+# Commands whose first value is not a collection name
+_NO_COLLECTION = {"getMore"}
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Records the duration of every MongoDB command in Prometheus histograms
+
+    pymongo calls these hooks synchronously from the driver threads. The
+    collection is only known when a command starts, so it is remembered
+    per (connection, request id) until the command finishes.
+    """
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        command = event.command
+        if event.command_name in _NO_COLLECTION:
+            collection = command.get("collection", "")
+        else:
+            collection = command.get(event.command_name, "")
+        self._collections[self._key(event)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        metrics.MONGODB_COMMAND_SECONDS.labels(collection, event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        metrics.MONGODB_COMMAND_SECONDS.labels(collection, event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+        metrics.MONGODB_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+command_monitor = CommandMonitor()
@@ -0,0 +1,309 @@
+"""
+Query plan check for the application's MongoDB queries
+
+Runs explain() on every query the MongoDB repositories issue
+and fails when any of them would scan a whole collection:
+
+    python -m app.db.diagnostics
+"""
+
+import asyncio
+import inspect
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.db import mongodb
+from app.repositories.mongo import MongoStorage
+from app.services.retry_queue import DEAD, LEASED, PENDING
+
+SAMPLE_USER = "diagnostics"
+
+
+class _Cursor:
+    """Stands in for a Motor cursor; completes the recorded command"""
+
+    def __init__(self, command: Dict[str, Any]):
+        self.command = command
+
+    def sort(self, key: Any, direction: Optional[int] = None) -> "_Cursor":
+        self.command["sort"] = dict([(key, direction)] if isinstance(key, str) else key)
+        return self
+
+    def skip(self, count: int) -> "_Cursor":
+        if count:
+            self.command["skip"] = count
+        return self
+
+    def limit(self, count: int) -> "_Cursor":
+        self.command["limit"] = count
+        return self
+
+    def batch_size(self, count: int) -> "_Cursor":
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Any]:
+        return []
+
+    def __aiter__(self) -> "_Cursor":
+        return self
+
+    async def __anext__(self) -> Any:
+        raise StopAsyncIteration
+
+
+def _projection(fields: Any) -> Optional[Dict[str, Any]]:
+    if fields is None or isinstance(fields, dict):
+        return fields
+    return {field: 1 for field in fields}
+
+
+def _count(collection: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    # count_documents runs as this aggregation
+    return {
+        "aggregate": collection,
+        "pipeline": [{"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}],
+        "cursor": {}
+    }
+
+
+class _RecordingCollection:
+    """
+    Stands in for a Motor collection and records each call as the
+    database command it runs; inserts have no query plan and are not recorded
+    """
+
+    def __init__(self, name: str, commands: List[Dict[str, Any]]):
+        self.name = name
+        self.commands = commands
+
+    def _record(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        self.commands.append(command)
+        return command
+
+    @staticmethod
+    def _result() -> SimpleNamespace:
+        return SimpleNamespace(inserted_id=ObjectId(), matched_count=0, modified_count=0, deleted_count=0)
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool) -> SimpleNamespace:
+        self._record({"update": self.name, "updates": [{"q": query, "u": update, "upsert": upsert, "multi": multi}]})
+        return self._result()
+
+    def _delete(self, query: Dict[str, Any], limit: int) -> SimpleNamespace:
+        self._record({"delete": self.name, "deletes": [{"q": query, "limit": limit}]})
+        return self._result()
+
+    def find(self, query: Dict[str, Any], projection: Any = None) -> _Cursor:
+        command = {"find": self.name, "filter": query}
+        if projection is not None:
+            command["projection"] = _projection(projection)
+        return _Cursor(self._record(command))
+
+    async def find_one(self, query: Dict[str, Any], projection: Any = None, sort: Any = None) -> None:
+        cursor = self.find(query, projection).limit(1)
+        if sort is not None:
+            cursor.sort(sort)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> _Cursor:
+        return _Cursor(self._record({"aggregate": self.name, "pipeline": pipeline, "cursor": {}}))
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        self._record(_count(self.name, query))
+        return 0
+
+    async def distinct(self, key: str, query: Dict[str, Any]) -> List[Any]:
+        self._record({"distinct": self.name, "key": key, "query": query})
+        return []
+
+    async def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any], sort: Any = None, **options) -> None:
+        command = {"findAndModify": self.name, "query": query, "update": update}
+        if sort is not None:
+            command["sort"] = dict(sort)
+        self._record(command)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> SimpleNamespace:
+        return self._update(query, update, upsert, multi=False)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]) -> SimpleNamespace:
+        return self._update(query, update, upsert=False, multi=True)
+
+    async def delete_one(self, query: Dict[str, Any]) -> SimpleNamespace:
+        return self._delete(query, limit=1)
+
+    async def delete_many(self, query: Dict[str, Any]) -> SimpleNamespace:
+        return self._delete(query, limit=0)
+
+    async def bulk_write(self, operations: List[Any], ordered: bool = True) -> SimpleNamespace:
+        # The operations of a bulk write share one shape; explain takes a
+        # single statement, so the first one stands for all of them
+        op = operations[0]
+        return self._update(op._filter, op._doc, op._upsert, multi=False)
+
+    async def insert_one(self, document: Dict[str, Any]) -> SimpleNamespace:
+        return self._result()
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> SimpleNamespace:
+        return self._result()
+
+
+class _RecordingDatabase:
+    def __init__(self):
+        self.commands: List[Dict[str, Any]] = []
+
+    def __getitem__(self, name: str) -> _RecordingCollection:
+        return _RecordingCollection(name, self.commands)
+
+
+def sample_calls() -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    A (repository, method, arguments) call of every MongoDB repository method
+    Calls that take different query shapes depending on their arguments
+    appear once per shape
+    """
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+    day_ago = now - timedelta(days=1)
+    rule_id, job_id = ObjectId(), ObjectId()
+    daily_key = {"user_id": SAMPLE_USER, "date": "2000-01-01"}
+    hourly_key = {"user_id": SAMPLE_USER, "hour": day_ago}
+    user_range = {"user_id": SAMPLE_USER, "start": day_ago, "end": now}
+    log = {"user_id": SAMPLE_USER, "status": "pending", "timestamp": now}
+
+    calls: List[Tuple[str, str, Dict[str, Any]]] = []
+    for logs in ("comment_logs", "dm_logs"):
+        page = {"user_id": SAMPLE_USER, "start": week_ago, "end": now, "limit": 21}
+        calls += [
+            (logs, "claim", {"document": dict(log)}),
+            (logs, "page", page),
+            (logs, "page", {**page, "after": (now, ObjectId()), "fields": ["status"]}),
+            (logs, "count", {"start": week_ago, "end": now, "user_id": SAMPLE_USER}),
+            (logs, "count", {"start": week_ago, "end": now}),
+            (logs, "count_by_day", user_range),
+            (logs, "count_by_quarter", user_range),
+            (logs, "commenters", user_range),
+            (logs, "reply_latencies", user_range),
+            (logs, "user_ids", {"start": day_ago, "end": now}),
+            (logs, "oldest_timestamp", {}),
+            (logs, "oldest_timestamp", {"since": week_ago}),
+            (logs, "stream", {"start": week_ago, "end": day_ago, "batch_size": 500}),
+            (logs, "delete_between", {"start": week_ago, "end": day_ago}),
+            (logs, "bulk_insert", {"documents": [dict(log)]}),
+            (logs, "bulk_update", {"changes": {ObjectId(): {"status": "sent"}}})
+        ]
+
+    calls += [
+        ("daily_stats", "sum_counters", {"user_id": SAMPLE_USER, "fields": ["comments_count"]}),
+        ("daily_stats", "merge_commenters", {"user_id": SAMPLE_USER}),
+        ("daily_stats", "merge_latencies", {"user_id": SAMPLE_USER, "since": "2000-01-01"}),
+        ("daily_stats", "replace_day", {**daily_key, "fields": {"comments_count": 1}}),
+        ("daily_stats", "user_ids", {"date": "2000-01-01"}),
+        ("daily_stats", "bulk_upsert", {"operations": [(daily_key, {"$inc": {"comments_count": 1}})], "now": now}),
+        ("hourly_stats", "find_range", {"user_id": SAMPLE_USER, "start": week_ago, "end": now}),
+        ("hourly_stats", "replace_hours", {
+            "user_id": SAMPLE_USER, "start": day_ago, "end": day_ago + timedelta(hours=1), "quarters": {}
+        }),
+        ("hourly_stats", "delete_before", {"cutoff": week_ago}),
+        ("hourly_stats", "bulk_upsert", {"operations": [(hourly_key, {"$inc": {"quarters.0.sent": 1}})], "now": now}),
+        ("rules", "active_rules", {"user_id": SAMPLE_USER}),
+        ("rules", "count_active", {"user_id": SAMPLE_USER}),
+        ("rules", "list", {"user_id": SAMPLE_USER}),
+        ("rules", "get", {"user_id": SAMPLE_USER, "rule_id": rule_id}),
+        ("rules", "create", {"document": {"user_id": SAMPLE_USER}}),
+        ("rules", "update", {"user_id": SAMPLE_USER, "rule_id": rule_id, "changes": {"is_active": False}}),
+        ("rules", "delete", {"user_id": SAMPLE_USER, "rule_id": rule_id}),
+        ("user_settings", "get_timezone", {"user_id": SAMPLE_USER}),
+        ("user_settings", "set_timezone", {"user_id": SAMPLE_USER, "timezone": "UTC"}),
+        ("retry_jobs", "insert", {"job": {"state": PENDING}}),
+        ("retry_jobs", "lease", {"owner": SAMPLE_USER, "now": now, "lease_expires_at": now}),
+        ("retry_jobs", "renew", {"job_ids": [job_id], "owner": SAMPLE_USER, "lease_expires_at": now}),
+        ("retry_jobs", "complete", {"job_id": job_id, "owner": SAMPLE_USER}),
+        ("retry_jobs", "release", {"job_id": job_id, "owner": SAMPLE_USER, "fields": {"state": PENDING}}),
+        ("retry_jobs", "count_by_state", {"states": [PENDING, LEASED, DEAD]})
+    ]
+    return calls
+
+
+async def service_queries() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    The (name, command) of every query the MongoDB repositories issue
+    Recorded by running each of sample_calls against stand-in collections,
+    so the commands follow the repository code
+    """
+    queries: List[Tuple[str, Dict[str, Any]]] = []
+    for repository, method, arguments in sample_calls():
+        db = _RecordingDatabase()
+        call = getattr(getattr(MongoStorage(db), repository), method)(**arguments)
+        if inspect.isasyncgen(call):
+            async for _ in call:
+                pass
+        else:
+            await call
+        described = ", ".join(arguments)
+        for i, command in enumerate(db.commands):
+            suffix = f" #{i + 1}" if len(db.commands) > 1 else ""
+            queries.append((f"{repository}.{method}({described}){suffix}", command))
+    return queries
+
+
+def _winning_plans(node: Any) -> Iterator[Dict[str, Any]]:
+    # Plans sit at different depths for find, aggregate and write commands
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _winning_plans(item)
+
+
+def _stages(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def check_query_plans() -> List[str]:
+    """
+    Explain every service query
+    Returns the names of the queries that scan a whole collection
+    """
+    db = mongodb.get_db()
+    failures = []
+    for name, command in await service_queries():
+        explained = await db.command("explain", command, verbosity="queryPlanner")
+        stages = [stage for plan in _winning_plans(explained) for stage in _stages(plan)]
+        if not stages or "COLLSCAN" in stages:
+            failures.append(name)
+            print(f"❌ {name}: {' > '.join(stages) or 'no plan'}")
+        else:
+            print(f"✅ {name}: {' > '.join(stages)}")
+    return failures
+
+
+async def main() -> int:
+    # Connecting also creates the indexes, exactly like the app does
+    await mongodb.connect_to_mongo()
+    try:
+        failures = await check_query_plans()
+    finally:
+        await mongodb.close_mongo_connection()
+
+    if failures:
+        print(f"❌ {len(failures)} queries scan a whole collection")
+        return 1
+    print("✅ Every query is served by an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
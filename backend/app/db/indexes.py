@@ -0,0 +1,63 @@
+"""Indexes backing the application's queries"""
+
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "comment_logs": [
+        # Rejects redelivered webhook comments across workers at insert time
+        IndexModel(
+            [("comment_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"comment_id": {"$type": "string"}}
+        ),
+        # Log pages (newest first, keyset on timestamp + _id) and counts
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        # Per-status counts behind the rollup reconcile
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("timestamp", ASCENDING)]),
+        # Users active on a day, across all users
+        IndexModel([("timestamp", ASCENDING)])
+    ],
+    "dm_logs": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("timestamp", ASCENDING)]),
+        IndexModel([("timestamp", ASCENDING)])
+    ],
+    "daily_stats": [
+        # One rollup document per user and day, target of the upserting $inc
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+        IndexModel([("date", ASCENDING)])
+    ],
+    "hourly_stats": [
+        # One rollup document per user and UTC hour; local days are derived from these
+        IndexModel([("user_id", ASCENDING), ("hour", ASCENDING)], unique=True),
+        # Hours past the retention cutoff
+        IndexModel([("hour", ASCENDING)])
+    ],
+    "automation_rules": [
+        # Active rules of a user (rule cache, dashboard) and the rule list
+        IndexModel([("user_id", ASCENDING), ("is_active", ASCENDING)])
+    ],
+    "user_settings": [
+        IndexModel([("user_id", ASCENDING)], unique=True)
+    ],
+    "retry_queue": [
+        # Lets retry workers find due jobs and expired leases
+        IndexModel([("state", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexModel([("state", ASCENDING), ("lease_expires_at", ASCENDING)]),
+        # Removes dead jobs once their expires_at passes; only dead jobs have one
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    ]
+}
+
+
+async def create_indexes(db) -> None:
+    """
+    Create every index in INDEXES
+    Idempotent: MongoDB skips indexes that already exist with the same
+    spec; names are left to the server default for the same reason
+    """
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+    print(f"✅ Ensured indexes on {len(INDEXES)} collections")
@@ -1,25 +1,72 @@
 """MongoDB connection and initialization"""
 
-from motor.motor_asyncio import AsyncClient, AsyncDatabase
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from app.core.config import settings
+from app.db import indexes
+from app.db.command_monitor import command_monitor
+from app.db.pool_monitor import pool_monitor
 
-client: AsyncClient = None
-db: AsyncDatabase = None
+client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
 
 async def connect_to_mongo():
-    """Connect to MongoDB"""
+    """
+    Connect to MongoDB
+    Opens the one client the whole process shares; its connection pool is
+    sized and timed out from settings
+    """
     global client, db
-    client = AsyncClient(settings.MONGODB_URI)
+    if client is not None:
+        return
+    client = AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+        # Compressors whose library is missing are skipped with a warning
+        compressors=settings.MONGODB_COMPRESSORS,
+        event_listeners=[pool_monitor, command_monitor]
+    )
     db = client[settings.MONGODB_DB_NAME]
+    try:
+        # Fail at startup rather than on the first request
+        await client.admin.command("ping")
+    except Exception:
+        await close_mongo_connection()
+        raise
     print(f"Connected to MongoDB: {settings.MONGODB_DB_NAME}")
+    await create_indexes()
+
+async def create_indexes():
+    """Create the indexes the application relies on (see app.db.indexes)"""
+    await indexes.create_indexes(db)
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
-    global client
+    global client, db
     if client:
         client.close()
+        client = None
+        db = None
         print("Closed MongoDB connection")
 
-def get_db() -> AsyncDatabase:
+def get_db() -> AsyncIOMotorDatabase:
     """Get database instance"""
-    return db
\ No newline at end of file
+    if db is None:
+        raise RuntimeError("MongoDB is not connected; call connect_to_mongo first")
+    return db
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection pool settings and per-server counters"""
+    return {
+        "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+        "min_pool_size": settings.MONGODB_MIN_POOL_SIZE,
+        "compressors": settings.MONGODB_COMPRESSORS,
+        "servers": pool_monitor.stats()
+    }
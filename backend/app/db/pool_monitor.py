@@ -0,0 +1,83 @@
+"""Connection pool observability for the shared Motor client"""
+
+from collections import defaultdict
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool events per server
+
+    pymongo calls these hooks synchronously from the driver, so they only
+    update counters. in_use is the number of connections checked out right
+    now; checkout_failures with reason "timeout" mean the pool is too small
+    for the load (requests waited waitQueueTimeoutMS and gave up).
+    """
+
+    def __init__(self):
+        self._servers: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "open": 0,
+            "in_use": 0,
+            "max_in_use": 0,
+            "checkouts": 0,
+            "checkout_failures": defaultdict(int),
+            "created": 0,
+            "closed": 0,
+            "pool_clears": 0
+        })
+
+    def _server(self, event) -> Dict[str, Any]:
+        host, port = event.address
+        return self._servers[f"{host}:{port}"]
+
+    def pool_created(self, event):
+        self._server(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._server(event)["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        server = self._server(event)
+        server["created"] += 1
+        server["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        server = self._server(event)
+        server["closed"] += 1
+        server["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._server(event)["checkout_failures"][str(event.reason)] += 1
+
+    def connection_checked_out(self, event):
+        server = self._server(event)
+        server["checkouts"] += 1
+        server["in_use"] += 1
+        server["max_in_use"] = max(server["max_in_use"], server["in_use"])
+
+    def connection_checked_in(self, event):
+        self._server(event)["in_use"] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters per server"""
+        return {
+            address: {**counters, "checkout_failures": dict(counters["checkout_failures"])}
+            for address, counters in self._servers.items()
+        }
+
+
+pool_monitor = PoolMonitor()
@@ -1,10 +1,11 @@
 """Main FastAPI application"""
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,18 +13,46 @@ load_dotenv()
 
 # Import routes
 from app.api.routes import auth, rules, webhooks, logs
+from app.core import metrics
 from app.core.config import settings
+from app.db.mongodb import pool_stats
+from app.repositories import close_storage, get_storage, init_storage
+from app.services.graph_client import graph_client
+from app.services.log_buffer import log_buffer
+from app.services.maintenance import scheduler
+from app.services.retry_queue import retry_queue
+from app.services.rule_cache import rule_cache
+from app.services.send_scheduler import send_scheduler
+from app.services.stats_cache import stats_cache
+from app.services.webhook_queue import webhook_queue
 
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting up...")
-    print("✅ Connected to MongoDB")
+    storage = await init_storage()
+    if settings.RULE_CACHE_CHANGE_STREAM and storage.name == "mongo":
+        rule_cache.start_watching()
+    log_buffer.add_flush_listener(stats_cache.invalidate_many)
+    log_buffer.start()
+    await graph_client.start()
+    await send_scheduler.start()
+    retry_queue.start()
+    await webhook_queue.start()
+    scheduler.start()
     yield
     # Shutdown
     print("🛑 Shutting down...")
-    print("✅ Disconnected from MongoDB")
+    scheduler.shutdown(wait=False)
+    await webhook_queue.stop(timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await retry_queue.stop()
+    await send_scheduler.stop(timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await log_buffer.stop()
+    await rule_cache.stop_watching()
+    await graph_client.close()
+    await close_storage()
+    print("✅ Closed storage")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -45,6 +74,22 @@ app.add_middleware(
     allow_headers=settings.CORS_ALLOW_HEADERS,
 )
 
+# Request latency per route template, for /metrics
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The template keeps path parameters out of the label values
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - started)
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -63,6 +108,27 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     })
 
+# Database health and connection pool utilization
+@app.get("/health/db")
+async def database_health_check():
+    storage = get_storage()
+    try:
+        await storage.ping()
+        status = "healthy"
+    except Exception as e:
+        status = f"unhealthy: {str(e)}"
+    return JSONResponse({
+        "status": status,
+        "backend": storage.name,
+        "pool": pool_stats() if storage.name == "mongo" else None
+    })
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, headers={"Content-Type": content_type})
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(rules.router, prefix="/api/rules", tags=["Rules Management"])
@@ -1,7 +1,7 @@
 """MongoDB document models for the application"""
 
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Mapping
 from enum import Enum
 
 
@@ -22,6 +22,11 @@ class StatusEnum(str, Enum):
 class CommentLog:
     """MongoDB document for comment logs"""
 
+    __slots__ = (
+        "_id", "user_id", "post_id", "comment_id", "username", "comment_text", "reply_sent",
+        "rule_applied", "status", "timestamp", "matched_at", "sent_at", "created_at"
+    )
+
     def __init__(
         self,
         user_id: str,
@@ -33,6 +38,8 @@ class CommentLog:
         rule_applied: str,
         status: str = StatusEnum.SENT,
         timestamp: datetime = None,
+        matched_at: Optional[datetime] = None,
+        sent_at: Optional[datetime] = None,
         _id: Optional[str] = None
     ):
         self._id = _id
@@ -44,8 +51,11 @@ class CommentLog:
         self.reply_sent = reply_sent
         self.rule_applied = rule_applied
         self.status = status
-        self.timestamp = timestamp or datetime.utcnow()
-        self.created_at = datetime.utcnow()
+        now = datetime.utcnow()
+        self.timestamp = timestamp or now  # webhook receipt time
+        self.matched_at = matched_at
+        self.sent_at = sent_at
+        self.created_at = now
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for MongoDB"""
@@ -59,16 +69,43 @@ class CommentLog:
             "rule_applied": self.rule_applied,
             "status": self.status,
             "timestamp": self.timestamp,
+            "matched_at": self.matched_at,
+            "sent_at": self.sent_at,
             "created_at": self.created_at
         }
         if self._id:
             data["_id"] = self._id
         return data
 
+    @classmethod
+    def from_dict(cls, document: Mapping[str, Any]) -> "CommentLog":
+        """Record of a document read from MongoDB"""
+        log = cls(
+            user_id=document.get("user_id"),
+            post_id=document.get("post_id"),
+            comment_id=document.get("comment_id"),
+            username=document.get("username"),
+            comment_text=document.get("comment_text"),
+            reply_sent=document.get("reply_sent"),
+            rule_applied=document.get("rule_applied"),
+            status=document.get("status", StatusEnum.SENT),
+            timestamp=document.get("timestamp"),
+            matched_at=document.get("matched_at"),
+            sent_at=document.get("sent_at"),
+            _id=document.get("_id")
+        )
+        log.created_at = document.get("created_at", log.created_at)
+        return log
+
 
 class DMLog:
     """MongoDB document for DM logs"""
 
+    __slots__ = (
+        "_id", "user_id", "recipient_id", "recipient_username", "message_sent", "rule_applied",
+        "mode", "status", "timestamp", "sent_at", "created_at"
+    )
+
     def __init__(
         self,
         user_id: str,
@@ -79,6 +116,7 @@ class DMLog:
         mode: str = AutomationModeEnum.COMMENT_AND_DM,
         status: str = StatusEnum.SENT,
         timestamp: datetime = None,
+        sent_at: Optional[datetime] = None,
         _id: Optional[str] = None
     ):
         self._id = _id
@@ -89,8 +127,10 @@ class DMLog:
         self.rule_applied = rule_applied
         self.mode = mode
         self.status = status
-        self.timestamp = timestamp or datetime.utcnow()
-        self.created_at = datetime.utcnow()
+        now = datetime.utcnow()
+        self.timestamp = timestamp or now
+        self.sent_at = sent_at
+        self.created_at = now
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for MongoDB"""
@@ -103,16 +143,37 @@ class DMLog:
             "mode": self.mode,
             "status": self.status,
             "timestamp": self.timestamp,
+            "sent_at": self.sent_at,
             "created_at": self.created_at
         }
         if self._id:
             data["_id"] = self._id
         return data
 
+    @classmethod
+    def from_dict(cls, document: Mapping[str, Any]) -> "DMLog":
+        """Record of a document read from MongoDB"""
+        log = cls(
+            user_id=document.get("user_id"),
+            recipient_id=document.get("recipient_id"),
+            recipient_username=document.get("recipient_username"),
+            message_sent=document.get("message_sent"),
+            rule_applied=document.get("rule_applied"),
+            mode=document.get("mode", AutomationModeEnum.COMMENT_AND_DM),
+            status=document.get("status", StatusEnum.SENT),
+            timestamp=document.get("timestamp"),
+            sent_at=document.get("sent_at"),
+            _id=document.get("_id")
+        )
+        log.created_at = document.get("created_at", log.created_at)
+        return log
+
 
 class ActivityLog:
     """MongoDB document for activity logs"""
 
+    __slots__ = ("_id", "user_id", "action", "details", "status", "timestamp", "created_at")
+
     def __init__(
         self,
         user_id: str,
@@ -127,8 +188,9 @@ class ActivityLog:
         self.action = action  # comment_sent, dm_sent, rule_created, etc.
         self.details = details
         self.status = status
-        self.timestamp = timestamp or datetime.utcnow()
-        self.created_at = datetime.utcnow()
+        now = datetime.utcnow()
+        self.timestamp = timestamp or now
+        self.created_at = now
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for MongoDB"""
@@ -144,10 +206,29 @@ class ActivityLog:
             data["_id"] = self._id
         return data
 
+    @classmethod
+    def from_dict(cls, document: Mapping[str, Any]) -> "ActivityLog":
+        """Record of a document read from MongoDB"""
+        log = cls(
+            user_id=document.get("user_id"),
+            action=document.get("action"),
+            details=document.get("details"),
+            status=document.get("status", "success"),
+            timestamp=document.get("timestamp"),
+            _id=document.get("_id")
+        )
+        log.created_at = document.get("created_at", log.created_at)
+        return log
+
 
 class DailyStats:
     """MongoDB document for daily statistics"""
 
+    __slots__ = (
+        "_id", "user_id", "date", "comments_count", "dms_count", "failed_comments", "failed_dms",
+        "active_rules", "engagement_rate", "created_at", "updated_at"
+    )
+
     def __init__(
         self,
         user_id: str,
@@ -169,8 +250,7 @@ class DailyStats:
         self.failed_dms = failed_dms
         self.active_rules = active_rules
         self.engagement_rate = engagement_rate
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self.created_at = self.updated_at = datetime.utcnow()
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for MongoDB"""
@@ -190,10 +270,34 @@ class DailyStats:
             data["_id"] = self._id
         return data
 
+    @classmethod
+    def from_dict(cls, document: Mapping[str, Any]) -> "DailyStats":
+        """Record of a document read from MongoDB"""
+        stats = cls(
+            user_id=document.get("user_id"),
+            date=document.get("date"),
+            comments_count=document.get("comments_count", 0),
+            dms_count=document.get("dms_count", 0),
+            failed_comments=document.get("failed_comments", 0),
+            failed_dms=document.get("failed_dms", 0),
+            active_rules=document.get("active_rules", 0),
+            engagement_rate=document.get("engagement_rate", 0.0),
+            _id=document.get("_id")
+        )
+        stats.created_at = document.get("created_at", stats.created_at)
+        stats.updated_at = document.get("updated_at", stats.updated_at)
+        return stats
+
 
 class AutomationRule:
     """MongoDB document for automation rules"""
 
+    __slots__ = (
+        "_id", "user_id", "name", "keyword_trigger", "comment_reply", "dm_message", "mode",
+        "is_active", "priority", "total_triggered", "successful_executions",
+        "created_at", "updated_at"
+    )
+
     def __init__(
         self,
         user_id: str,
@@ -203,20 +307,21 @@ class AutomationRule:
         dm_message: Optional[str] = None,
         mode: str = AutomationModeEnum.COMMENT_ONLY,
         is_active: bool = True,
+        priority: int = 0,
         _id: Optional[str] = None
     ):
         self._id = _id
         self.user_id = user_id
         self.name = name
-        self.keyword_trigger = keyword_trigger
+        self.keyword_trigger = keyword_trigger  # comma separated keywords
         self.comment_reply = comment_reply
         self.dm_message = dm_message
         self.mode = mode
         self.is_active = is_active
+        self.priority = priority  # higher wins when several rules match
         self.total_triggered = 0
         self.successful_executions = 0
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self.created_at = self.updated_at = datetime.utcnow()
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for MongoDB"""
@@ -228,6 +333,7 @@ class AutomationRule:
             "dm_message": self.dm_message,
             "mode": self.mode,
             "is_active": self.is_active,
+            "priority": self.priority,
             "total_triggered": self.total_triggered,
             "successful_executions": self.successful_executions,
             "created_at": self.created_at,
@@ -236,3 +342,23 @@ class AutomationRule:
         if self._id:
             data["_id"] = self._id
         return data
+
+    @classmethod
+    def from_dict(cls, document: Mapping[str, Any]) -> "AutomationRule":
+        """Record of a document read from MongoDB"""
+        rule = cls(
+            user_id=document.get("user_id"),
+            name=document.get("name"),
+            keyword_trigger=document.get("keyword_trigger"),
+            comment_reply=document.get("comment_reply"),
+            dm_message=document.get("dm_message"),
+            mode=document.get("mode", AutomationModeEnum.COMMENT_ONLY),
+            is_active=document.get("is_active", True),
+            priority=document.get("priority", 0),
+            _id=document.get("_id")
+        )
+        rule.total_triggered = document.get("total_triggered", 0)
+        rule.successful_executions = document.get("successful_executions", 0)
+        rule.created_at = document.get("created_at", rule.created_at)
+        rule.updated_at = document.get("updated_at", rule.updated_at)
+        return rule
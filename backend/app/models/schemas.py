@@ -1,7 +1,7 @@
 """Pydantic schemas for API requests and responses"""
 
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, create_model
+from typing import Optional, List, Tuple, Type
 from datetime import datetime
 from enum import Enum
 
@@ -28,6 +28,8 @@ class CommentLogSchema(BaseModel):
     timestamp: datetime
     rule_applied: str
     status: str = "sent"  # sent, failed, pending
+    matched_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
 
     class Config:
         populate_by_name = True
@@ -44,6 +46,7 @@ class DMLogSchema(BaseModel):
     rule_applied: str
     status: str = "sent"  # sent, failed, pending
     mode: AutomationModeEnum = AutomationModeEnum.COMMENT_AND_DM
+    sent_at: Optional[datetime] = None
 
     class Config:
         populate_by_name = True
@@ -104,6 +107,9 @@ class DashboardStatsSchema(BaseModel):
     today_comments: int
     today_dms_sent: int
     response_time_avg: float  # in seconds
+    response_time_p50: float = 0.0
+    response_time_p95: float = 0.0
+    response_time_p99: float = 0.0
     success_rate: float  # percentage
     failed_actions: int
     weekly_activity: WeeklyActivitySchema
@@ -117,8 +123,12 @@ class EngagementMetricsSchema(BaseModel):
     failed_actions: int
     success_rate: float
     avg_response_time: float
+    response_time_p50: float = 0.0
+    response_time_p95: float = 0.0
+    response_time_p99: float = 0.0
     engagement_rate: float
     conversion_rate: float
+    unique_commenters: int = 0  # approximate (HyperLogLog)
 
 
 # ============================================================================
@@ -135,6 +145,7 @@ class AutomationRuleSchema(BaseModel):
     dm_message: Optional[str] = None
     mode: AutomationModeEnum = AutomationModeEnum.COMMENT_ONLY
     is_active: bool = True
+    priority: int = 0
     created_at: datetime
     updated_at: datetime
     total_triggered: int = 0
@@ -150,17 +161,42 @@ class AutomationRuleSchema(BaseModel):
 
 class PaginationSchema(BaseModel):
     """Schema for paginated responses"""
-    total: int
+    total: Optional[int] = None  # only counted when include_total is set
     page: int
     page_size: int
     has_next: bool
     has_previous: bool
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # pass as cursor to fetch the next page
+
+
+def _projected(schema: Type[BaseModel], always: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Copy of a log schema for the logs API, where fields= may leave out any
+    field but those in always
+    """
+    optional = {
+        name: (Optional[field.annotation], Field(None, alias=field.alias))
+        for name, field in schema.model_fields.items()
+        if name not in always
+    }
+    return create_model(f"Projected{schema.__name__}", __base__=schema, **optional)
+
+
+# _id and timestamp are part of every projection
+ProjectedCommentLogSchema = _projected(CommentLogSchema, ("id", "timestamp"))
+ProjectedDMLogSchema = _projected(DMLogSchema, ("id", "timestamp"))
 
 
 class PaginatedLogsSchema(BaseModel):
-    """Schema for paginated logs response"""
-    data: List[CommentLogSchema]
+    """Schema for paginated comment logs response"""
+    data: List[ProjectedCommentLogSchema]
+    pagination: PaginationSchema
+
+
+class PaginatedDMLogsSchema(BaseModel):
+    """Schema for paginated DM logs response"""
+    data: List[ProjectedDMLogSchema]
     pagination: PaginationSchema
 
 
@@ -168,6 +204,11 @@ class PaginatedLogsSchema(BaseModel):
 # TIME RANGE SCHEMAS
 # ============================================================================
 
+class TimezoneSchema(BaseModel):
+    """Schema for the timezone a user's days are counted in"""
+    timezone: str  # IANA name, e.g. Asia/Kolkata
+
+
 class TimeRangeSchema(BaseModel):
     """Schema for time range queries"""
     start_date: Optional[str] = None  # YYYY-MM-DD
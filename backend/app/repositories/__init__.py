@@ -0,0 +1,54 @@
+"""
+Storage backends behind repository interfaces
+
+settings.STORAGE_BACKEND picks "mongo" (the shared Motor client) or
+"memory" (process-local, for offline profiling and benchmarks). Services
+reach the repositories through get_storage() once init_storage() ran.
+"""
+
+from typing import Optional
+
+from app.core.config import settings
+from app.repositories.base import Storage
+
+storage: Optional[Storage] = None
+
+
+async def init_storage(backend: Optional[str] = None) -> Storage:
+    """
+    Open the configured storage backend (or the one named by backend)
+    A no-op when storage is already open
+    """
+    global storage
+    if storage is not None:
+        return storage
+    backend = backend or settings.STORAGE_BACKEND
+    if backend == "memory":
+        from app.repositories.memory import MemoryStorage
+        storage = MemoryStorage()
+    elif backend == "mongo":
+        from app.db import mongodb
+        from app.repositories.mongo import MongoStorage
+        # Also creates any missing indexes; a no-op when they already exist
+        await mongodb.connect_to_mongo()
+        storage = MongoStorage(mongodb.get_db())
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    print(f"✅ Storage backend: {storage.name}")
+    return storage
+
+
+async def close_storage() -> None:
+    """Close the storage backend"""
+    global storage
+    if storage is not None:
+        await storage.close()
+        storage = None
+
+
+def get_storage() -> Storage:
+    """Get the open storage backend"""
+    if storage is None:
+        raise RuntimeError("Storage is not initialized; call init_storage first")
+    return storage
+
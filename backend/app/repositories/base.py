@@ -0,0 +1,277 @@
+"""Storage interfaces shared by the MongoDB and in-memory backends"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+# (timestamp, _id) of a log; logs are paged newest first in this order
+LogPosition = Tuple[datetime, ObjectId]
+
+# {"$inc": {field: amount}, "$max": {field: value}}; fields may be dotted paths
+RollupOps = Dict[str, Dict[str, Any]]
+
+
+class StorageError(Exception):
+    """
+    Raised when a bulk write partly failed for reasons other than duplicates
+    written is the number of operations that did succeed and failed the
+    positions of those that did not (None when unknown)
+    """
+
+    def __init__(self, message: str, written: int = 0, failed: Optional[List[int]] = None):
+        super().__init__(message)
+        self.written = written
+        self.failed = failed
+
+
+class LogWritable(ABC):
+    """Log collections the log buffer flushes inserts and updates into"""
+
+    @abstractmethod
+    async def bulk_insert(self, documents: List[Dict[str, Any]]) -> int:
+        """Insert documents, skipping duplicates; returns the number written"""
+
+    @abstractmethod
+    async def bulk_update(self, changes: Dict[ObjectId, Dict[str, Any]]) -> int:
+        """Set fields on documents by _id; returns the number written"""
+
+
+class RollupWritable(ABC):
+    """Rollup collections the log buffer flushes counter updates into"""
+
+    @abstractmethod
+    async def bulk_upsert(self, operations: List[Tuple[Dict[str, Any], RollupOps]], now: datetime) -> int:
+        """
+        Apply $inc/$max to the documents matching each key, creating them
+        with the key fields when missing; returns the number written
+        """
+
+
+class LogRepository(LogWritable):
+    """Comment or DM logs"""
+
+    @abstractmethod
+    async def claim(self, document: Dict[str, Any]) -> Optional[ObjectId]:
+        """
+        Insert a log unless one with the same comment_id exists
+        Returns its _id, or None for a duplicate
+        """
+
+    @abstractmethod
+    async def page(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        skip: int = 0,
+        after: Optional[LogPosition] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a user's logs with start <= timestamp <= end, newest first by
+        (timestamp, _id), resuming strictly after a position when given
+        With fields, only those fields and _id are returned
+        """
+
+    @abstractmethod
+    async def count(self, start: datetime, end: datetime, user_id: Optional[str] = None) -> int:
+        """Count logs with start <= timestamp <= end, of one user or all"""
+
+    @abstractmethod
+    async def count_by_day(self, user_id: str, start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        """Count sent and failed logs per (UTC day, status), start <= timestamp < end"""
+
+    @abstractmethod
+    async def count_by_quarter(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime
+    ) -> Dict[Tuple[datetime, int, str], int]:
+        """Count sent and failed logs per (UTC hour, quarter, status), start <= timestamp < end"""
+
+    @abstractmethod
+    async def commenters(self, user_id: str, start: datetime, end: datetime) -> List[str]:
+        """Distinct lowercased usernames, start <= timestamp < end"""
+
+    @abstractmethod
+    async def reply_latencies(self, user_id: str, start: datetime, end: datetime) -> List[float]:
+        """Milliseconds from timestamp to sent_at of sent logs, start <= timestamp < end"""
+
+    @abstractmethod
+    async def user_ids(self, start: datetime, end: datetime) -> List[str]:
+        """Users with logs, start <= timestamp < end"""
+
+    @abstractmethod
+    async def oldest_timestamp(self, since: Optional[datetime] = None) -> Optional[datetime]:
+        """Timestamp of the oldest log, or of the oldest one at or after since"""
+
+    @abstractmethod
+    def stream(self, start: datetime, end: datetime, batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over all logs with start <= timestamp < end, oldest first"""
+
+    @abstractmethod
+    async def delete_between(self, start: datetime, end: datetime) -> int:
+        """Delete all logs with start <= timestamp < end; returns the number deleted"""
+
+
+class DailyStatsRepository(RollupWritable):
+    """Per user and UTC day rollups (counters, commenter sketch, latency histogram)"""
+
+    @abstractmethod
+    async def sum_counters(self, user_id: str, fields: List[str]) -> Dict[str, int]:
+        """Sum counters over all of a user's days"""
+
+    @abstractmethod
+    async def merge_commenters(self, user_id: str) -> Dict[int, int]:
+        """Merge the HyperLogLog registers of all days (max rank per register)"""
+
+    @abstractmethod
+    async def merge_latencies(self, user_id: str, since: str) -> Tuple[Dict[int, int], int, int]:
+        """
+        Merge latency histograms of the days on or after since (YYYY-MM-DD)
+        Returns (histogram, count, sum in ms)
+        """
+
+    @abstractmethod
+    async def replace_day(self, user_id: str, date: str, fields: Dict[str, Any]) -> None:
+        """Set the fields of a day's rollup, creating it when missing"""
+
+    @abstractmethod
+    async def user_ids(self, date: str) -> List[str]:
+        """Users with a rollup on a date"""
+
+
+class HourlyStatsRepository(RollupWritable):
+    """Per user and UTC hour rollups, counters split in quarters"""
+
+    @abstractmethod
+    async def find_range(self, user_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Rollups with start <= hour < end, as {"hour", "quarters"}"""
+
+    @abstractmethod
+    async def replace_hours(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        quarters: Dict[datetime, Dict[str, Dict[str, int]]]
+    ) -> None:
+        """
+        Set the quarters of every hour with start <= hour < end
+        Hours missing from quarters are cleared, never created
+        """
+
+    @abstractmethod
+    async def delete_before(self, cutoff: datetime) -> int:
+        """Delete rollups of hours before cutoff; returns the number deleted"""
+
+
+class RuleRepository(ABC):
+    """Automation rules"""
+
+    @abstractmethod
+    async def active_rules(self, user_id: str) -> List[Dict[str, Any]]:
+        """A user's active rules"""
+
+    @abstractmethod
+    async def count_active(self, user_id: str) -> int:
+        """Number of a user's active rules"""
+
+    @abstractmethod
+    async def list(self, user_id: str) -> List[Dict[str, Any]]:
+        """All of a user's rules, oldest first"""
+
+    @abstractmethod
+    async def get(self, user_id: str, rule_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """A user's rule by id"""
+
+    @abstractmethod
+    async def create(self, document: Dict[str, Any]) -> ObjectId:
+        """Insert a rule; returns its id"""
+
+    @abstractmethod
+    async def update(self, user_id: str, rule_id: ObjectId, changes: Dict[str, Any]) -> bool:
+        """Set fields on a user's rule; False when it does not exist"""
+
+    @abstractmethod
+    async def delete(self, user_id: str, rule_id: ObjectId) -> bool:
+        """Delete a user's rule; False when it does not exist"""
+
+
+class UserSettingsRepository(ABC):
+    """Per-user preferences"""
+
+    @abstractmethod
+    async def get_timezone(self, user_id: str) -> Optional[str]:
+        """A user's timezone name, if set"""
+
+    @abstractmethod
+    async def set_timezone(self, user_id: str, timezone: str) -> None:
+        """Store a user's timezone name"""
+
+
+class RetryJobRepository(ABC):
+    """Sends waiting for another attempt, leased by one poller at a time"""
+
+    @abstractmethod
+    async def insert(self, job: Dict[str, Any]) -> None:
+        """Queue a job"""
+
+    @abstractmethod
+    async def lease(self, owner: str, now: datetime, lease_expires_at: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Lease the due job with the earliest next_attempt_at: pending and due,
+        or leased with an expired lease. Returns the leased job
+        """
+
+    @abstractmethod
+    async def renew(self, job_ids: List[ObjectId], owner: str, lease_expires_at: datetime) -> int:
+        """Extend the leases owner still holds; returns how many were extended"""
+
+    @abstractmethod
+    async def complete(self, job_id: ObjectId, owner: str) -> bool:
+        """Delete a job still leased by owner"""
+
+    @abstractmethod
+    async def release(self, job_id: ObjectId, owner: str, fields: Dict[str, Any]) -> bool:
+        """Set fields, count an attempt and drop the lease of a job still leased by owner"""
+
+    @abstractmethod
+    async def count_by_state(self, states: List[str]) -> Dict[str, int]:
+        """Number of jobs per state"""
+
+
+class Storage:
+    """The repositories of one backend"""
+
+    name = ""
+
+    comment_logs: LogRepository
+    dm_logs: LogRepository
+    daily_stats: DailyStatsRepository
+    hourly_stats: HourlyStatsRepository
+    rules: RuleRepository
+    user_settings: UserSettingsRepository
+    retry_jobs: RetryJobRepository
+
+    def logs(self, collection: str) -> LogRepository:
+        """Log repository by collection name ("comment_logs" or "dm_logs")"""
+        if collection not in ("comment_logs", "dm_logs"):
+            raise KeyError(collection)
+        return getattr(self, collection)
+
+    def rollups(self, collection: str) -> RollupWritable:
+        """Rollup repository by collection name ("daily_stats" or "hourly_stats")"""
+        if collection not in ("daily_stats", "hourly_stats"):
+            raise KeyError(collection)
+        return getattr(self, collection)
+
+    async def ping(self) -> None:
+        """Raise if the backend is unreachable"""
+
+    async def close(self) -> None:
+        """Release the backend's resources"""
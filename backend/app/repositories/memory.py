@@ -0,0 +1,447 @@
+"""
+In-memory storage backend
+
+Keeps everything in process-local dicts with the same semantics as the
+MongoDB backend (duplicate comment rejection, inclusive/exclusive range
+bounds, newest-first (timestamp, _id) paging, upserting $inc/$max on
+dotted paths), so the whole pipeline can be run, profiled and benchmarked
+without a database. Nothing is persisted and nothing is shared between
+processes. Every method runs without awaiting, which makes each call
+atomic on the event loop just like a single-document MongoDB write.
+"""
+
+import asyncio
+import copy
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from app.models.models import StatusEnum
+from app.repositories.base import (
+    DailyStatsRepository,
+    HourlyStatsRepository,
+    LogPosition,
+    LogRepository,
+    RetryJobRepository,
+    RollupOps,
+    RuleRepository,
+    Storage,
+    UserSettingsRepository
+)
+from app.services import hyperloglog
+
+# Bounds of the _id half of (timestamp, _id) positions
+MIN_ID = ObjectId("0" * 24)
+MAX_ID = ObjectId("f" * 24)
+
+# Job states, as named by app.services.retry_queue
+PENDING = "pending"
+LEASED = "leased"
+
+FINAL_STATUSES = (StatusEnum.SENT, StatusEnum.FAILED)
+
+
+def _apply_rollup_ops(document: Dict[str, Any], ops: RollupOps) -> None:
+    """Apply $inc and $max to a document; fields may be dotted paths"""
+    for op, fields in ops.items():
+        for path, value in fields.items():
+            *parents, leaf = path.split(".")
+            target = document
+            for part in parents:
+                target = target.setdefault(part, {})
+            if op == "$inc":
+                target[leaf] = target.get(leaf, 0) + value
+            elif op == "$max":
+                if leaf not in target or value > target[leaf]:
+                    target[leaf] = value
+            else:
+                raise ValueError(f"Unsupported rollup operator: {op}")
+
+
+class MemoryLogRepository(LogRepository):
+    """
+    Logs indexed by (timestamp, _id), per user and overall
+
+    Both indexes are sorted lists searched with bisect; documents are
+    copied on the way in and out, so callers cannot alter stored logs.
+    """
+
+    def __init__(self):
+        self._documents: Dict[ObjectId, Dict[str, Any]] = {}
+        self._by_user: Dict[str, List[LogPosition]] = defaultdict(list)
+        self._by_time: List[LogPosition] = []
+        self._by_comment_id: Dict[str, ObjectId] = {}
+
+    def _add(self, document: Dict[str, Any]) -> bool:
+        if document["_id"] in self._documents:
+            return False
+        comment_id = document.get("comment_id")
+        # Mirrors the partial unique index on string comment_ids
+        if isinstance(comment_id, str):
+            if comment_id in self._by_comment_id:
+                return False
+            self._by_comment_id[comment_id] = document["_id"]
+        stored = dict(document)
+        self._documents[stored["_id"]] = stored
+        self._index(stored)
+        return True
+
+    def _index(self, document: Dict[str, Any]) -> None:
+        position = (document["timestamp"], document["_id"])
+        insort(self._by_user[document["user_id"]], position)
+        insort(self._by_time, position)
+
+    def _unindex(self, document: Dict[str, Any]) -> None:
+        position = (document["timestamp"], document["_id"])
+        for positions in (self._by_user[document["user_id"]], self._by_time):
+            i = bisect_left(positions, position)
+            if i < len(positions) and positions[i] == position:
+                del positions[i]
+
+    def _range(self, positions: List[LogPosition], start: datetime, end: datetime) -> List[LogPosition]:
+        """Positions with start <= timestamp < end"""
+        return positions[bisect_left(positions, (start, MIN_ID)):bisect_left(positions, (end, MIN_ID))]
+
+    def _final_logs(self, user_id: str, start: datetime, end: datetime):
+        for _, _id in self._range(self._by_user.get(user_id, []), start, end):
+            log = self._documents[_id]
+            if log.get("status") in FINAL_STATUSES:
+                yield log
+
+    async def claim(self, document: Dict[str, Any]) -> Optional[ObjectId]:
+        document.setdefault("_id", ObjectId())
+        return document["_id"] if self._add(document) else None
+
+    async def bulk_insert(self, documents: List[Dict[str, Any]]) -> int:
+        written = 0
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            written += self._add(document)
+        return written
+
+    async def bulk_update(self, changes: Dict[ObjectId, Dict[str, Any]]) -> int:
+        for _id, fields in changes.items():
+            document = self._documents.get(_id)
+            if document is None:
+                continue
+            reindex = "timestamp" in fields or "user_id" in fields
+            if reindex:
+                self._unindex(document)
+            document.update(fields)
+            if reindex:
+                self._index(document)
+        return len(changes)
+
+    async def page(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        skip: int = 0,
+        after: Optional[LogPosition] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        positions = self._by_user.get(user_id, [])
+        low = bisect_left(positions, (start, MIN_ID))
+        high = bisect_right(positions, (end, MAX_ID))
+        if after is not None:
+            high = min(high, bisect_left(positions, after))
+        high -= skip
+        if high <= low:
+            return []
+        documents = [self._documents[_id] for _, _id in reversed(positions[max(low, high - limit):high])]
+        if fields:
+            keys = ["_id", *fields]
+            return [{k: doc[k] for k in keys if k in doc} for doc in documents]
+        return [dict(doc) for doc in documents]
+
+    async def count(self, start: datetime, end: datetime, user_id: Optional[str] = None) -> int:
+        positions = self._by_time if user_id is None else self._by_user.get(user_id, [])
+        return max(0, bisect_right(positions, (end, MAX_ID)) - bisect_left(positions, (start, MIN_ID)))
+
+    async def count_by_day(self, user_id: str, start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for log in self._final_logs(user_id, start, end):
+            counts[(log["timestamp"].strftime("%Y-%m-%d"), log["status"])] += 1
+        return dict(counts)
+
+    async def count_by_quarter(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime
+    ) -> Dict[Tuple[datetime, int, str], int]:
+        counts: Dict[Tuple[datetime, int, str], int] = defaultdict(int)
+        for log in self._final_logs(user_id, start, end):
+            timestamp = log["timestamp"]
+            hour = timestamp.replace(minute=0, second=0, microsecond=0)
+            counts[(hour, timestamp.minute // 15, log["status"])] += 1
+        return dict(counts)
+
+    async def commenters(self, user_id: str, start: datetime, end: datetime) -> List[str]:
+        return list({
+            # $toLower turns a missing username into ""
+            (self._documents[_id].get("username") or "").lower()
+            for _, _id in self._range(self._by_user.get(user_id, []), start, end)
+        })
+
+    async def reply_latencies(self, user_id: str, start: datetime, end: datetime) -> List[float]:
+        latencies = []
+        for _, _id in self._range(self._by_user.get(user_id, []), start, end):
+            log = self._documents[_id]
+            if log.get("status") == StatusEnum.SENT and isinstance(log.get("sent_at"), datetime):
+                latencies.append(max(0.0, (log["sent_at"] - log["timestamp"]).total_seconds() * 1000))
+        return latencies
+
+    async def user_ids(self, start: datetime, end: datetime) -> List[str]:
+        return list({self._documents[_id]["user_id"] for _, _id in self._range(self._by_time, start, end)})
+
+    async def oldest_timestamp(self, since: Optional[datetime] = None) -> Optional[datetime]:
+        i = 0 if since is None else bisect_left(self._by_time, (since, MIN_ID))
+        return self._by_time[i][0] if i < len(self._by_time) else None
+
+    async def stream(self, start: datetime, end: datetime, batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        positions = self._range(self._by_time, start, end)
+        for i, (_, _id) in enumerate(positions):
+            if i and i % batch_size == 0:
+                # Let other tasks run between batches, as a cursor would
+                await asyncio.sleep(0)
+            log = self._documents.get(_id)
+            if log is not None:
+                yield dict(log)
+
+    async def delete_between(self, start: datetime, end: datetime) -> int:
+        positions = self._range(self._by_time, start, end)
+        for _, _id in positions:
+            log = self._documents.pop(_id)
+            self._unindex(log)
+            if self._by_comment_id.get(log.get("comment_id")) == _id:
+                del self._by_comment_id[log["comment_id"]]
+        return len(positions)
+
+
+class MemoryRollupRepository:
+    """Rollup documents keyed by user_id and one more field"""
+
+    key_field = ""
+
+    def __init__(self):
+        self._documents: Dict[str, Dict[Any, Dict[str, Any]]] = defaultdict(dict)
+
+    def _get_or_create(self, user_id: str, key: Any, now: datetime) -> Dict[str, Any]:
+        documents = self._documents[user_id]
+        if key not in documents:
+            documents[key] = {"_id": ObjectId(), "user_id": user_id, self.key_field: key, "created_at": now}
+        return documents[key]
+
+    async def bulk_upsert(self, operations: List[Tuple[Dict[str, Any], RollupOps]], now: datetime) -> int:
+        for key, ops in operations:
+            document = self._get_or_create(key["user_id"], key[self.key_field], now)
+            _apply_rollup_ops(document, ops)
+            document["updated_at"] = now
+        return len(operations)
+
+
+class MemoryDailyStatsRepository(MemoryRollupRepository, DailyStatsRepository):
+    """Daily rollups keyed by user_id and date"""
+
+    key_field = "date"
+
+    async def sum_counters(self, user_id: str, fields: List[str]) -> Dict[str, int]:
+        days = self._documents.get(user_id, {}).values()
+        return {field: sum(day.get(field, 0) for day in days) for field in fields}
+
+    async def merge_commenters(self, user_id: str) -> Dict[int, int]:
+        # Stored register indexes are strings, as BSON keys must be
+        return hyperloglog.merge(*(
+            {int(index): rank for index, rank in day["commenters_hll"].items()}
+            for day in self._documents.get(user_id, {}).values()
+            if day.get("commenters_hll")
+        ))
+
+    async def merge_latencies(self, user_id: str, since: str) -> Tuple[Dict[int, int], int, int]:
+        histogram: Dict[int, int] = defaultdict(int)
+        count = sum_ms = 0
+        for date, day in self._documents.get(user_id, {}).items():
+            if date < since:
+                continue
+            for bucket, bucket_count in (day.get("latency_hist") or {}).items():
+                histogram[int(bucket)] += bucket_count
+            count += day.get("latency_count", 0)
+            sum_ms += day.get("latency_sum_ms", 0)
+        return dict(histogram), count, sum_ms
+
+    async def replace_day(self, user_id: str, date: str, fields: Dict[str, Any]) -> None:
+        day = self._documents[user_id].setdefault(date, {"_id": ObjectId(), "user_id": user_id, "date": date})
+        day.update(copy.deepcopy(fields))
+
+    async def user_ids(self, date: str) -> List[str]:
+        return [user_id for user_id, days in self._documents.items() if date in days]
+
+
+class MemoryHourlyStatsRepository(MemoryRollupRepository, HourlyStatsRepository):
+    """Hourly rollups keyed by user_id and UTC hour"""
+
+    key_field = "hour"
+
+    async def find_range(self, user_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        return [
+            {"_id": row["_id"], "hour": hour, "quarters": copy.deepcopy(row.get("quarters", {}))}
+            for hour, row in self._documents.get(user_id, {}).items()
+            if start <= hour < end
+        ]
+
+    async def replace_hours(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        quarters: Dict[datetime, Dict[str, Dict[str, int]]]
+    ) -> None:
+        now = datetime.utcnow()
+        hours = self._documents[user_id]
+        hour = start
+        while hour < end:
+            counts = quarters.get(hour)
+            if counts or hour in hours:
+                row = self._get_or_create(user_id, hour, now)
+                row["quarters"] = copy.deepcopy(counts or {})
+                row["updated_at"] = now
+            hour += timedelta(hours=1)
+
+    async def delete_before(self, cutoff: datetime) -> int:
+        deleted = 0
+        for hours in self._documents.values():
+            for hour in [hour for hour in hours if hour < cutoff]:
+                del hours[hour]
+                deleted += 1
+        return deleted
+
+
+class MemoryRuleRepository(RuleRepository):
+    """Rules per user, in insertion order"""
+
+    def __init__(self):
+        self._rules: Dict[str, Dict[ObjectId, Dict[str, Any]]] = defaultdict(dict)
+
+    async def active_rules(self, user_id: str) -> List[Dict[str, Any]]:
+        return [copy.deepcopy(r) for r in self._rules.get(user_id, {}).values() if r.get("is_active") is True]
+
+    async def count_active(self, user_id: str) -> int:
+        return sum(1 for r in self._rules.get(user_id, {}).values() if r.get("is_active") is True)
+
+    async def list(self, user_id: str) -> List[Dict[str, Any]]:
+        rules = sorted(self._rules.get(user_id, {}).values(), key=lambda r: r.get("created_at") or datetime.min)
+        return [copy.deepcopy(r) for r in rules]
+
+    async def get(self, user_id: str, rule_id: ObjectId) -> Optional[Dict[str, Any]]:
+        rule = self._rules.get(user_id, {}).get(rule_id)
+        return copy.deepcopy(rule) if rule is not None else None
+
+    async def create(self, document: Dict[str, Any]) -> ObjectId:
+        document.setdefault("_id", ObjectId())
+        self._rules[document["user_id"]][document["_id"]] = copy.deepcopy(document)
+        return document["_id"]
+
+    async def update(self, user_id: str, rule_id: ObjectId, changes: Dict[str, Any]) -> bool:
+        rule = self._rules.get(user_id, {}).get(rule_id)
+        if rule is None:
+            return False
+        rule.update(copy.deepcopy(changes))
+        return True
+
+    async def delete(self, user_id: str, rule_id: ObjectId) -> bool:
+        return self._rules.get(user_id, {}).pop(rule_id, None) is not None
+
+
+class MemoryUserSettingsRepository(UserSettingsRepository):
+    """Timezones per user"""
+
+    def __init__(self):
+        self._timezones: Dict[str, str] = {}
+
+    async def get_timezone(self, user_id: str) -> Optional[str]:
+        return self._timezones.get(user_id)
+
+    async def set_timezone(self, user_id: str, timezone: str) -> None:
+        self._timezones[user_id] = timezone
+
+
+class MemoryRetryJobRepository(RetryJobRepository):
+    """Retry jobs by _id; leasing scans for the earliest due job"""
+
+    def __init__(self):
+        self._jobs: Dict[ObjectId, Dict[str, Any]] = {}
+
+    def _leased_by(self, job_id: ObjectId, owner: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None or job.get("state") != LEASED or job.get("lease_owner") != owner:
+            return None
+        return job
+
+    async def insert(self, job: Dict[str, Any]) -> None:
+        job.setdefault("_id", ObjectId())
+        self._jobs[job["_id"]] = copy.deepcopy(job)
+
+    async def lease(self, owner: str, now: datetime, lease_expires_at: datetime) -> Optional[Dict[str, Any]]:
+        due = [
+            job for job in self._jobs.values()
+            if (job.get("state") == PENDING and job["next_attempt_at"] <= now)
+            or (job.get("state") == LEASED and job["lease_expires_at"] <= now)
+        ]
+        if not due:
+            return None
+        job = min(due, key=lambda j: j["next_attempt_at"])
+        job.update({"state": LEASED, "lease_owner": owner, "lease_expires_at": lease_expires_at, "updated_at": now})
+        return copy.deepcopy(job)
+
+    async def renew(self, job_ids: List[ObjectId], owner: str, lease_expires_at: datetime) -> int:
+        renewed = 0
+        for job_id in job_ids:
+            job = self._leased_by(job_id, owner)
+            if job is not None:
+                job["lease_expires_at"] = lease_expires_at
+                renewed += 1
+        return renewed
+
+    async def complete(self, job_id: ObjectId, owner: str) -> bool:
+        if self._leased_by(job_id, owner) is None:
+            return False
+        del self._jobs[job_id]
+        return True
+
+    async def release(self, job_id: ObjectId, owner: str, fields: Dict[str, Any]) -> bool:
+        job = self._leased_by(job_id, owner)
+        if job is None:
+            return False
+        job.update(copy.deepcopy(fields))
+        job["attempts"] = job.get("attempts", 0) + 1
+        job.pop("lease_owner", None)
+        job.pop("lease_expires_at", None)
+        return True
+
+    async def count_by_state(self, states: List[str]) -> Dict[str, int]:
+        counts = dict.fromkeys(states, 0)
+        for job in self._jobs.values():
+            if job.get("state") in counts:
+                counts[job["state"]] += 1
+        return counts
+
+
+class MemoryStorage(Storage):
+    """Empty in-memory repositories"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.comment_logs = MemoryLogRepository()
+        self.dm_logs = MemoryLogRepository()
+        self.daily_stats = MemoryDailyStatsRepository()
+        self.hourly_stats = MemoryHourlyStatsRepository()
+        self.rules = MemoryRuleRepository()
+        self.user_settings = MemoryUserSettingsRepository()
+        self.retry_jobs = MemoryRetryJobRepository()
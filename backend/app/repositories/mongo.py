@@ -0,0 +1,433 @@
+"""MongoDB storage backend on the shared Motor client"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.db import mongodb
+from app.models.models import StatusEnum
+from app.repositories.base import (
+    DailyStatsRepository,
+    HourlyStatsRepository,
+    LogPosition,
+    LogRepository,
+    RetryJobRepository,
+    RollupOps,
+    RuleRepository,
+    Storage,
+    StorageError,
+    UserSettingsRepository
+)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Job states, as named by app.services.retry_queue
+PENDING = "pending"
+LEASED = "leased"
+
+
+async def _bulk(collection: AsyncIOMotorCollection, operation, count: int) -> int:
+    """
+    Await an unordered bulk write and return the number of operations written
+    Duplicates were already written by another worker and are skipped;
+    anything else raises StorageError
+    """
+    try:
+        await operation
+        return count
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        failed = [err for err in errors if err.get("code") != DUPLICATE_KEY_ERROR]
+        if failed:
+            raise StorageError(
+                f"{len(failed)} writes to {collection.name} failed: {failed[0].get('errmsg')}",
+                written=count - len(errors),
+                failed=[err["index"] for err in failed]
+            ) from e
+        return count - len(errors)
+
+
+class MongoLogWritable:
+    """Bulk log writes of the log buffer"""
+
+    collection: AsyncIOMotorCollection
+
+    async def bulk_insert(self, documents: List[Dict[str, Any]]) -> int:
+        return await _bulk(self.collection, self.collection.insert_many(documents, ordered=False), len(documents))
+
+    async def bulk_update(self, changes: Dict[ObjectId, Dict[str, Any]]) -> int:
+        return await _bulk(self.collection, self.collection.bulk_write(
+            [UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in changes.items()],
+            ordered=False
+        ), len(changes))
+
+
+class MongoRollupWritable:
+    """Bulk rollup writes of the log buffer"""
+
+    collection: AsyncIOMotorCollection
+
+    async def bulk_upsert(self, operations: List[Tuple[Dict[str, Any], RollupOps]], now: datetime) -> int:
+        return await _bulk(self.collection, self.collection.bulk_write(
+            [
+                UpdateOne(
+                    key,
+                    {
+                        **{op: fields for op, fields in ops.items() if fields},
+                        "$set": {"updated_at": now},
+                        "$setOnInsert": {"created_at": now}
+                    },
+                    upsert=True
+                )
+                for key, ops in operations
+            ],
+            ordered=False
+        ), len(operations))
+
+
+class MongoLogRepository(MongoLogWritable, LogRepository):
+    """Logs in a comment_logs or dm_logs collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def claim(self, document: Dict[str, Any]) -> Optional[ObjectId]:
+        # The unique comment_id index makes the insert the claim
+        try:
+            result = await self.collection.insert_one(document)
+        except DuplicateKeyError:
+            return None
+        return result.inserted_id
+
+    async def page(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        skip: int = 0,
+        after: Optional[LogPosition] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}
+        if after is not None:
+            timestamp, _id = after
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": _id}}
+            ]
+        return await self.collection.find(query, list(fields) if fields else None).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).skip(skip).limit(limit).to_list(length=limit)
+
+    async def count(self, start: datetime, end: datetime, user_id: Optional[str] = None) -> int:
+        query: Dict[str, Any] = {"timestamp": {"$gte": start, "$lte": end}}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self.collection.count_documents(query)
+
+    def _final(self, user_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        return {"$match": {
+            "user_id": user_id,
+            "timestamp": {"$gte": start, "$lt": end},
+            "status": {"$in": [StatusEnum.SENT, StatusEnum.FAILED]}
+        }}
+
+    async def count_by_day(self, user_id: str, start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        rows = await self.collection.aggregate([
+            self._final(user_id, start, end),
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                    "status": "$status"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]).to_list(length=None)
+        return {(r["_id"]["day"], r["_id"]["status"]): r["count"] for r in rows}
+
+    async def count_by_quarter(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime
+    ) -> Dict[Tuple[datetime, int, str], int]:
+        rows = await self.collection.aggregate([
+            self._final(user_id, start, end),
+            {"$group": {
+                "_id": {
+                    "hour": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
+                    "quarter": {"$floor": {"$divide": [{"$minute": "$timestamp"}, 15]}},
+                    "status": "$status"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]).to_list(length=None)
+        return {
+            (
+                datetime.strptime(r["_id"]["hour"], "%Y-%m-%dT%H"),
+                int(r["_id"]["quarter"]),
+                r["_id"]["status"]
+            ): r["count"]
+            for r in rows
+        }
+
+    async def commenters(self, user_id: str, start: datetime, end: datetime) -> List[str]:
+        rows = await self.collection.aggregate([
+            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lt": end}}},
+            {"$group": {"_id": {"$toLower": "$username"}}}
+        ]).to_list(length=None)
+        return [r["_id"] for r in rows if r["_id"] is not None]
+
+    async def reply_latencies(self, user_id: str, start: datetime, end: datetime) -> List[float]:
+        replies = await self.collection.find(
+            {
+                "user_id": user_id,
+                "timestamp": {"$gte": start, "$lt": end},
+                "status": StatusEnum.SENT,
+                "sent_at": {"$type": "date"}
+            },
+            {"timestamp": 1, "sent_at": 1}
+        ).to_list(length=None)
+        return [max(0.0, (r["sent_at"] - r["timestamp"]).total_seconds() * 1000) for r in replies]
+
+    async def user_ids(self, start: datetime, end: datetime) -> List[str]:
+        return await self.collection.distinct("user_id", {"timestamp": {"$gte": start, "$lt": end}})
+
+    async def oldest_timestamp(self, since: Optional[datetime] = None) -> Optional[datetime]:
+        query = {"timestamp": {"$gte": since}} if since is not None else {}
+        log = await self.collection.find_one(query, {"timestamp": 1}, sort=[("timestamp", 1)])
+        return log["timestamp"] if log is not None else None
+
+    async def stream(self, start: datetime, end: datetime, batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"timestamp": {"$gte": start, "$lt": end}}
+        ).sort("timestamp", 1).batch_size(batch_size)
+        async for log in cursor:
+            yield log
+
+    async def delete_between(self, start: datetime, end: datetime) -> int:
+        result = await self.collection.delete_many({"timestamp": {"$gte": start, "$lt": end}})
+        return result.deleted_count
+
+
+class MongoDailyStatsRepository(MongoRollupWritable, DailyStatsRepository):
+    """Rollups in the daily_stats collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def sum_counters(self, user_id: str, fields: List[str]) -> Dict[str, int]:
+        rows = await self.collection.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": None, **{field: {"$sum": f"${field}"} for field in fields}}}
+        ]).to_list(length=1)
+        totals = rows[0] if rows else {}
+        return {field: totals.get(field, 0) for field in fields}
+
+    async def merge_commenters(self, user_id: str) -> Dict[int, int]:
+        rows = await self.collection.aggregate([
+            {"$match": {"user_id": user_id, "commenters_hll": {"$exists": True}}},
+            {"$project": {"registers": {"$objectToArray": "$commenters_hll"}}},
+            {"$unwind": "$registers"},
+            {"$group": {"_id": "$registers.k", "rank": {"$max": "$registers.v"}}}
+        ]).to_list(length=None)
+        return {int(r["_id"]): r["rank"] for r in rows}
+
+    async def merge_latencies(self, user_id: str, since: str) -> Tuple[Dict[int, int], int, int]:
+        match = {"user_id": user_id, "date": {"$gte": since}}
+        buckets, totals = await asyncio.gather(
+            self.collection.aggregate([
+                {"$match": {**match, "latency_hist": {"$exists": True}}},
+                {"$project": {"buckets": {"$objectToArray": "$latency_hist"}}},
+                {"$unwind": "$buckets"},
+                {"$group": {"_id": "$buckets.k", "count": {"$sum": "$buckets.v"}}}
+            ]).to_list(length=None),
+            self.collection.aggregate([
+                {"$match": match},
+                {"$group": {
+                    "_id": None,
+                    "count": {"$sum": "$latency_count"},
+                    "sum_ms": {"$sum": "$latency_sum_ms"}
+                }}
+            ]).to_list(length=1)
+        )
+        histogram = {int(b["_id"]): b["count"] for b in buckets}
+        if not totals:
+            return histogram, 0, 0
+        return histogram, totals[0]["count"], totals[0]["sum_ms"]
+
+    async def replace_day(self, user_id: str, date: str, fields: Dict[str, Any]) -> None:
+        await self.collection.update_one({"user_id": user_id, "date": date}, {"$set": fields}, upsert=True)
+
+    async def user_ids(self, date: str) -> List[str]:
+        return await self.collection.distinct("user_id", {"date": date})
+
+
+class MongoHourlyStatsRepository(MongoRollupWritable, HourlyStatsRepository):
+    """Rollups in the hourly_stats collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def find_range(self, user_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        return await self.collection.find(
+            {"user_id": user_id, "hour": {"$gte": start, "$lt": end}},
+            {"hour": 1, "quarters": 1}
+        ).to_list(length=None)
+
+    async def replace_hours(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime,
+        quarters: Dict[datetime, Dict[str, Dict[str, int]]]
+    ) -> None:
+        now = datetime.utcnow()
+        operations = []
+        hour = start
+        while hour < end:
+            counts = quarters.get(hour)
+            operations.append(UpdateOne(
+                {"user_id": user_id, "hour": hour},
+                {"$set": {"quarters": counts or {}, "updated_at": now}},
+                upsert=bool(counts)
+            ))
+            hour += timedelta(hours=1)
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def delete_before(self, cutoff: datetime) -> int:
+        result = await self.collection.delete_many({"hour": {"$lt": cutoff}})
+        return result.deleted_count
+
+
+class MongoRuleRepository(RuleRepository):
+    """Rules in the automation_rules collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def active_rules(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self.collection.find({"user_id": user_id, "is_active": True}).to_list(length=None)
+
+    async def count_active(self, user_id: str) -> int:
+        return await self.collection.count_documents({"user_id": user_id, "is_active": True})
+
+    async def list(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self.collection.find({"user_id": user_id}).sort("created_at", 1).to_list(length=None)
+
+    async def get(self, user_id: str, rule_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": rule_id, "user_id": user_id})
+
+    async def create(self, document: Dict[str, Any]) -> ObjectId:
+        result = await self.collection.insert_one(document)
+        return result.inserted_id
+
+    async def update(self, user_id: str, rule_id: ObjectId, changes: Dict[str, Any]) -> bool:
+        result = await self.collection.update_one({"_id": rule_id, "user_id": user_id}, {"$set": changes})
+        return result.matched_count > 0
+
+    async def delete(self, user_id: str, rule_id: ObjectId) -> bool:
+        result = await self.collection.delete_one({"_id": rule_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+
+class MongoUserSettingsRepository(UserSettingsRepository):
+    """Preferences in the user_settings collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def get_timezone(self, user_id: str) -> Optional[str]:
+        user_settings = await self.collection.find_one({"user_id": user_id}, {"timezone": 1}) or {}
+        return user_settings.get("timezone")
+
+    async def set_timezone(self, user_id: str, timezone: str) -> None:
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"timezone": timezone, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+
+class MongoRetryJobRepository(RetryJobRepository):
+    """Jobs in the retry_queue collection"""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def insert(self, job: Dict[str, Any]) -> None:
+        await self.collection.insert_one(job)
+
+    async def lease(self, owner: str, now: datetime, lease_expires_at: datetime) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"state": PENDING, "next_attempt_at": {"$lte": now}},
+                    {"state": LEASED, "lease_expires_at": {"$lte": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "state": LEASED,
+                    "lease_owner": owner,
+                    "lease_expires_at": lease_expires_at,
+                    "updated_at": now
+                }
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def renew(self, job_ids: List[ObjectId], owner: str, lease_expires_at: datetime) -> int:
+        result = await self.collection.update_many(
+            {"_id": {"$in": job_ids}, "lease_owner": owner, "state": LEASED},
+            {"$set": {"lease_expires_at": lease_expires_at}}
+        )
+        return result.matched_count
+
+    async def complete(self, job_id: ObjectId, owner: str) -> bool:
+        result = await self.collection.delete_one({"_id": job_id, "lease_owner": owner, "state": LEASED})
+        return result.deleted_count > 0
+
+    async def release(self, job_id: ObjectId, owner: str, fields: Dict[str, Any]) -> bool:
+        result = await self.collection.update_one(
+            {"_id": job_id, "lease_owner": owner, "state": LEASED},
+            {"$set": fields, "$inc": {"attempts": 1}, "$unset": {"lease_owner": "", "lease_expires_at": ""}}
+        )
+        return result.modified_count > 0
+
+    async def count_by_state(self, states: List[str]) -> Dict[str, int]:
+        # One indexed count per state rather than a $group over every job
+        counts = await asyncio.gather(*(
+            self.collection.count_documents({"state": state}) for state in states
+        ))
+        return dict(zip(states, counts))
+
+
+class MongoStorage(Storage):
+    """Repositories over the collections of one database"""
+
+    name = "mongo"
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.comment_logs = MongoLogRepository(db["comment_logs"])
+        self.dm_logs = MongoLogRepository(db["dm_logs"])
+        self.daily_stats = MongoDailyStatsRepository(db["daily_stats"])
+        self.hourly_stats = MongoHourlyStatsRepository(db["hourly_stats"])
+        self.rules = MongoRuleRepository(db["automation_rules"])
+        self.user_settings = MongoUserSettingsRepository(db["user_settings"])
+        self.retry_jobs = MongoRetryJobRepository(db["retry_queue"])
+
+    async def ping(self) -> None:
+        await self.db.command("ping")
+
+    async def close(self) -> None:
+        await mongodb.close_mongo_connection()
@@ -1,33 +1,61 @@
 """Service for analytics and statistics operations"""
 
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from app.db.mongodb import get_db
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
 from app.models.models import CommentLog, DMLog, DailyStats, StatusEnum
+from app.repositories import get_storage
+from app.repositories.base import Storage
+from app.services import hyperloglog, latency_histogram, local_time
+from app.services.log_buffer import log_buffer
+from app.services.log_cursor import decode_cursor, encode_cursor
+from app.services.stats_cache import stats_cache
 from bson import ObjectId
 
 
+# Rollup counter incremented when a log reaches a final status
+ROLLUP_FIELDS = {
+    ("comment_logs", StatusEnum.SENT): "comments_count",
+    ("comment_logs", StatusEnum.FAILED): "failed_comments",
+    ("dm_logs", StatusEnum.SENT): "dms_count",
+    ("dm_logs", StatusEnum.FAILED): "failed_dms"
+}
+
+
 class AnalyticsService:
-    """Service for handling analytics and dashboard statistics"""
+    """
+    Service for handling analytics and dashboard statistics
+    Stateless; the process shares the analytics_service instance
+    """
 
-    def __init__(self):
-        self.db = get_db()
+    @property
+    def storage(self) -> Storage:
+        return get_storage()
 
     async def get_dashboard_stats(self, user_id: str) -> Dict:
         """
         Get comprehensive dashboard statistics for a user
         Returns: total_comments, total_dms, active_rules, engagement_rate, etc.
+        Served from the stats cache; see StatsCache for freshness
         """
-        today = datetime.utcnow().strftime("%Y-%m-%d")
+        return await stats_cache.get(user_id, lambda: self._build_dashboard_stats(user_id))
 
-        # Get today's stats
-        today_stats = await self._get_today_stats(user_id)
-        # Get all-time stats
-        all_time_stats = await self._get_all_time_stats(user_id)
-        # Get weekly activity data
-        weekly_data = await self._get_weekly_activity(user_id)
-        # Get engagement metrics
-        metrics = await self._get_engagement_metrics(user_id)
+    async def _build_dashboard_stats(self, user_id: str) -> Dict:
+        """
+        Assemble the dashboard statistics, running the sub-queries concurrently
+        Today and the weekly chart follow the user's timezone
+        """
+        tz = await self.get_user_timezone(user_id)
+        today = local_time.local_today(tz)
+
+        today_stats, all_time_stats, weekly_data, metrics = await asyncio.gather(
+            self._get_today_stats(user_id, tz),
+            self._get_all_time_stats(user_id),
+            self._get_weekly_activity(user_id, tz),
+            self._get_engagement_metrics(user_id, tz)
+        )
 
         return {
             "total_comments": all_time_stats["total_comments"],
@@ -37,138 +65,136 @@ class AnalyticsService:
             "today_comments": today_stats["comments"],
             "today_dms_sent": today_stats["dms"],
             "response_time_avg": metrics["avg_response_time"],
+            "response_time_p50": metrics["response_time_p50"],
+            "response_time_p95": metrics["response_time_p95"],
+            "response_time_p99": metrics["response_time_p99"],
             "success_rate": metrics["success_rate"],
             "failed_actions": all_time_stats["failed_actions"],
             "weekly_activity": weekly_data,
-            "today_date": today
+            "today_date": today.strftime("%Y-%m-%d")
         }
 
-    async def _get_today_stats(self, user_id: str) -> Dict:
+    async def get_user_timezone(self, user_id: str) -> ZoneInfo:
         """
-        Get today's statistics
+        Get the timezone a user's days are counted in
+        Falls back to settings.TIMEZONE when the user has not chosen one
         """
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        today_start = datetime.strptime(today, "%Y-%m-%d")
-        today_end = today_start + timedelta(days=1)
-
-        comments_col = self.db["comment_logs"]
-        dms_col = self.db["dm_logs"]
+        return local_time.get_timezone(await self.storage.user_settings.get_timezone(user_id))
 
-        comments = await comments_col.count_documents({
-            "user_id": user_id,
-            "timestamp": {
-                "$gte": today_start,
-                "$lt": today_end
-            }
-        })
+    async def set_user_timezone(self, user_id: str, timezone: str) -> str:
+        """
+        Store the timezone of a user
+        Raises UnknownTimezoneError for names missing from the IANA database
+        """
+        tz = local_time.get_timezone(timezone)
+        await self.storage.user_settings.set_timezone(user_id, tz.key)
+        stats_cache.invalidate(user_id)
+        return tz.key
 
-        dms = await dms_col.count_documents({
-            "user_id": user_id,
-            "timestamp": {
-                "$gte": today_start,
-                "$lt": today_end
-            }
-        })
+    async def _sum_by_local_day(
+        self,
+        user_id: str,
+        tz: ZoneInfo,
+        first_day: date,
+        last_day: date
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Sum the hourly rollups per local date (YYYY-MM-DD) of a timezone
+        Reads at most one small document per UTC hour of the range
+        """
+        start = local_time.local_midnight(tz, first_day)
+        end = local_time.local_midnight(tz, last_day + timedelta(days=1))
+
+        rows = await self.storage.hourly_stats.find_range(user_id, local_time.hour_bucket(start)[0], end)
+
+        by_date: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS.values(), 0))
+        for row in rows:
+            for quarter, counts in (row.get("quarters") or {}).items():
+                at = row["hour"] + int(quarter) * local_time.QUARTER
+                if not start <= at < end:
+                    continue
+                totals = by_date[local_time.local_date(tz, at)]
+                for field in ROLLUP_FIELDS.values():
+                    totals[field] += counts.get(field, 0)
+        return by_date
+
+    async def _get_today_stats(self, user_id: str, tz: ZoneInfo) -> Dict:
+        """
+        Get today's statistics (in the user's timezone) from the hourly rollups
+        """
+        today = local_time.local_today(tz)
+        by_date = await self._sum_by_local_day(user_id, tz, today, today)
+        stats = by_date.get(today.strftime("%Y-%m-%d"), {})
 
         return {
-            "comments": comments,
-            "dms": dms
+            "comments": stats.get("comments_count", 0) + stats.get("failed_comments", 0),
+            "dms": stats.get("dms_count", 0) + stats.get("failed_dms", 0)
         }
 
     async def _get_all_time_stats(self, user_id: str) -> Dict:
         """
-        Get all-time statistics
+        Get all-time statistics by summing the daily rollups
         """
-        comments_col = self.db["comment_logs"]
-        dms_col = self.db["dm_logs"]
-        rules_col = self.db["automation_rules"]
-
-        total_comments = await comments_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.SENT
-        })
-
-        total_dms = await dms_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.SENT
-        })
+        totals = await self._sum_rollups(user_id)
 
-        failed_comments = await comments_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.FAILED
-        })
-
-        failed_dms = await dms_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.FAILED
-        })
-
-        active_rules = await rules_col.count_documents({
-            "user_id": user_id,
-            "is_active": True
-        })
+        active_rules = await self.storage.rules.count_active(user_id)
 
         return {
-            "total_comments": total_comments,
-            "total_dms_sent": total_dms,
-            "failed_actions": failed_comments + failed_dms,
+            "total_comments": totals["comments_count"],
+            "total_dms_sent": totals["dms_count"],
+            "failed_actions": totals["failed_comments"] + totals["failed_dms"],
             "active_rules": active_rules
         }
 
-    async def _get_weekly_activity(self, user_id: str) -> Dict:
+    async def _get_weekly_activity(self, user_id: str, tz: ZoneInfo) -> Dict:
         """
         Get weekly activity data for charts
         """
-        comments_col = self.db["comment_logs"]
-        dms_col = self.db["dm_logs"]
+        return await self.get_activity(user_id, days=7, tz=tz)
+
+    async def _rebuild_hourly_stats(self, user_id: str, start: datetime, end: datetime) -> None:
+        """
+        Rebuild the hourly rollups between two UTC hours from the raw logs
+        """
+        comment_counts, dm_counts = await asyncio.gather(
+            self.storage.comment_logs.count_by_quarter(user_id, start, end),
+            self.storage.dm_logs.count_by_quarter(user_id, start, end)
+        )
+        hours: Dict[datetime, Dict[str, Dict[str, int]]] = defaultdict(dict)
+        for collection, counts in (("comment_logs", comment_counts), ("dm_logs", dm_counts)):
+            for (hour, quarter, status), count in counts.items():
+                hours[hour].setdefault(str(quarter), {})[ROLLUP_FIELDS[(collection, status)]] = count
+
+        # Hours without logs are only cleared, never created
+        await self.storage.hourly_stats.replace_hours(user_id, start, end, hours)
+
+    async def get_activity(self, user_id: str, days: int = 7, tz: Optional[ZoneInfo] = None) -> Dict:
+        """
+        Get per-day activity data for charts over the last N days
+        Days are local to tz (the user's timezone by default) and derived
+        from the hourly rollups, whatever the log volume
+        """
+        if tz is None:
+            tz = await self.get_user_timezone(user_id)
+        today = local_time.local_today(tz)
+        start = today - timedelta(days=days - 1)
+        by_date = await self._sum_by_local_day(user_id, tz, start, today)
 
-        # Get last 7 days
         data_points = []
         total_comments = 0
         total_dms = 0
 
-        for i in range(6, -1, -1):  # Last 7 days
-            day = datetime.utcnow() - timedelta(days=i)
-            day_start = datetime(day.year, day.month, day.day)
-            day_end = day_start + timedelta(days=1)
-            day_str = day_start.strftime("%a")  # Mon, Tue, etc.
-
-            comments = await comments_col.count_documents({
-                "user_id": user_id,
-                "status": StatusEnum.SENT,
-                "timestamp": {
-                    "$gte": day_start,
-                    "$lt": day_end
-                }
-            })
+        for i in range(days):
+            day = start + timedelta(days=i)
+            stats = by_date.get(day.strftime("%Y-%m-%d"), {})
 
-            dms = await dms_col.count_documents({
-                "user_id": user_id,
-                "status": StatusEnum.SENT,
-                "timestamp": {
-                    "$gte": day_start,
-                    "$lt": day_end
-                }
-            })
-
-            failed = await comments_col.count_documents({
-                "user_id": user_id,
-                "status": StatusEnum.FAILED,
-                "timestamp": {
-                    "$gte": day_start,
-                    "$lt": day_end
-                }
-            }) + await dms_col.count_documents({
-                "user_id": user_id,
-                "status": StatusEnum.FAILED,
-                "timestamp": {
-                    "$gte": day_start,
-                    "$lt": day_end
-                }
-            })
+            comments = stats.get("comments_count", 0)
+            dms = stats.get("dms_count", 0)
+            failed = stats.get("failed_comments", 0) + stats.get("failed_dms", 0)
 
             data_points.append({
-                "date": day_str,
+                # Mon, Tue, etc. for the weekly chart, dates for longer windows
+                "date": day.strftime("%a") if days <= 7 else day.strftime("%Y-%m-%d"),
                 "comments": comments,
                 "dms": dms,
                 "failed": failed
@@ -177,53 +203,109 @@ class AnalyticsService:
             total_comments += comments
             total_dms += dms
 
-        avg_daily_comments = total_comments / 7 if total_comments > 0 else 0
-        avg_daily_dms = total_dms / 7 if total_dms > 0 else 0
-
         return {
             "data_points": data_points,
             "total_comments": total_comments,
             "total_dms": total_dms,
-            "average_daily_comments": round(avg_daily_comments, 2),
-            "average_daily_dms": round(avg_daily_dms, 2)
+            "average_daily_comments": round(total_comments / days, 2),
+            "average_daily_dms": round(total_dms / days, 2)
         }
 
-    async def _get_engagement_metrics(self, user_id: str) -> Dict:
+    async def get_activity_summary(self, user_id: str, days: int = 7) -> Dict:
         """
-        Get engagement metrics
+        Get sent and failed totals over the last N local days (today included)
+        Derived from the hourly rollups, whatever the log volume
         """
-        comments_col = self.db["comment_logs"]
-        dms_col = self.db["dm_logs"]
+        tz = await self.get_user_timezone(user_id)
+        today = local_time.local_today(tz)
+        by_date = await self._sum_by_local_day(user_id, tz, today - timedelta(days=days - 1), today)
+        totals = {
+            field: sum(day[field] for day in by_date.values())
+            for field in ROLLUP_FIELDS.values()
+        }
 
-        # Get all logs for the user
-        comment_logs = await comments_col.find({
-            "user_id": user_id
-        }).to_list(length=None)
+        total_comments = totals["comments_count"]
+        total_dms = totals["dms_count"]
+        failed_count = totals["failed_comments"] + totals["failed_dms"]
+        total_actions = total_comments + total_dms + failed_count
+        success_rate = ((total_comments + total_dms) / total_actions * 100) if total_actions > 0 else 0
 
-        dm_logs = await dms_col.find({
-            "user_id": user_id
-        }).to_list(length=None)
+        return {
+            "total_comments": total_comments,
+            "total_dms": total_dms,
+            "success_rate": round(success_rate, 2),
+            "failed_count": failed_count,
+            "avg_daily_comments": round(total_comments / days, 2),
+            "avg_daily_dms": round(total_dms / days, 2),
+            "days": days
+        }
 
-        total_actions = len(comment_logs) + len(dm_logs)
-        successful_actions = len([l for l in comment_logs if l["status"] == StatusEnum.SENT]) + \
-                           len([l for l in dm_logs if l["status"] == StatusEnum.SENT])
-        failed_actions = total_actions - successful_actions
+    async def _get_engagement_metrics(self, user_id: str, tz: ZoneInfo) -> Dict:
+        """
+        Get engagement metrics from the daily rollups
+        Unique commenters are estimated by merging the per-day sketches
+        """
+        totals, unique_commenters, response_times = await asyncio.gather(
+            self._sum_rollups(user_id),
+            self._unique_commenters(user_id),
+            self._get_response_times(user_id, tz)
+        )
 
-        success_rate = (successful_actions / total_actions * 100) if total_actions > 0 else 0
-        engagement_rate = (successful_actions / max(1, len(set([l.get("username", "") for l in comment_logs])))) if comment_logs else 0
-        conversion_rate = (len([l for l in dm_logs if l["status"] == StatusEnum.SENT]) / max(1, len(comment_logs))) if comment_logs else 0
+        comment_actions = totals["comments_count"] + totals["failed_comments"]
+        successful_actions = totals["comments_count"] + totals["dms_count"]
+        failed_actions = totals["failed_comments"] + totals["failed_dms"]
+        total_actions = successful_actions + failed_actions
 
-        # Calculate average response time (mock data)
-        avg_response_time = 2.5  # Mock: 2.5 seconds
+        success_rate = (successful_actions / total_actions * 100) if total_actions > 0 else 0
+        engagement_rate = (successful_actions / max(1, unique_commenters)) if comment_actions else 0
+        conversion_rate = (totals["dms_count"] / max(1, comment_actions)) if comment_actions else 0
 
         return {
             "total_actions": total_actions,
             "successful_actions": successful_actions,
             "failed_actions": failed_actions,
             "success_rate": round(success_rate, 2),
-            "avg_response_time": avg_response_time,
+            "avg_response_time": response_times["avg"],
+            "response_time_p50": response_times["p50"],
+            "response_time_p95": response_times["p95"],
+            "response_time_p99": response_times["p99"],
             "engagement_rate": round(engagement_rate, 2),
-            "conversion_rate": round(conversion_rate, 2)
+            "conversion_rate": round(conversion_rate, 2),
+            "unique_commenters": unique_commenters
+        }
+
+    async def _sum_rollups(self, user_id: str) -> Dict:
+        """
+        Sum the counters of all daily rollups of a user
+        """
+        return await self.storage.daily_stats.sum_counters(user_id, list(ROLLUP_FIELDS.values()))
+
+    async def _unique_commenters(self, user_id: str) -> int:
+        """
+        Estimate distinct commenters by merging the per-day HyperLogLog
+        registers (max rank per register)
+        """
+        return hyperloglog.estimate(await self.storage.daily_stats.merge_commenters(user_id))
+
+    async def _get_response_times(self, user_id: str, tz: ZoneInfo, days: int = 7) -> Dict:
+        """
+        Get comment response times (webhook receipt to reply sent) in seconds
+        over the last N local days, merging the per-day latency histograms
+        (sum of counts per bucket)
+        The histograms are kept per UTC day: the window starts on the UTC
+        day holding the first local midnight
+        """
+        today = local_time.local_today(tz)
+        start = local_time.local_midnight(tz, today - timedelta(days=days - 1))
+        histogram, count, sum_ms = await self.storage.daily_stats.merge_latencies(
+            user_id, start.strftime("%Y-%m-%d")
+        )
+
+        return {
+            "avg": round(sum_ms / count / 1000, 3) if count else 0.0,
+            "p50": round(latency_histogram.percentile(histogram, 50) / 1000, 3),
+            "p95": round(latency_histogram.percentile(histogram, 95) / 1000, 3),
+            "p99": round(latency_histogram.percentile(histogram, 99) / 1000, 3)
         }
 
     async def get_comment_logs(
@@ -231,115 +313,211 @@ class AnalyticsService:
         user_id: str,
         skip: int = 0,
         limit: int = 20,
-        days: int = 7
-    ) -> Tuple[List[Dict], int]:
+        days: int = 7,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict], Optional[int], Optional[str], int]:
         """
-        Get comment logs with pagination
+        Get comment logs with keyset pagination
+        See _get_logs for the arguments and return value
         """
-        comments_col = self.db["comment_logs"]
-
-        # Calculate date range
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-
-        query = {
-            "user_id": user_id,
-            "timestamp": {
-                "$gte": start_date,
-                "$lte": end_date
-            }
-        }
-
-        total = await comments_col.count_documents(query)
-        logs = await comments_col.find(query).sort("timestamp", -1).skip(skip).limit(limit).to_list(length=limit)
-
-        return logs, total
+        return await self._get_logs("comment_logs", user_id, skip, limit, days, cursor, include_total, fields)
 
     async def get_dm_logs(
         self,
         user_id: str,
         skip: int = 0,
         limit: int = 20,
-        days: int = 7
-    ) -> Tuple[List[Dict], int]:
+        days: int = 7,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict], Optional[int], Optional[str], int]:
         """
-        Get DM logs with pagination
+        Get DM logs with keyset pagination
+        See _get_logs for the arguments and return value
         """
-        dms_col = self.db["dm_logs"]
+        return await self._get_logs("dm_logs", user_id, skip, limit, days, cursor, include_total, fields)
+
+    async def _get_logs(
+        self,
+        collection: str,
+        user_id: str,
+        skip: int,
+        limit: int,
+        days: int,
+        cursor: Optional[str],
+        include_total: bool,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict], Optional[int], Optional[str], int]:
+        """
+        Get one page of logs, newest first
+        Pages are addressed by the cursor returned with the previous page,
+        which resumes right after its last (timestamp, _id) instead of
+        skipping rows; skip is still honoured for the first request.
+        The count is only run when include_total is set.
+        fields limits the logs to those fields; timestamp and _id are
+        always included since the next cursor is built from them.
+        Returns (logs, total or None, next cursor or None, page number)
+        """
+        logs_repo = self.storage.logs(collection)
 
         # Calculate date range
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
 
-        query = {
-            "user_id": user_id,
-            "timestamp": {
-                "$gte": start_date,
-                "$lte": end_date
-            }
-        }
-
-        total = await dms_col.count_documents(query)
-        logs = await dms_col.find(query).sort("timestamp", -1).skip(skip).limit(limit).to_list(length=limit)
+        page = skip // limit + 1
+        after = None
+        if cursor:
+            position = decode_cursor(cursor)
+            after = (position.timestamp, position._id)
+            page = position.page
+            skip = 0
+
+        # One extra row tells whether there is a next page
+        if fields:
+            fields = list(dict.fromkeys(["timestamp", *fields]))
+        find = logs_repo.page(user_id, start_date, end_date, limit + 1, skip=skip, after=after, fields=fields)
+        if include_total:
+            logs, total = await asyncio.gather(find, logs_repo.count(start_date, end_date, user_id=user_id))
+        else:
+            logs, total = await find, None
+
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = encode_cursor(logs[-1], page + 1)
+
+        return logs, total, next_cursor, page
+
+    def _count_in_rollup(
+        self,
+        collection: str,
+        user_id: str,
+        timestamp: datetime,
+        status: str
+    ) -> None:
+        """
+        Add a log that reached a final status to its daily and hourly rollups
+        Both are keyed in UTC; local days are derived from the hourly ones
+        """
+        field = ROLLUP_FIELDS.get((collection, status))
+        if field is not None:
+            log_buffer.increment(
+                "daily_stats",
+                {"user_id": user_id, "date": timestamp.strftime("%Y-%m-%d")},
+                {field: 1}
+            )
+            hour, quarter = local_time.hour_bucket(timestamp)
+            log_buffer.increment(
+                "hourly_stats",
+                {"user_id": user_id, "hour": hour},
+                {f"quarters.{quarter}.{field}": 1}
+            )
+
+    def _count_commenter(self, user_id: str, timestamp: datetime, username: str) -> None:
+        """
+        Add a commenter to the day's distinct-commenter sketch
+        """
+        index, rank = hyperloglog.register_for(username.lower())
+        log_buffer.maximize(
+            "daily_stats",
+            {"user_id": user_id, "date": timestamp.strftime("%Y-%m-%d")},
+            {f"commenters_hll.{index}": rank}
+        )
 
-        return logs, total
+    def _count_latency(self, user_id: str, timestamp: datetime, sent_at: datetime) -> None:
+        """
+        Add a reply's response time to the day's latency histogram
+        """
+        latency_ms = max(0.0, (sent_at - timestamp).total_seconds() * 1000)
+        log_buffer.increment(
+            "daily_stats",
+            {"user_id": user_id, "date": timestamp.strftime("%Y-%m-%d")},
+            {
+                f"latency_hist.{latency_histogram.bucket_for(latency_ms)}": 1,
+                "latency_count": 1,
+                "latency_sum_ms": round(latency_ms)
+            }
+        )
 
-    async def record_comment_log(self, comment_log: CommentLog) -> str:
+    async def record_comment_log(self, comment_log: CommentLog) -> Optional[str]:
         """
         Record a comment log in the database
+        Returns None if the comment was already logged (duplicate delivery)
+
+        Written directly rather than buffered: this insert is the claim
+        that keeps two workers from replying to the same comment.
+        """
+        log_id = await self.storage.comment_logs.claim(comment_log.to_dict())
+        if log_id is None:
+            return None
+        self._count_in_rollup("comment_logs", comment_log.user_id, comment_log.timestamp, comment_log.status)
+        self._count_commenter(comment_log.user_id, comment_log.timestamp, comment_log.username)
+        return str(log_id)
+
+    async def update_log_status(
+        self,
+        collection: str,
+        log_id: str,
+        user_id: str,
+        timestamp: datetime,
+        status: str,
+        details: Optional[Dict] = None
+    ) -> None:
         """
-        comments_col = self.db["comment_logs"]
-        result = await comments_col.insert_one(comment_log.to_dict())
-        return str(result.inserted_id)
+        Update the status of a recorded comment or DM log
+        collection is "comment_logs" or "dm_logs"; user_id and timestamp
+        locate the log's daily rollup; details are extra fields such as
+        attempts and last_error. Buffered, see record_dm_log.
+        A sent comment reply also records its response time.
+        """
+        fields = {"status": status, **(details or {})}
+        if status == StatusEnum.SENT:
+            fields.setdefault("sent_at", datetime.utcnow())
+            if collection == "comment_logs":
+                self._count_latency(user_id, timestamp, fields["sent_at"])
+        log_buffer.update(collection, ObjectId(log_id), fields)
+        self._count_in_rollup(collection, user_id, timestamp, status)
 
     async def record_dm_log(self, dm_log: DMLog) -> str:
         """
         Record a DM log in the database
+        The write is buffered and flushed in bulk; the id is assigned here
         """
-        dms_col = self.db["dm_logs"]
-        result = await dms_col.insert_one(dm_log.to_dict())
-        return str(result.inserted_id)
+        log_id = log_buffer.insert("dm_logs", dm_log.to_dict())
+        self._count_in_rollup("dm_logs", dm_log.user_id, dm_log.timestamp, dm_log.status)
+        return str(log_id)
 
     async def update_daily_stats(self, user_id: str, date: str) -> None:
         """
-        Update or create daily statistics for a specific date
+        Rebuild the daily statistics for a specific date (UTC) from the raw
+        logs, along with the hourly rollups of that date
+        Used to reconcile the incrementally maintained counters if they drift
         """
-        daily_stats_col = self.db["daily_stats"]
-        comments_col = self.db["comment_logs"]
-        dms_col = self.db["dm_logs"]
-        rules_col = self.db["automation_rules"]
-
         date_start = datetime.strptime(date, "%Y-%m-%d")
         date_end = date_start + timedelta(days=1)
 
-        comments = await comments_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.SENT,
-            "timestamp": {"$gte": date_start, "$lt": date_end}
-        })
+        # Pending increments would otherwise land on top of the recount
+        await log_buffer.flush()
 
-        dms = await dms_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.SENT,
-            "timestamp": {"$gte": date_start, "$lt": date_end}
-        })
-
-        failed_comments = await comments_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.FAILED,
-            "timestamp": {"$gte": date_start, "$lt": date_end}
-        })
+        comment_counts, dm_counts = await asyncio.gather(
+            self.storage.comment_logs.count_by_day(user_id, date_start, date_end),
+            self.storage.dm_logs.count_by_day(user_id, date_start, date_end)
+        )
+        comments = comment_counts.get((date, StatusEnum.SENT), 0)
+        dms = dm_counts.get((date, StatusEnum.SENT), 0)
+        failed_comments = comment_counts.get((date, StatusEnum.FAILED), 0)
+        failed_dms = dm_counts.get((date, StatusEnum.FAILED), 0)
 
-        failed_dms = await dms_col.count_documents({
-            "user_id": user_id,
-            "status": StatusEnum.FAILED,
-            "timestamp": {"$gte": date_start, "$lt": date_end}
-        })
+        commenters = hyperloglog.build(
+            await self.storage.comment_logs.commenters(user_id, date_start, date_end)
+        )
+        latencies = await self.storage.comment_logs.reply_latencies(user_id, date_start, date_end)
+        latency_hist = latency_histogram.build(latencies)
 
-        active_rules = await rules_col.count_documents({
-            "user_id": user_id,
-            "is_active": True
-        })
+        active_rules = await self.storage.rules.count_active(user_id)
 
         engagement_rate = (comments / max(1, comments + failed_comments)) * 100 if comments > 0 else 0
 
@@ -354,8 +532,32 @@ class AnalyticsService:
             engagement_rate=engagement_rate
         )
 
-        await daily_stats_col.update_one(
-            {"user_id": user_id, "date": date},
-            {"$set": daily_stats.to_dict()},
-            upsert=True
-        )
+        await self.storage.daily_stats.replace_day(user_id, date, {
+            **daily_stats.to_dict(),
+            "commenters_hll": {str(i): rank for i, rank in commenters.items()},
+            "latency_hist": {str(i): count for i, count in latency_hist.items()},
+            "latency_count": len(latencies),
+            "latency_sum_ms": round(sum(latencies))
+        })
+        await self._rebuild_hourly_stats(user_id, date_start, date_end)
+        stats_cache.invalidate(user_id)
+
+    async def reconcile_day(self, date: str) -> int:
+        """
+        Rebuild the daily statistics of every user active on a date
+        Returns the number of users reconciled
+        Only valid while the date's logs are in storage, i.e. not archived
+        """
+        date_start = datetime.strptime(date, "%Y-%m-%d")
+        date_end = date_start + timedelta(days=1)
+
+        user_ids = set(await self.storage.comment_logs.user_ids(date_start, date_end))
+        user_ids |= set(await self.storage.dm_logs.user_ids(date_start, date_end))
+        user_ids |= set(await self.storage.daily_stats.user_ids(date))
+
+        for user_id in user_ids:
+            await self.update_daily_stats(user_id, date)
+        return len(user_ids)
+
+
+analytics_service = AnalyticsService()
@@ -0,0 +1,60 @@
+"""Fast-path deduplication of redelivered webhook events"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+def event_key(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the idempotency key of a webhook event
+    Comments are keyed by comment id and messages by message id
+    """
+    value = event["value"]
+    if value.get("item") == "comment":
+        comment_id = value.get("comment_id") or value.get("id")
+        return f"comment:{comment_id}" if comment_id else None
+    if value.get("item") == "message":
+        mid = value.get("mid") or (value.get("message") or {}).get("mid")
+        return f"message:{mid}" if mid else None
+    return None
+
+
+class RecentEvents:
+    """
+    Bounded LRU set of recently processed event keys
+
+    Catches Meta redeliveries within one process without touching MongoDB.
+    Duplicates that reach another worker, or arrive after the key has been
+    evicted, are rejected by the unique index on comment_logs.comment_id.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self.duplicates = 0
+
+    def seen(self, key: str) -> bool:
+        """
+        Check whether a key was seen before and remember it
+        """
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self.duplicates += 1
+            return True
+
+        self._keys[key] = None
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+        return False
+
+    def forget(self, key: str) -> None:
+        """Forget a key so a later delivery is processed again"""
+        self._keys.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+recent_events = RecentEvents(maxsize=settings.WEBHOOK_DEDUP_CACHE_SIZE)
@@ -0,0 +1,285 @@
+"""Shared async client for the Instagram Graph API"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Graph API error codes that mean "slow down" rather than "bad request"
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+
+# Maximum number of requests Meta accepts in one batch call
+MAX_BATCH_SIZE = 50
+
+
+class GraphAPIError(Exception):
+    """Error returned by the Graph API"""
+
+    def __init__(self, status_code: int, error: Optional[Dict[str, Any]] = None):
+        self.status_code = status_code
+        self.error = error or {}
+        super().__init__(self.error.get("message") or f"Graph API error {status_code}")
+
+    @property
+    def transient(self) -> bool:
+        """Whether retrying the same request later may succeed"""
+        return (
+            self.status_code >= 500
+            or self.status_code == 429
+            or self.error.get("code") in RATE_LIMIT_ERROR_CODES
+            or bool(self.error.get("is_transient"))
+        )
+
+
+def reply_request(comment_id: str, message: str) -> Dict[str, Any]:
+    """Build the request that publicly replies to a comment"""
+    return {
+        "method": "POST",
+        "relative_url": f"{comment_id}/replies",
+        "body": {"message": message}
+    }
+
+
+def dm_request(account_id: str, recipient: Dict[str, str], message: str) -> Dict[str, Any]:
+    """Build the request that sends a direct message from an account"""
+    return {
+        "method": "POST",
+        "relative_url": f"{account_id}/messages",
+        "body": {"recipient": recipient, "message": {"text": message}}
+    }
+
+
+class TokenBucket:
+    """Token bucket that refills continuously at a fixed rate"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until the requested number of tokens is available"""
+        # Requests larger than the bucket wait for a full bucket and go into
+        # debt, which delays the calls that follow
+        needed = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+
+
+class GraphAPIClient:
+    """
+    Pooled, rate-limited Graph API client
+
+    One instance is shared by the whole process so replies and DMs reuse
+    keep-alive connections (HTTP/2 when the h2 package is installed). Calls
+    are throttled per Instagram account with a token bucket sized to the
+    account's hourly quota.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_version: str,
+        access_token: str,
+        calls_per_hour: int,
+        burst: int,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_version = api_version
+        self.access_token = access_token
+        self.calls_per_hour = calls_per_hour
+        self.burst = burst
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def start(self) -> None:
+        """Open the shared connection pool"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/{self.api_version}",
+            http2=HTTP2_AVAILABLE and self.transport is None,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            transport=self.transport
+        )
+
+    async def close(self) -> None:
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _bucket(self, account_id: str) -> TokenBucket:
+        bucket = self._buckets.get(account_id)
+        if bucket is None:
+            bucket = TokenBucket(rate=self.calls_per_hour / 3600, capacity=self.burst)
+            self._buckets[account_id] = bucket
+        return bucket
+
+    async def request(
+        self,
+        account_id: str,
+        method: str,
+        path: str,
+        data: Optional[Dict[str, Any]] = None,
+        cost: int = 1
+    ) -> Any:
+        """
+        Send a rate-limited request on behalf of an Instagram account
+        """
+        if self._client is None:
+            raise RuntimeError("Graph API client is not started")
+
+        await self._bucket(account_id).acquire(cost)
+        payload = dict(data or {})
+        payload.setdefault("access_token", self.access_token)
+
+        endpoint = path.split("/")[-1] or "batch"
+        self.calls[endpoint] += 1
+        started = time.perf_counter()
+        try:
+            response = await self._client.request(method, path, json=payload)
+        except httpx.TransportError as e:
+            self.errors["transport"] += 1
+            metrics.GRAPH_API_ERRORS.labels(endpoint, "transport").inc()
+            raise GraphAPIError(503, {"message": str(e), "is_transient": True})
+        finally:
+            metrics.GRAPH_API_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+
+        try:
+            body = response.json() if response.content else {}
+        except ValueError:
+            # Proxies and load balancers answer with HTML error pages
+            body = None
+        if response.status_code >= 400:
+            self.errors[str(response.status_code)] += 1
+            metrics.GRAPH_API_ERRORS.labels(endpoint, str(response.status_code)).inc()
+            raise GraphAPIError(response.status_code, body.get("error") if isinstance(body, dict) else None)
+        if body is None:
+            self.errors["invalid_response"] += 1
+            metrics.GRAPH_API_ERRORS.labels(endpoint, "invalid_response").inc()
+            raise GraphAPIError(502, {"message": "Graph API returned a non-JSON response", "is_transient": True})
+        return body
+
+    async def send(self, account_id: str, graph_request: Dict[str, Any]) -> Any:
+        """Send a request built by reply_request() or dm_request()"""
+        return await self.request(
+            account_id,
+            graph_request["method"],
+            "/" + graph_request["relative_url"].lstrip("/"),
+            graph_request.get("body")
+        )
+
+    async def reply_to_comment(self, account_id: str, comment_id: str, message: str) -> Dict[str, Any]:
+        """Publicly reply to a comment"""
+        return await self.send(account_id, reply_request(comment_id, message))
+
+    async def send_dm(self, account_id: str, recipient: Dict[str, str], message: str) -> Dict[str, Any]:
+        """
+        Send a direct message
+        recipient is {"id": <IGSID>} or {"comment_id": <id>} for a private reply
+        """
+        return await self.send(account_id, dm_request(account_id, recipient, message))
+
+    async def batch(self, account_id: str, requests: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Send several requests in one Graph API batch call
+
+        Each request is {"method", "relative_url", "body"} with body a dict.
+        Returns one result per request: the decoded body on success or a
+        GraphAPIError instance on failure.
+        """
+        if len(requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"Graph API batches are limited to {MAX_BATCH_SIZE} requests")
+
+        batch = [
+            {
+                "method": r["method"],
+                "relative_url": r["relative_url"].lstrip("/"),
+                "body": str(httpx.QueryParams(
+                    {k: v if isinstance(v, str) else json.dumps(v) for k, v in r.get("body", {}).items()}
+                ))
+            }
+            for r in requests
+        ]
+        # Every request inside a batch counts against the account's quota
+        responses = await self.request(account_id, "POST", "/", {"batch": batch}, cost=len(batch))
+        if not isinstance(responses, list) or len(responses) != len(requests):
+            self.errors["invalid_response"] += 1
+            metrics.GRAPH_API_ERRORS.labels("batch", "invalid_response").inc()
+            raise GraphAPIError(502, {
+                "message": f"Graph API batch returned {len(responses) if isinstance(responses, list) else 'no'} "
+                           f"results for {len(requests)} requests",
+                "is_transient": True
+            })
+
+        results: List[Any] = []
+        for request, item in zip(requests, responses):
+            code = (item or {}).get("code", 500)
+            try:
+                body = json.loads(item["body"]) if item and item.get("body") else {}
+            except ValueError:
+                body = {}
+            if code >= 400:
+                self.errors[str(code)] += 1
+                metrics.GRAPH_API_ERRORS.labels(request["relative_url"].split("/")[-1], str(code)).inc()
+                results.append(GraphAPIError(code, body.get("error") if isinstance(body, dict) else None))
+            else:
+                results.append(body)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Call and error counters plus remaining tokens per account"""
+        return {
+            "http2": HTTP2_AVAILABLE and self.transport is None,
+            "calls": dict(self.calls),
+            "errors": dict(self.errors),
+            "tokens": {account: round(b.tokens, 2) for account, b in self._buckets.items()}
+        }
+
+
+graph_client = GraphAPIClient(
+    base_url=settings.GRAPH_API_BASE_URL,
+    api_version=settings.GRAPH_API_VERSION,
+    access_token=settings.INSTAGRAM_ACCESS_TOKEN,
+    calls_per_hour=settings.GRAPH_API_CALLS_PER_HOUR,
+    burst=settings.GRAPH_API_BURST,
+    timeout=settings.GRAPH_API_TIMEOUT,
+    max_connections=settings.GRAPH_API_MAX_CONNECTIONS
+)
@@ -0,0 +1,63 @@
+"""HyperLogLog sketches for approximate distinct counts"""
+
+import hashlib
+import math
+from typing import Dict, Iterable, Tuple
+
+# 2^10 registers: ~3.3% standard error with at most 1024 stored registers
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+_HASH_BITS = 64
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def register_for(value: str) -> Tuple[int, int]:
+    """
+    Get the (register index, rank) a value contributes to the sketch
+    """
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    h = int.from_bytes(digest, "big")
+    index = h >> (_HASH_BITS - PRECISION)
+    remaining = h & ((1 << (_HASH_BITS - PRECISION)) - 1)
+    rank = (_HASH_BITS - PRECISION) - remaining.bit_length() + 1
+    return index, rank
+
+
+def build(values: Iterable[str]) -> Dict[int, int]:
+    """
+    Build a sparse sketch (register index -> rank) from values
+    """
+    registers: Dict[int, int] = {}
+    for value in values:
+        index, rank = register_for(value)
+        if rank > registers.get(index, 0):
+            registers[index] = rank
+    return registers
+
+
+def merge(*sketches: Dict[int, int]) -> Dict[int, int]:
+    """
+    Merge sketches by keeping the highest rank per register
+    """
+    merged: Dict[int, int] = {}
+    for sketch in sketches:
+        for index, rank in sketch.items():
+            if rank > merged.get(index, 0):
+                merged[index] = rank
+    return merged
+
+
+def estimate(registers: Dict[int, int]) -> int:
+    """
+    Estimate the number of distinct values in a sparse sketch
+    """
+    if not registers:
+        return 0
+    zeros = REGISTERS - len(registers)
+    harmonic = zeros + sum(2.0 ** -rank for rank in registers.values())
+    raw = _ALPHA * REGISTERS * REGISTERS / harmonic
+
+    # Linear counting is more accurate while many registers are still empty
+    if raw <= 2.5 * REGISTERS and zeros:
+        return round(REGISTERS * math.log(REGISTERS / zeros))
+    return round(raw)
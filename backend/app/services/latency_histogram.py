@@ -0,0 +1,62 @@
+"""Log-linear latency histograms that can be merged by summing buckets"""
+
+import math
+from typing import Dict, Iterable, Tuple
+
+# Each power of two is split into 8 linear sub-buckets, so a bucket's
+# midpoint is within ~6% of any value it holds
+SUB_BUCKETS = 8
+
+
+def bucket_for(ms: float) -> int:
+    """
+    Get the bucket index of a latency in milliseconds
+    Bucket 0 holds everything below 1 ms
+    """
+    if ms < 1:
+        return 0
+    exponent = int(math.log2(ms))
+    sub = int((ms / (1 << exponent) - 1) * SUB_BUCKETS)
+    return 1 + exponent * SUB_BUCKETS + min(sub, SUB_BUCKETS - 1)
+
+
+def bucket_bounds(index: int) -> Tuple[float, float]:
+    """
+    Get the [low, high) latency range in milliseconds of a bucket
+    """
+    if index == 0:
+        return 0.0, 1.0
+    exponent, sub = divmod(index - 1, SUB_BUCKETS)
+    base = float(1 << exponent)
+    width = base / SUB_BUCKETS
+    return base + sub * width, base + (sub + 1) * width
+
+
+def build(latencies_ms: Iterable[float]) -> Dict[int, int]:
+    """
+    Build a histogram (bucket index -> count) from latencies
+    """
+    histogram: Dict[int, int] = {}
+    for ms in latencies_ms:
+        index = bucket_for(ms)
+        histogram[index] = histogram.get(index, 0) + 1
+    return histogram
+
+
+def percentile(histogram: Dict[int, int], q: float) -> float:
+    """
+    Estimate the q-th percentile (0-100) in milliseconds
+    Returns the midpoint of the bucket holding that rank
+    """
+    total = sum(histogram.values())
+    if total == 0:
+        return 0.0
+    rank = max(1, math.ceil(total * q / 100))
+    seen = 0
+    for index in sorted(histogram):
+        seen += histogram[index]
+        if seen >= rank:
+            low, high = bucket_bounds(index)
+            return (low + high) / 2
+    low, high = bucket_bounds(max(histogram))
+    return (low + high) / 2
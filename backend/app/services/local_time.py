@@ -0,0 +1,54 @@
+"""Conversions between UTC rollup buckets and users' local days"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core.config import settings
+
+# Hourly rollups are split in quarters: every UTC offset in use is a
+# multiple of 15 minutes, so local midnights always fall on a boundary
+QUARTER = timedelta(minutes=15)
+QUARTERS_PER_HOUR = 4
+
+
+class UnknownTimezoneError(ValueError):
+    """Raised for a timezone name missing from the IANA database"""
+
+
+def get_timezone(name: Optional[str] = None) -> ZoneInfo:
+    """
+    Get a timezone by IANA name, defaulting to settings.TIMEZONE
+    """
+    try:
+        return ZoneInfo(name or settings.TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise UnknownTimezoneError(f"Unknown timezone: {name}") from e
+
+
+def hour_bucket(timestamp: datetime) -> Tuple[datetime, int]:
+    """
+    Get the (UTC hour, quarter index) bucket of a naive UTC timestamp
+    """
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return hour, timestamp.minute // 15
+
+
+def local_today(tz: ZoneInfo) -> date:
+    """Get today's date in a timezone"""
+    return datetime.now(tz).date()
+
+
+def local_midnight(tz: ZoneInfo, day: date) -> datetime:
+    """
+    Get the start of a local day as a naive UTC datetime
+    """
+    start = datetime(day.year, day.month, day.day, tzinfo=tz)
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def local_date(tz: ZoneInfo, timestamp: datetime) -> str:
+    """
+    Get the local date (YYYY-MM-DD) of a naive UTC timestamp
+    """
+    return timestamp.replace(tzinfo=timezone.utc).astimezone(tz).strftime("%Y-%m-%d")
@@ -0,0 +1,403 @@
+"""Write-behind buffer for comment and DM log writes"""
+
+import asyncio
+import glob
+import logging
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId, json_util
+
+from app.core import metrics
+from app.core.config import settings
+from app.repositories import get_storage
+from app.repositories.base import StorageError
+
+logger = logging.getLogger(__name__)
+
+# Called after each flush with the user_ids whose documents were written
+FlushListener = Callable[[Set[str]], None]
+
+# Buffered operation kinds
+INSERT = "insert"
+UPDATE = "update"
+UPSERT = "upsert"
+
+
+class LogBuffer:
+    """
+    Accumulates log inserts and status updates and writes them in bulk
+
+    Inserts are flushed with one unordered bulk insert per collection and
+    status updates with one unordered bulk update, either when max_batch
+    operations are pending, every flush_interval seconds, or on shutdown.
+    Document ids are assigned client-side, so callers get the id at once
+    and never wait on storage. An update to a document that has not been
+    flushed yet is merged into the pending insert, and counter increments
+    (or maxima) aimed at the same document are folded into a single
+    upserting $inc/$max. Flush listeners are told which users' documents
+    were written, e.g. to invalidate caches derived from them.
+
+    Operations that fail (other than duplicates) go back into the buffer
+    and are retried with exponential backoff, up to max_attempts times.
+    After that, and for whatever cannot be written on shutdown, they are
+    spilled to a JSONL file in spill_dir and buffered again on the next
+    start. A failure that leaves it unknown which operations of a bulk
+    write were applied retries all of them: inserts and $set updates are
+    idempotent, but increments may then be counted twice until the day
+    is reconciled.
+    """
+
+    def __init__(
+        self,
+        max_batch: int,
+        flush_interval: float,
+        max_attempts: int = 5,
+        max_retry_delay: float = 30.0,
+        spill_dir: str = "spill"
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_retry_delay = max_retry_delay
+        self.spill_dir = spill_dir
+        self._inserts: Dict[str, Dict[ObjectId, Dict[str, Any]]] = defaultdict(dict)
+        self._updates: Dict[str, Dict[ObjectId, Dict[str, Any]]] = defaultdict(dict)
+        self._upserts: Dict[str, Dict[Tuple, Dict[str, Dict[str, Any]]]] = defaultdict(dict)
+        self._pending = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._listeners: List[FlushListener] = []
+        # Failed attempts so far of operations waiting to be retried
+        self._attempts: Dict[Tuple, int] = {}
+        self._failed_flushes = 0
+        self._retry_at = 0.0
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.spilled = 0
+        self.restored = 0
+        self.lost = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def insert(self, collection: str, document: Dict[str, Any]) -> ObjectId:
+        """Buffer a document insert and return its id"""
+        document.setdefault("_id", ObjectId())
+        self._inserts[collection][document["_id"]] = document
+        self._added()
+        return document["_id"]
+
+    def update(self, collection: str, _id: ObjectId, fields: Dict[str, Any]) -> None:
+        """Buffer a $set of fields on a document"""
+        pending_insert = self._inserts[collection].get(_id)
+        if pending_insert is not None:
+            pending_insert.update(fields)
+            return
+        updates = self._updates[collection]
+        if _id not in updates:
+            updates[_id] = {}
+            self._added()
+        updates[_id].update(fields)
+
+    def _upsert(self, collection: str, key: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        upserts = self._upserts[collection]
+        key_items = tuple(sorted(key.items()))
+        if key_items not in upserts:
+            upserts[key_items] = {"$inc": {}, "$max": {}}
+            self._added()
+        return upserts[key_items]
+
+    def increment(self, collection: str, key: Dict[str, Any], counts: Dict[str, int]) -> None:
+        """Buffer an upserting $inc on the document matching key"""
+        inc = self._upsert(collection, key)["$inc"]
+        for field, amount in counts.items():
+            inc[field] = inc.get(field, 0) + amount
+
+    def maximize(self, collection: str, key: Dict[str, Any], values: Dict[str, Any]) -> None:
+        """Buffer an upserting $max on the document matching key"""
+        maxima = self._upsert(collection, key)["$max"]
+        for field, value in values.items():
+            if field not in maxima or value > maxima[field]:
+                maxima[field] = value
+
+    def add_flush_listener(self, listener: FlushListener) -> None:
+        """Call listener with the affected user_ids after every flush"""
+        self._listeners.append(listener)
+
+    def _added(self) -> None:
+        self._pending += 1
+        if self._pending >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            inserts, self._inserts = self._inserts, defaultdict(dict)
+            updates, self._updates = self._updates, defaultdict(dict)
+            upserts, self._upserts = self._upserts, defaultdict(dict)
+            self._pending = 0
+
+            # Inserts go first so updates never target a missing document
+            unsettled = [
+                (kind, collection, operations)
+                for kind, buffered in ((INSERT, inserts), (UPDATE, updates), (UPSERT, upserts))
+                for collection, operations in buffered.items()
+                if operations
+            ]
+            spill: List[Dict[str, Any]] = []
+            try:
+                now = datetime.utcnow()
+                while unsettled:
+                    kind, collection, operations = unsettled[0]
+                    failed = await self._write(
+                        collection, self._bulk_write(kind, collection, operations, now), len(operations)
+                    )
+                    self._settle(kind, collection, list(operations.items()), failed, spill)
+                    unsettled.pop(0)
+            except BaseException:
+                # Put back whatever this flush did not settle, so an
+                # unexpected error or a cancellation loses nothing
+                for kind, collection, operations in unsettled:
+                    for key, value in operations.items():
+                        self._restore(kind, collection, key, value)
+                for operation in spill:
+                    self._restore(operation["operation"], operation["collection"], operation["key"], operation["value"])
+                self._back_off(True)
+                raise
+            self.flushes += 1
+
+            self._back_off(bool(self._attempts))
+            if spill:
+                await self._spill(spill)
+
+            # Final statuses always come with a rollup upsert, so inserts
+            # and upserts name every user whose numbers changed
+            user_ids = {
+                document["user_id"]
+                for documents in inserts.values() for document in documents.values()
+                if "user_id" in document
+            }
+            user_ids |= {
+                dict(key_items)["user_id"]
+                for documents in upserts.values() for key_items in documents
+                if "user_id" in dict(key_items)
+            }
+            for listener in self._listeners:
+                try:
+                    listener(user_ids)
+                except Exception as e:
+                    print(f"⚠️ Log buffer flush listener failed: {str(e)}")
+
+    def _back_off(self, failing: bool) -> None:
+        """Delay the next periodic flush while storage keeps failing"""
+        if failing:
+            self._failed_flushes += 1
+            delay = min(self.max_retry_delay, self.flush_interval * 2 ** (self._failed_flushes - 1))
+            self._retry_at = time.monotonic() + delay
+        else:
+            self._failed_flushes = 0
+            self._retry_at = 0.0
+
+    @staticmethod
+    def _bulk_write(kind: str, collection: str, operations: Dict[Any, Dict[str, Any]], now: datetime):
+        """The repository call writing one collection's buffered operations of a kind"""
+        storage = get_storage()
+        if kind == INSERT:
+            return storage.logs(collection).bulk_insert(list(operations.values()))
+        if kind == UPDATE:
+            return storage.logs(collection).bulk_update(operations)
+        return storage.rollups(collection).bulk_upsert(
+            [(dict(key_items), ops) for key_items, ops in operations.items()], now
+        )
+
+    async def _write(self, collection: str, operation, count: int) -> List[int]:
+        """
+        Await a bulk write and return the positions of the failed operations
+        Duplicates were already written by another worker and are skipped
+        by the repository
+        """
+        try:
+            self.written += await operation
+            return []
+        except StorageError as e:
+            self.written += e.written
+            failed = e.failed if e.failed is not None else list(range(count))
+            error: Exception = e
+        except Exception as e:
+            failed = list(range(count))
+            error = e
+        self.failed += len(failed)
+        print(f"❌ Buffered writes to {collection} failed, {len(failed)} operations to retry: {str(error)}")
+        return failed
+
+    def _settle(
+        self,
+        kind: str,
+        collection: str,
+        operations: List[Tuple[Any, Dict[str, Any]]],
+        failed: List[int],
+        spill: List[Dict[str, Any]]
+    ) -> None:
+        """Buffer the failed operations again, or queue them for spilling after the last attempt"""
+        if not failed and not self._attempts:
+            return
+        failed_positions = set(failed)
+        for position, (key, value) in enumerate(operations):
+            attempt_key = (kind, collection, key)
+            if position not in failed_positions:
+                self._attempts.pop(attempt_key, None)
+                continue
+            attempts = self._attempts.pop(attempt_key, 0) + 1
+            if attempts >= self.max_attempts:
+                spill.append({"operation": kind, "collection": collection, "key": key, "value": value})
+                continue
+            self._attempts[attempt_key] = attempts
+            self._restore(kind, collection, key, value)
+
+    def _restore(self, kind: str, collection: str, key: Any, value: Dict[str, Any]) -> None:
+        """Put an operation back into the buffer, under anything buffered for it since"""
+        if kind == INSERT:
+            if key not in self._inserts[collection]:
+                self._inserts[collection][key] = value
+                self._added()
+        elif kind == UPDATE:
+            pending_insert = self._inserts[collection].get(key)
+            if pending_insert is not None:
+                pending_insert.update(value)
+                return
+            updates = self._updates[collection]
+            newer = updates.get(key)
+            if newer is None:
+                updates[key] = value
+                self._added()
+            else:
+                updates[key] = {**value, **newer}
+        else:
+            self.increment(collection, dict(key), value["$inc"])
+            self.maximize(collection, dict(key), value["$max"])
+
+    def _take_all(self) -> List[Dict[str, Any]]:
+        """Remove and return every buffered operation in spill form"""
+        taken = [
+            {"operation": kind, "collection": collection, "key": key, "value": value}
+            for kind, buffered in ((INSERT, self._inserts), (UPDATE, self._updates), (UPSERT, self._upserts))
+            for collection, operations in buffered.items()
+            for key, value in operations.items()
+        ]
+        self._inserts, self._updates, self._upserts = defaultdict(dict), defaultdict(dict), defaultdict(dict)
+        self._attempts.clear()
+        self._pending = 0
+        return taken
+
+    def _write_spill_file(self, operations: List[Dict[str, Any]]) -> str:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        name = f"log_buffer-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl"
+        path = os.path.join(self.spill_dir, name)
+        # Written under a temporary name so a partial file is never replayed
+        with open(path + ".tmp", "w") as f:
+            for operation in operations:
+                # Rollup keys are tuples of (field, value) pairs
+                if operation["operation"] == UPSERT:
+                    operation = {**operation, "key": dict(operation["key"])}
+                f.write(json_util.dumps(operation) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        return path
+
+    async def _spill(self, operations: List[Dict[str, Any]]) -> None:
+        try:
+            path = await asyncio.to_thread(self._write_spill_file, operations)
+        except Exception as e:
+            self.lost += len(operations)
+            print(f"❌ Could not spill {len(operations)} buffered writes, they are lost: {str(e)}")
+            return
+        self.spilled += len(operations)
+        print(f"💾 Spilled {len(operations)} buffered writes that kept failing to {path}")
+
+    def _load_spilled(self) -> None:
+        """Buffer again the operations spilled by earlier runs"""
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "log_buffer-*.jsonl"))):
+            try:
+                with open(path) as f:
+                    operations = [json_util.loads(line) for line in f if line.strip()]
+            except Exception as e:
+                print(f"⚠️ Could not read spilled writes from {path}: {str(e)}")
+                continue
+            for operation in operations:
+                key = operation["key"]
+                if operation["operation"] == UPSERT:
+                    key = tuple(sorted(key.items()))
+                self._restore(operation["operation"], operation["collection"], key, operation["value"])
+            self.restored += len(operations)
+            os.remove(path)
+            print(f"♻️ Buffered {len(operations)} spilled writes from {path}")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending and time.monotonic() >= self._retry_at:
+                try:
+                    await self.flush()
+                except Exception:
+                    # The batch is buffered again; keep the flusher alive
+                    logger.exception("Log buffer flush failed")
+
+    def start(self) -> None:
+        """Start the periodic flusher, after buffering writes spilled by earlier runs"""
+        if self._task is None:
+            self._load_spilled()
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="log-buffer-flush")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write what is left"""
+        if self._task is not None:
+            # Let an in-progress flush finish instead of cancelling it
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        # Whatever still failed is kept on disk for the next start
+        if self._pending:
+            await self._spill(self._take_all())
+
+    def stats(self) -> Dict[str, Any]:
+        """Pending operations and flush and failure counters"""
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+            "retrying": len(self._attempts),
+            "spilled": self.spilled,
+            "restored": self.restored,
+            "lost": self.lost
+        }
+
+
+log_buffer = LogBuffer(
+    max_batch=settings.LOG_BUFFER_MAX_BATCH,
+    flush_interval=settings.LOG_BUFFER_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.LOG_BUFFER_MAX_ATTEMPTS,
+    max_retry_delay=settings.LOG_BUFFER_RETRY_MAX_DELAY_SECONDS,
+    spill_dir=settings.LOG_BUFFER_SPILL_DIR
+)
+metrics.LOG_BUFFER_PENDING.set_function(lambda: log_buffer.pending)
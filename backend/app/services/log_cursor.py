@@ -0,0 +1,51 @@
+"""Opaque cursors for keyset pagination of comment and DM logs"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class LogCursor:
+    """Position after the last log of a page, in (timestamp, _id) order"""
+
+    def __init__(self, timestamp: datetime, _id: ObjectId, page: int):
+        self.timestamp = timestamp
+        self._id = _id
+        self.page = page
+
+
+def encode_cursor(log: Dict[str, Any], page: int) -> str:
+    """
+    Encode the position of the last log of a page
+    page is the number of the page the cursor leads to
+    """
+    payload = json.dumps({
+        "t": log["timestamp"].isoformat(),
+        "id": str(log["_id"]),
+        "p": page
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> LogCursor:
+    """
+    Decode a cursor produced by encode_cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return LogCursor(
+            timestamp=datetime.fromisoformat(payload["t"]),
+            _id=ObjectId(payload["id"]),
+            page=max(1, int(payload.get("p", 1)))
+        )
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
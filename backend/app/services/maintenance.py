@@ -0,0 +1,51 @@
+"""Scheduled maintenance jobs"""
+
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.core.config import settings
+from app.services.analytics_service import analytics_service
+from app.services.retention import log_retention
+
+
+async def reconcile_daily_stats() -> None:
+    """
+    Rebuild yesterday's daily rollups from the raw logs
+    Corrects any drift in the incrementally maintained counters
+    """
+    date = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d")
+    try:
+        users = await analytics_service.reconcile_day(date)
+        print(f"🧮 Reconciled daily stats of {users} users for {date}")
+    except Exception as e:
+        print(f"❌ Daily stats reconcile failed for {date}: {str(e)}")
+
+
+async def enforce_log_retention() -> None:
+    """
+    Archive and delete the logs older than the retention period
+    """
+    try:
+        summary = await log_retention.run()
+        print(f"🗄️ Log retention: {summary}")
+    except Exception as e:
+        print(f"❌ Log retention failed: {str(e)}")
+
+
+scheduler = AsyncIOScheduler(timezone="UTC")
+scheduler.add_job(
+    reconcile_daily_stats,
+    "cron",
+    hour=settings.DAILY_STATS_RECONCILE_HOUR_UTC,
+    minute=30,
+    id="reconcile_daily_stats"
+)
+if log_retention.enabled:
+    scheduler.add_job(
+        enforce_log_retention,
+        "cron",
+        hour=settings.LOG_RETENTION_HOUR_UTC,
+        minute=0,
+        id="enforce_log_retention"
+    )
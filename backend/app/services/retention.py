@@ -0,0 +1,140 @@
+"""Retention of comment and DM logs: recent days in storage, older days on disk"""
+
+import asyncio
+import gzip
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+
+from app.core.config import settings
+from app.repositories import get_storage
+from app.services.analytics_service import analytics_service
+
+LOG_COLLECTIONS = ("comment_logs", "dm_logs")
+
+
+class LogRetention:
+    """
+    Moves logs older than retention_days out of storage
+
+    Each UTC day past the cutoff is first reconciled into daily_stats, so
+    the dashboard totals keep counting it, then streamed to a gzipped
+    JSONL file per collection and day (MongoDB extended JSON, one log per
+    line) and only then deleted. The file is written under a temporary
+    name and renamed when complete; a run interrupted before the delete
+    archives the day again into a new part file, so readers should
+    de-duplicate on _id. Hourly rollups past the cutoff are dropped, as
+    nothing reads them and daily_stats keeps the totals.
+    """
+
+    def __init__(self, retention_days: int, archive_dir: str, batch_size: int):
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+
+    def cutoff(self) -> datetime:
+        """Start of the oldest UTC day kept in storage"""
+        today = datetime.utcnow()
+        return datetime(today.year, today.month, today.day) - timedelta(days=self.retention_days)
+
+    def archive_path(self, collection: str, date: str) -> str:
+        """
+        Get a free path for the archive of one collection and day
+        """
+        directory = os.path.join(self.archive_dir, collection, date[:4], date[5:7])
+        path = os.path.join(directory, f"{collection}-{date}.jsonl.gz")
+        part = 1
+        while os.path.exists(path):
+            part += 1
+            path = os.path.join(directory, f"{collection}-{date}.{part}.jsonl.gz")
+        return path
+
+    async def _oldest_day(self) -> Optional[datetime]:
+        oldest = None
+        for collection in LOG_COLLECTIONS:
+            timestamp = await get_storage().logs(collection).oldest_timestamp()
+            if timestamp is not None and (oldest is None or timestamp < oldest):
+                oldest = timestamp
+        if oldest is None:
+            return None
+        return datetime(oldest.year, oldest.month, oldest.day)
+
+    async def archive_day(self, collection: str, day: datetime) -> int:
+        """
+        Archive and delete the logs of one collection and UTC day
+        Returns the number of logs archived
+        """
+        date = day.strftime("%Y-%m-%d")
+        next_day = day + timedelta(days=1)
+        logs_repo = get_storage().logs(collection)
+        first = await logs_repo.oldest_timestamp(since=day)
+        if first is None or first >= next_day:
+            return 0
+
+        path = self.archive_path(collection, date)
+        partial = f"{path}.partial"
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        archive = await asyncio.to_thread(gzip.open, partial, "wt", encoding="utf-8")
+
+        archived = 0
+        try:
+            batch: List[str] = []
+            async for log in logs_repo.stream(day, next_day, self.batch_size):
+                batch.append(json_util.dumps(log))
+                if len(batch) >= self.batch_size:
+                    await asyncio.to_thread(archive.write, "\n".join(batch) + "\n")
+                    archived += len(batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(archive.write, "\n".join(batch) + "\n")
+                archived += len(batch)
+        except BaseException:
+            await asyncio.to_thread(archive.close)
+            await asyncio.to_thread(os.remove, partial)
+            raise
+        await asyncio.to_thread(archive.close)
+        await asyncio.to_thread(os.replace, partial, path)
+
+        # Days past the cutoff no longer receive writes, so the window holds
+        # exactly what was archived
+        deleted = await logs_repo.delete_between(day, next_day)
+        if deleted != archived:
+            print(f"⚠️ {collection} {date}: archived {archived} logs but deleted {deleted}")
+        print(f"🗄️ Archived {archived} {collection} of {date} to {path}")
+        return archived
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Reconcile, archive and delete every day older than the cutoff
+        Returns a summary of the run
+        """
+        summary: Dict[str, Any] = {"days": 0, "archived": dict.fromkeys(LOG_COLLECTIONS, 0), "hourly_stats_deleted": 0}
+        if not self.enabled:
+            return summary
+
+        cutoff = self.cutoff()
+        day = await self._oldest_day()
+        while day is not None and day < cutoff:
+            # Roll the day up while its logs are still here
+            await analytics_service.reconcile_day(day.strftime("%Y-%m-%d"))
+            for collection in LOG_COLLECTIONS:
+                summary["archived"][collection] += await self.archive_day(collection, day)
+            summary["days"] += 1
+            day += timedelta(days=1)
+
+        summary["hourly_stats_deleted"] = await get_storage().hourly_stats.delete_before(cutoff)
+        summary["cutoff"] = cutoff.strftime("%Y-%m-%d")
+        return summary
+
+
+log_retention = LogRetention(
+    retention_days=settings.LOG_RETENTION_DAYS,
+    archive_dir=settings.LOG_ARCHIVE_DIR,
+    batch_size=settings.LOG_ARCHIVE_BATCH_SIZE
+)
@@ -0,0 +1,266 @@
+"""Persistent retry queue for failed replies and DMs"""
+
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.models import StatusEnum
+from app.repositories import get_storage
+from app.repositories.base import RetryJobRepository
+from app.services.analytics_service import analytics_service
+from app.services.graph_client import GraphAPIError
+from app.services.send_scheduler import SendJob, SendScheduler, send_scheduler
+
+# Job states of retry jobs
+PENDING = "pending"
+LEASED = "leased"
+DEAD = "dead"
+
+
+class RetryQueue:
+    """
+    Persistent queue of sends that failed with a transient Graph API error
+
+    Jobs are leased with a visibility timeout, so any number of processes
+    can poll the queue without sending the same job twice; a lease
+    that is not completed in time (crashed worker) becomes visible again.
+    Leases are renewed while their jobs wait in the send scheduler, and
+    checked once more right before the Graph API call.
+    Each failure reschedules the job with exponential backoff and full
+    jitter until max_attempts, after which it is kept in the dead state
+    for dead_ttl_days and then removed by a TTL index on expires_at.
+    The related comment/DM log stays pending while retries are in flight
+    and ends up sent or failed.
+    """
+
+    def __init__(
+        self,
+        scheduler: SendScheduler,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        visibility_timeout: float,
+        poll_interval: float,
+        lease_batch: int,
+        dead_ttl_days: int
+    ):
+        self.scheduler = scheduler
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.lease_batch = lease_batch
+        self.dead_ttl_days = dead_ttl_days
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._renew_task: Optional[asyncio.Task] = None
+        # Leased jobs submitted to the scheduler and not settled yet
+        self._inflight: Set[ObjectId] = set()
+
+    @property
+    def jobs(self) -> RetryJobRepository:
+        return get_storage().retry_jobs
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next attempt, with full jitter"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return random.uniform(0, cap)
+
+    async def schedule(
+        self,
+        account_id: str,
+        kind: str,
+        graph_request: Dict[str, Any],
+        log_collection: str,
+        log_id: str,
+        log_timestamp: datetime,
+        error: GraphAPIError
+    ) -> None:
+        """
+        Queue a send whose first attempt failed
+        account_id owns the log; non-transient errors are not retried and
+        fail the log right away, as does a job that cannot be stored
+        """
+        if not error.transient or self.max_attempts <= 1:
+            await analytics_service.update_log_status(
+                log_collection, log_id, account_id, log_timestamp, StatusEnum.FAILED,
+                {"attempts": 1, "last_error": str(error)}
+            )
+            return
+
+        now = datetime.utcnow()
+        job = {
+            "account_id": account_id,
+            "kind": kind,
+            "graph_request": graph_request,
+            "log_collection": log_collection,
+            "log_id": ObjectId(log_id),
+            "log_timestamp": log_timestamp,
+            "attempts": 1,
+            "state": PENDING,
+            "next_attempt_at": now + timedelta(seconds=self.backoff(1)),
+            "last_error": str(error),
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await self.jobs.insert(job)
+        except Exception as e:
+            print(f"❌ Retry job could not be stored: {str(e)}")
+            await analytics_service.update_log_status(
+                log_collection, log_id, account_id, log_timestamp, StatusEnum.FAILED,
+                {"attempts": 1, "last_error": str(error)}
+            )
+            return
+        await analytics_service.update_log_status(
+            log_collection, log_id, account_id, log_timestamp, StatusEnum.PENDING,
+            {"attempts": 1, "last_error": str(error)}
+        )
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+
+    async def _lease(self) -> Optional[Dict[str, Any]]:
+        return await self.jobs.lease(self.owner, datetime.utcnow(), self._lease_expiry())
+
+    async def _poll(self) -> None:
+        while True:
+            leased = 0
+            try:
+                # Lease no more than the scheduler already holds a batch of
+                while leased < self.lease_batch and len(self._inflight) < self.lease_batch:
+                    job = await self._lease()
+                    if job is None:
+                        break
+                    leased += 1
+                    # An expired lease of our own job that is still queued
+                    # or being sent; re-leasing it only extended the lease
+                    if job["_id"] in self._inflight:
+                        continue
+                    await self._submit(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Retry queue poll failed: {str(e)}")
+            if leased < self.lease_batch:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not self._inflight:
+                continue
+            try:
+                await self.jobs.renew(list(self._inflight), self.owner, self._lease_expiry())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Retry lease renewal failed: {str(e)}")
+
+    async def _submit(self, job: Dict[str, Any]) -> None:
+        job_id = job["_id"]
+
+        async def before_send() -> bool:
+            # Atomically confirm and extend the lease right before the call;
+            # another process may have taken over an expired lease
+            held = False
+            try:
+                held = await self.jobs.renew([job_id], self.owner, self._lease_expiry()) == 1
+            finally:
+                if not held:
+                    self._inflight.discard(job_id)
+            return held
+
+        async def on_result(result: Any) -> None:
+            try:
+                await self._complete(job, result)
+            finally:
+                self._inflight.discard(job_id)
+
+        self._inflight.add(job_id)
+        try:
+            await self.scheduler.submit(SendJob(
+                account_id=job["account_id"],
+                kind=job["kind"],
+                graph_request=job["graph_request"],
+                on_result=on_result,
+                before_send=before_send
+            ))
+        except Exception:
+            self._inflight.discard(job_id)
+            raise
+
+    async def _complete(self, job: Dict[str, Any], result: Any) -> None:
+        # Only the current lease holder may settle the job
+        log_collection, log_id = job["log_collection"], str(job["log_id"])
+        account_id, log_timestamp = job["account_id"], job["log_timestamp"]
+        attempts = job["attempts"] + 1
+
+        if not isinstance(result, GraphAPIError):
+            if await self.jobs.complete(job["_id"], self.owner):
+                await analytics_service.update_log_status(
+                    log_collection, log_id, account_id, log_timestamp, StatusEnum.SENT,
+                    {"attempts": attempts}
+                )
+            return
+
+        now = datetime.utcnow()
+        if result.transient and attempts < self.max_attempts:
+            update = {
+                "state": PENDING,
+                "next_attempt_at": now + timedelta(seconds=self.backoff(attempts)),
+                "last_error": str(result),
+                "updated_at": now
+            }
+            status = StatusEnum.PENDING
+        else:
+            update = {
+                "state": DEAD,
+                "last_error": str(result),
+                "updated_at": now,
+                "expires_at": now + timedelta(days=self.dead_ttl_days)
+            }
+            status = StatusEnum.FAILED
+
+        if await self.jobs.release(job["_id"], self.owner, update):
+            await analytics_service.update_log_status(
+                log_collection, log_id, account_id, log_timestamp, status,
+                {"attempts": attempts, "last_error": str(result)}
+            )
+
+    def start(self) -> None:
+        """Start polling for due retries"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll(), name="retry-queue-poll")
+            self._renew_task = asyncio.create_task(self._renew(), name="retry-queue-renew")
+
+    async def stop(self) -> None:
+        """Stop polling; leased jobs become visible again after their timeout"""
+        if self._task is not None:
+            tasks = [self._task, self._renew_task]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._task = self._renew_task = None
+
+    async def stats(self) -> Dict[str, int]:
+        """Number of jobs per state"""
+        return await self.jobs.count_by_state([PENDING, LEASED, DEAD])
+
+
+retry_queue = RetryQueue(
+    scheduler=send_scheduler,
+    max_attempts=settings.RETRY_MAX_ATTEMPTS,
+    base_delay=settings.RETRY_BASE_DELAY_SECONDS,
+    max_delay=settings.RETRY_MAX_DELAY_SECONDS,
+    visibility_timeout=settings.RETRY_VISIBILITY_TIMEOUT_SECONDS,
+    poll_interval=settings.RETRY_POLL_INTERVAL_SECONDS,
+    lease_batch=settings.RETRY_LEASE_BATCH,
+    dead_ttl_days=settings.RETRY_DEAD_TTL_DAYS
+)
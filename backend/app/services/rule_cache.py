@@ -0,0 +1,173 @@
+"""Process-local cache of active automation rules and their compiled matchers"""
+
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import get_db
+from app.repositories import get_storage
+from app.services.rule_matcher import RuleMatcher
+
+
+class CachedRules:
+    """Active rules of one user together with their compiled matcher"""
+
+    def __init__(self, version: int, rules: List[Dict[str, Any]]):
+        self.version = version
+        self.rules = rules
+        self.matcher = RuleMatcher(rules)
+        self.loaded_at = time.monotonic()
+
+
+class RuleCache:
+    """
+    Per-user rule cache with version-counter invalidation
+
+    Rule writes in this process bump the user's version so the next lookup
+    reloads. Writes made by other processes are picked up through the
+    optional change stream watcher, and entries never outlive the TTL, so
+    rule edits take effect within a bounded delay either way.
+    At most maxsize users are cached; the least recently used is evicted
+    together with its version, lock and rule owners.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CachedRules]" = OrderedDict()
+        # Only kept for users that are cached or loading
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._rule_owners: Dict[str, str] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _loading(self, user_id: str) -> bool:
+        lock = self._locks.get(user_id)
+        return lock is not None and lock.locked()
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop the cached rules of a user"""
+        if self._loading(user_id):
+            # The load under way may have read the old rules: bumping the
+            # version leaves what it stores stale
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._evict(user_id)
+
+    def invalidate_all(self) -> None:
+        """Drop every cached entry"""
+        for user_id in list(self._entries) + list(self._locks):
+            self.invalidate(user_id)
+
+    def _evict(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            for rule in entry.rules:
+                self._rule_owners.pop(str(rule["_id"]), None)
+        # A loading user keeps its version and lock until the load is done
+        if not self._loading(user_id):
+            self._versions.pop(user_id, None)
+            self._locks.pop(user_id, None)
+
+    def _is_fresh(self, entry: Optional[CachedRules], user_id: str) -> bool:
+        return (
+            entry is not None
+            and entry.version == self._versions.get(user_id, 0)
+            and time.monotonic() - entry.loaded_at < self.ttl
+        )
+
+    async def get(self, user_id: str) -> CachedRules:
+        """
+        Get the active rules and matcher of a user, loading them on a miss
+        """
+        entry = self._entries.get(user_id)
+        if self._is_fresh(entry, user_id):
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry
+
+        try:
+            async with self._locks[user_id]:
+                # Another task may have reloaded while we waited for the lock
+                entry = self._entries.get(user_id)
+                if self._is_fresh(entry, user_id):
+                    self.hits += 1
+                    return entry
+
+                self.misses += 1
+                # Capture the version before reading so an invalidation that
+                # races with the load forces another reload next time
+                version = self._versions.get(user_id, 0)
+                rules = await self._load(user_id)
+                entry = CachedRules(version, rules)
+                self._evict(user_id)
+                self._entries[user_id] = entry
+                for rule in rules:
+                    self._rule_owners[str(rule["_id"])] = user_id
+        finally:
+            # A failed load leaves nothing to keep the lock and version for
+            if user_id not in self._entries:
+                self._evict(user_id)
+
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+        return entry
+
+    async def _load(self, user_id: str) -> List[Dict[str, Any]]:
+        return await get_storage().rules.active_rules(user_id)
+
+    async def _watch(self) -> None:
+        # Change streams are a MongoDB feature; only started on that backend
+        rules_col = get_db()["automation_rules"]
+        while True:
+            try:
+                async with rules_col.watch(full_document="updateLookup") as stream:
+                    print("👀 Watching automation_rules for changes")
+                    async for change in stream:
+                        self._apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Anything may have changed while the stream was down
+                self.invalidate_all()
+                print(f"⚠️ Rule change stream interrupted: {str(e)}")
+                await asyncio.sleep(5)
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        document = change.get("fullDocument") or {}
+        rule_id = str(change.get("documentKey", {}).get("_id"))
+        user_id = document.get("user_id") or self._rule_owners.get(rule_id)
+        if user_id:
+            self.invalidate(user_id)
+        elif change.get("operationType") in ("drop", "rename", "invalidate"):
+            self.invalidate_all()
+
+    def start_watching(self) -> None:
+        """Start the change stream watcher that keeps workers coherent"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(), name="rule-cache-watch")
+
+    async def stop_watching(self) -> None:
+        """Stop the change stream watcher"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit counters"""
+        return {
+            "users": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl_seconds": self.ttl,
+            "watching": self._watch_task is not None
+        }
+
+
+rule_cache = RuleCache(ttl=settings.RULE_CACHE_TTL_SECONDS, maxsize=settings.RULE_CACHE_MAXSIZE)
@@ -0,0 +1,139 @@
+"""Compiled multi-keyword matcher for automation rules"""
+
+import re
+import unicodedata
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Emoji presentation selectors and skin-tone modifiers are dropped so that
+# "❤️" matches "❤" and "👍🏽" matches "👍"
+_IGNORED_CHARS = {"\ufe0e", "\ufe0f"} | {chr(c) for c in range(0x1F3FB, 0x1F400)}
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for keyword matching
+    NFKC-folds compatibility forms, case-folds, drops emoji modifiers and
+    collapses whitespace runs
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = "".join(ch for ch in text if ch not in _IGNORED_CHARS)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def rule_keywords(rule: Dict[str, Any]) -> List[str]:
+    """
+    Get the normalized keywords of a rule
+    Supports both the `keywords` list and the comma separated `keyword_trigger`
+    """
+    keywords = rule.get("keywords")
+    if keywords is None:
+        keywords = (rule.get("keyword_trigger") or "").split(",")
+    normalized = (normalize_text(k) for k in keywords if isinstance(k, str))
+    return [k for k in normalized if k]
+
+
+def _priority_key(rule: Dict[str, Any]) -> Tuple:
+    # Higher explicit priority first, then oldest rule, then id for stability
+    created_at = rule.get("created_at")
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return (
+        -int(rule.get("priority") or 0),
+        created_at or "",
+        str(rule.get("_id") or rule.get("id") or "")
+    )
+
+
+class RuleMatcher:
+    """
+    Aho-Corasick automaton over the keywords of a set of rules
+
+    All keywords are compiled into one trie so a comment is scanned once,
+    regardless of how many rules or keywords exist. Keywords that start or
+    end with a letter/digit only match on word boundaries, so "price" does
+    not trigger on "priceless".
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = sorted(
+            (r for r in rules if r.get("is_active", True)),
+            key=_priority_key
+        )
+        self.keywords: List[str] = []
+        self._keyword_rules: List[Set[int]] = []
+
+        # Trie state: transitions, failure link and keyword indices per node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        keyword_index: Dict[str, int] = {}
+        for rank, rule in enumerate(self.rules):
+            for keyword in rule_keywords(rule):
+                if keyword not in keyword_index:
+                    keyword_index[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self._keyword_rules.append(set())
+                    self._insert(keyword, keyword_index[keyword])
+                self._keyword_rules[keyword_index[keyword]].add(rank)
+
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, index: int) -> None:
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _matched_ranks(self, text: str) -> Set[int]:
+        text = normalize_text(text)
+        ranks: Set[int] = set()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for index in self._out[node]:
+                keyword = self.keywords[index]
+                start = i - len(keyword) + 1
+                if keyword[0].isalnum() and start > 0 and text[start - 1].isalnum():
+                    continue
+                if keyword[-1].isalnum() and i + 1 < len(text) and text[i + 1].isalnum():
+                    continue
+                ranks |= self._keyword_rules[index]
+        return ranks
+
+    def match(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Get every rule triggered by the text, highest priority first
+        """
+        return [self.rules[rank] for rank in sorted(self._matched_ranks(text))]
+
+    def first_match(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the highest priority rule triggered by the text
+        """
+        ranks = self._matched_ranks(text)
+        return self.rules[min(ranks)] if ranks else None
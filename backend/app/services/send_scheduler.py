@@ -0,0 +1,313 @@
+"""Fair per-account scheduler for outgoing replies and DMs"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.graph_client import GraphAPIClient, GraphAPIError, graph_client
+
+logger = logging.getLogger(__name__)
+
+REPLY = "reply"
+DM = "dm"
+
+# Called with the decoded Graph API response or the GraphAPIError raised
+ResultCallback = Callable[[Any], Awaitable[None]]
+# Called right before the request is sent; returning False drops the job
+SendCheck = Callable[[], Awaitable[bool]]
+
+
+class SendJob:
+    """One outgoing Graph API request waiting for its turn"""
+
+    def __init__(
+        self,
+        account_id: str,
+        kind: str,
+        graph_request: Dict[str, Any],
+        on_result: Optional[ResultCallback] = None,
+        before_send: Optional[SendCheck] = None
+    ):
+        self.account_id = account_id
+        self.kind = kind
+        self.graph_request = graph_request
+        self.on_result = on_result
+        self.before_send = before_send
+        self.enqueued_at = time.monotonic()
+
+
+class AccountQueue:
+    """Pending jobs and counters of one Instagram account"""
+
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.replies: Deque[SendJob] = deque()
+        self.dms: Deque[SendJob] = deque()
+        self.in_ring = False
+        self.inflight = 0
+        # Batches of replies being sent; the account's DMs wait for them
+        self.replies_inflight = 0
+        self.dispatched = 0
+        self.wait_total = 0.0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        return len(self.replies) + len(self.dms)
+
+    def ready(self) -> bool:
+        """Whether the next job may be sent now"""
+        # A DM only goes once the replies queued before it were sent
+        return bool(self.replies) or (bool(self.dms) and not self.replies_inflight)
+
+    def take(self, count: int) -> List[SendJob]:
+        """
+        Up to count jobs of one kind, replies first
+        A batch never mixes replies and DMs: Meta runs the requests of a
+        batch in no guaranteed order
+        """
+        jobs = self.replies or self.dms
+        return [jobs.popleft() for _ in range(min(count, len(jobs)))]
+
+    def drain(self) -> List[SendJob]:
+        """Remove and return every queued job"""
+        jobs = [*self.replies, *self.dms]
+        self.replies.clear()
+        self.dms.clear()
+        return jobs
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest = [q[0].enqueued_at for q in (self.replies, self.dms) if q]
+        return {
+            "replies_queued": len(self.replies),
+            "dms_queued": len(self.dms),
+            "inflight": self.inflight,
+            "dispatched": self.dispatched,
+            "avg_wait_seconds": round(self.wait_total / self.dispatched, 4) if self.dispatched else 0,
+            "max_wait_seconds": round(self.max_wait, 4),
+            "oldest_wait_seconds": round(now - min(oldest), 4) if oldest else 0
+        }
+
+
+class SendScheduler:
+    """
+    Round-robin scheduler across Instagram accounts
+
+    Every account with pending work gets a turn in rotation; a turn sends
+    one Graph API call of at most batch_size jobs before the next account
+    is served. Accounts already at their in-flight limit (typically waiting
+    on their own rate limit) are skipped so they cannot tie up the senders
+    of other accounts. An account's replies go before its DMs: DMs are held
+    back while any of its replies are queued or being sent.
+    """
+
+    def __init__(
+        self,
+        client: GraphAPIClient,
+        workers: int,
+        batch_size: int,
+        max_inflight_per_account: int
+    ):
+        self.client = client
+        self.worker_count = workers
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight_per_account
+        self._accounts: Dict[str, AccountQueue] = {}
+        self._ring: Deque[str] = deque()
+        self._cond: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        # Jobs taken off their queue whose on_result was not called yet
+        self._dispatched: Set[SendJob] = set()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(q) for q in self._accounts.values())
+
+    @property
+    def inflight(self) -> int:
+        return sum(q.inflight for q in self._accounts.values())
+
+    async def start(self) -> None:
+        """Spawn the sender tasks"""
+        if self._workers:
+            return
+        self._cond = asyncio.Condition()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"send-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Send what is queued (up to timeout) and stop the sender tasks
+        Jobs still queued or being sent then get a transient GraphAPIError,
+        so their callbacks hand them to the retry queue
+        """
+        if not self._workers:
+            return
+        deadline = time.monotonic() + (timeout or 0)
+        while self.pending or self.inflight:
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.05)
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        unsent = list(self._dispatched)
+        for queue in self._accounts.values():
+            unsent.extend(queue.drain())
+            queue.in_ring = False
+            queue.inflight = queue.replies_inflight = 0
+        self._ring.clear()
+        if unsent:
+            logger.warning("Send scheduler stopped with %d unsent jobs; settling them for retry", len(unsent))
+            error = GraphAPIError(503, {"message": "Send scheduler stopped before sending", "is_transient": True})
+            for job in unsent:
+                await self._settle(job, error)
+
+    async def submit(self, job: SendJob) -> None:
+        """Queue a job behind the account's earlier jobs of the same kind"""
+        if self._cond is None:
+            raise RuntimeError("Send scheduler is not started")
+
+        queue = self._accounts.get(job.account_id)
+        if queue is None:
+            queue = AccountQueue(job.account_id)
+            self._accounts[job.account_id] = queue
+        (queue.replies if job.kind == REPLY else queue.dms).append(job)
+
+        async with self._cond:
+            if not queue.in_ring:
+                queue.in_ring = True
+                self._ring.append(job.account_id)
+            self._cond.notify()
+
+    def _next_batch(self) -> Optional[Tuple[AccountQueue, List[SendJob]]]:
+        for _ in range(len(self._ring)):
+            queue = self._accounts[self._ring[0]]
+            if queue.inflight >= self.max_inflight or not queue.ready():
+                self._ring.rotate(-1)
+                continue
+
+            jobs = queue.take(self.batch_size)
+            queue.inflight += 1
+            if jobs[0].kind == REPLY:
+                queue.replies_inflight += 1
+            self._dispatched.update(jobs)
+
+            # End of this account's turn: move it to the back of the ring
+            self._ring.popleft()
+            if queue:
+                self._ring.append(queue.account_id)
+            else:
+                queue.in_ring = False
+
+            now = time.monotonic()
+            for job in jobs:
+                wait = now - job.enqueued_at
+                queue.wait_total += wait
+                queue.max_wait = max(queue.max_wait, wait)
+            queue.dispatched += len(jobs)
+            return queue, jobs
+        return None
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            async with self._cond:
+                picked = self._next_batch()
+                while picked is None:
+                    await self._cond.wait()
+                    picked = self._next_batch()
+
+            queue, jobs = picked
+            try:
+                await self._send(queue.account_id, jobs)
+            except Exception:
+                logger.exception("Send worker %d failed", index)
+            finally:
+                async with self._cond:
+                    queue.inflight -= 1
+                    if jobs[0].kind == REPLY:
+                        queue.replies_inflight -= 1
+                    if queue and not queue.in_ring:
+                        queue.in_ring = True
+                        self._ring.append(queue.account_id)
+                    self._cond.notify_all()
+
+    @staticmethod
+    async def _allowed(job: SendJob) -> bool:
+        if job.before_send is None:
+            return True
+        try:
+            return await job.before_send()
+        except Exception:
+            logger.exception("Send check failed")
+            return False
+
+    async def _settle(self, job: SendJob, result: Any) -> None:
+        """Call a job's on_result, once"""
+        self._dispatched.discard(job)
+        if job.on_result is None:
+            return
+        try:
+            await job.on_result(result)
+        except Exception:
+            logger.exception("Send result handler failed")
+
+    async def _send(self, account_id: str, jobs: List[SendJob]) -> None:
+        """
+        Send a batch and call the on_result of every sent job exactly once
+        Jobs whose before_send check fails are dropped without a result
+        """
+        allowed = await asyncio.gather(*(self._allowed(job) for job in jobs))
+        for job, ok in zip(jobs, allowed):
+            if not ok:
+                self._dispatched.discard(job)
+        jobs = [job for job, ok in zip(jobs, allowed) if ok]
+        if not jobs:
+            return
+
+        results: List[Any]
+        try:
+            if len(jobs) == 1:
+                results = [await self.client.send(account_id, jobs[0].graph_request)]
+            else:
+                results = await self.client.batch(account_id, [j.graph_request for j in jobs])
+        except GraphAPIError as e:
+            results = [e] * len(jobs)
+        except Exception as e:
+            # Anything else is unexpected; treat it as transient so the
+            # send is retried rather than left pending
+            results = [GraphAPIError(500, {"message": str(e), "is_transient": True})] * len(jobs)
+
+        if len(results) < len(jobs):
+            missing = GraphAPIError(502, {"message": "No result for this request", "is_transient": True})
+            results = list(results) + [missing] * (len(jobs) - len(results))
+
+        for job, result in zip(jobs, results):
+            await self._settle(job, result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-account queue lengths and wait times"""
+        return {
+            "workers": self.worker_count,
+            "pending": self.pending,
+            "active_accounts": len(self._ring),
+            "accounts": {a: q.stats() for a, q in self._accounts.items()}
+        }
+
+
+send_scheduler = SendScheduler(
+    client=graph_client,
+    workers=settings.SEND_WORKERS,
+    batch_size=settings.SEND_BATCH_SIZE,
+    max_inflight_per_account=settings.SEND_MAX_INFLIGHT_PER_ACCOUNT
+)
+metrics.SEND_QUEUE_PENDING.set_function(lambda: send_scheduler.pending)
@@ -0,0 +1,125 @@
+"""Process-local cache of assembled dashboard statistics"""
+
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from app.core.config import settings
+
+Loader = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class CachedStats:
+    """Dashboard statistics of one user and the version they were loaded at"""
+
+    def __init__(self, version: int, value: Dict[str, Any]):
+        self.version = version
+        self.value = value
+        self.loaded_at = time.monotonic()
+
+
+class StatsCache:
+    """
+    Per-user dashboard statistics cache with stale-while-revalidate
+
+    Entries younger than ttl are served as is. Up to stale_ttl past that
+    they are still served, while a single background refresh reloads them.
+    Concurrent misses for the same user share one load (single-flight).
+    Writing new logs bumps the user's version so the next request loads
+    fresh numbers instead of serving stale ones.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CachedStats]" = OrderedDict()
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._inflight: Dict[str, Tuple[int, asyncio.Task]] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def invalidate(self, user_id: str) -> None:
+        """Mark the cached statistics of a user as outdated"""
+        # Users with nothing cached or loading have nothing to invalidate
+        if user_id in self._entries or user_id in self._inflight:
+            self._versions[user_id] += 1
+
+    def invalidate_many(self, user_ids: Iterable[str]) -> None:
+        """Mark the cached statistics of several users as outdated"""
+        for user_id in user_ids:
+            self.invalidate(user_id)
+
+    async def get(self, user_id: str, loader: Loader) -> Dict[str, Any]:
+        """
+        Get the statistics of a user, calling loader on a miss
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.version == self._versions[user_id]:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(user_id)
+                self._refresh(user_id, loader)
+                return entry.value
+
+        self.misses += 1
+        # Shielded so a disconnecting client does not cancel the shared load
+        return await asyncio.shield(self._refresh(user_id, loader))
+
+    def _refresh(self, user_id: str, loader: Loader) -> asyncio.Task:
+        version = self._versions[user_id]
+        inflight = self._inflight.get(user_id)
+        if inflight is not None and inflight[0] == version:
+            return inflight[1]
+
+        task = asyncio.create_task(self._load(user_id, version, loader), name=f"stats-refresh-{user_id}")
+        self._inflight[user_id] = (version, task)
+        task.add_done_callback(lambda t: self._done(user_id, t))
+        return task
+
+    async def _load(self, user_id: str, version: int, loader: Loader) -> Dict[str, Any]:
+        value = await loader()
+        # An invalidation during the load leaves the entry outdated, so the
+        # next request reloads it
+        self._entries[user_id] = CachedStats(version, value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            self._versions.pop(evicted, None)
+        return value
+
+    def _done(self, user_id: str, task: asyncio.Task) -> None:
+        inflight = self._inflight.get(user_id)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[user_id]
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            print(f"⚠️ Dashboard stats refresh failed for {user_id}: {str(task.exception())}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit counters"""
+        return {
+            "users": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._inflight),
+            "refresh_errors": self.refresh_errors,
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale_ttl
+        }
+
+
+stats_cache = StatsCache(
+    ttl=settings.STATS_CACHE_TTL_SECONDS,
+    stale_ttl=settings.STATS_CACHE_STALE_SECONDS,
+    maxsize=settings.STATS_CACHE_MAXSIZE
+)
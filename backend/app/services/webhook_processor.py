@@ -0,0 +1,148 @@
+"""Processing of queued Instagram webhook events"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core import metrics
+from app.models.models import AutomationModeEnum, CommentLog, DMLog, StatusEnum
+from app.services.analytics_service import analytics_service
+from app.services.event_dedup import event_key, recent_events
+from app.services.graph_client import GraphAPIError, dm_request, reply_request
+from app.services.retry_queue import retry_queue
+from app.services.rule_cache import rule_cache
+from app.services.send_scheduler import DM, REPLY, SendJob, send_scheduler
+
+
+async def process_event(event: Dict[str, Any]) -> None:
+    """
+    Process a single webhook change taken off the queue
+    """
+    value = event["value"]
+    key = event_key(event)
+    if key and recent_events.seen(key):
+        return
+
+    try:
+        # Check if this is a comment event
+        if value.get("item") == "comment":
+            await process_comment(event)
+
+        # Check if this is a DM event
+        elif value.get("item") == "message":
+            # TODO: Process DM
+            print(f"💬 DM received from {value.get('from', {}).get('username')}")
+    except Exception:
+        # Let a redelivery of this event be processed again
+        if key:
+            recent_events.forget(key)
+        raise
+
+
+def rule_dm_message(rule: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the DM a rule sends after replying, if any
+    Supports both the toggle based rules and the mode based AutomationRule
+    """
+    toggle = rule.get("toggle")
+    if toggle is not None:
+        if toggle.get("comment_only") or not toggle.get("send_dm"):
+            return None
+        return toggle.get("dm_message") or None
+    if rule.get("mode") == AutomationModeEnum.COMMENT_AND_DM:
+        return rule.get("dm_message") or None
+    return None
+
+
+async def process_comment(event: Dict[str, Any]) -> None:
+    """
+    Match a comment against the account's active rules, reply and DM
+    The Instagram account id of the webhook entry is the user id the rules
+    are stored under (see app.core.security.is_account_id)
+    """
+    value = event["value"]
+    text = value.get("comment_text") or value.get("text") or ""
+    print(f"📝 Comment received: {text}")
+
+    user_id = event["account_id"]
+    cached = await rule_cache.get(user_id)
+    with metrics.RULE_MATCH_SECONDS.time():
+        rule = cached.matcher.first_match(text)
+    if rule is None:
+        return
+
+    sender = value.get("from") or {}
+
+    # Claim the comment before acting on it; the unique comment_id index
+    # rejects the claim when another worker already handled this delivery
+    comment_log = CommentLog(
+        user_id=user_id,
+        post_id=value.get("post_id") or (value.get("media") or {}).get("id", ""),
+        comment_id=value.get("comment_id") or value.get("id"),
+        username=value.get("username") or sender.get("username", ""),
+        comment_text=text,
+        reply_sent=rule["comment_reply"],
+        rule_applied=rule.get("rule_name") or rule.get("name", ""),
+        status=StatusEnum.PENDING,
+        timestamp=datetime.utcfromtimestamp(event["received_at"]),
+        matched_at=datetime.utcnow()
+    )
+    log_id = await analytics_service.record_comment_log(comment_log)
+    if log_id is None:
+        print(f"♻️ Duplicate comment skipped: {comment_log.comment_id}")
+        return
+
+    # Always reply to the comment
+    reply = reply_request(comment_log.comment_id, comment_log.reply_sent)
+
+    async def on_reply_result(result: Any) -> None:
+        if isinstance(result, GraphAPIError):
+            print(f"❌ Comment reply failed: {str(result)}")
+            await retry_queue.schedule(
+                user_id, REPLY, reply, "comment_logs", log_id, comment_log.timestamp, result
+            )
+        else:
+            await analytics_service.update_log_status(
+                "comment_logs", log_id, user_id, comment_log.timestamp, StatusEnum.SENT
+            )
+
+    await send_scheduler.submit(SendJob(
+        account_id=user_id,
+        kind=REPLY,
+        graph_request=reply,
+        on_result=on_reply_result
+    ))
+
+    # Then DM the commenter if the rule asks for it; the scheduler sends the
+    # account's pending replies before its DMs
+    dm_message = rule_dm_message(rule)
+    if dm_message is None:
+        return
+
+    dm_log = DMLog(
+        user_id=user_id,
+        recipient_id=sender.get("id", ""),
+        recipient_username=comment_log.username,
+        message_sent=dm_message,
+        rule_applied=comment_log.rule_applied,
+        mode=AutomationModeEnum.COMMENT_AND_DM,
+        timestamp=comment_log.timestamp
+    )
+    # Private reply addressed by comment id; works without a prior thread
+    dm = dm_request(user_id, {"comment_id": comment_log.comment_id}, dm_message)
+
+    async def on_dm_result(result: Any) -> None:
+        if isinstance(result, GraphAPIError):
+            print(f"❌ DM failed: {str(result)}")
+            dm_log.status = StatusEnum.PENDING
+            dm_log_id = await analytics_service.record_dm_log(dm_log)
+            await retry_queue.schedule(user_id, DM, dm, "dm_logs", dm_log_id, dm_log.timestamp, result)
+        else:
+            dm_log.sent_at = datetime.utcnow()
+            await analytics_service.record_dm_log(dm_log)
+
+    await send_scheduler.submit(SendJob(
+        account_id=user_id,
+        kind=DM,
+        graph_request=dm,
+        on_result=on_dm_result
+    ))
@@ -0,0 +1,130 @@
+"""In-process queue that decouples webhook acknowledgement from processing"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.webhook_processor import process_event
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class WebhookQueue:
+    """Bounded asyncio queue drained by a fixed pool of worker tasks"""
+
+    def __init__(self, handler: EventHandler, maxsize: int, workers: int):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        # Counters exposed for monitoring
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+        # Events taken by a worker and not finished yet
+        self.active = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self) -> None:
+        """Create the queue and spawn the worker pool"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        print(f"🧵 Started {self.worker_count} webhook workers (queue size {self.maxsize})")
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Drain pending events (up to timeout) and stop the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            queued, active = self.depth, self.active
+            self.dropped += queued + active
+            metrics.WEBHOOK_EVENTS.labels("dropped").inc(queued + active)
+            print(f"⚠️ Dropping {queued} queued and {active} in-progress webhook events on shutdown")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        print("🧵 Stopped webhook workers")
+
+    def enqueue_many(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        Enqueue all events or none of them
+        Returns False when the queue cannot take the whole batch
+        """
+        if not self.running or self.maxsize - self.depth < len(events):
+            self.rejected += len(events)
+            metrics.WEBHOOK_EVENTS.labels("rejected").inc(len(events))
+            return False
+
+        for event in events:
+            self._queue.put_nowait(event)
+        self.enqueued += len(events)
+        metrics.WEBHOOK_EVENTS.labels("enqueued").inc(len(events))
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            event = await self._queue.get()
+            self.active += 1
+            try:
+                lag = time.time() - event.get("received_at", time.time())
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                metrics.WEBHOOK_QUEUE_LAG_SECONDS.observe(lag)
+                await self.handler(event)
+                self.processed += 1
+                metrics.WEBHOOK_EVENTS.labels("processed").inc()
+            except Exception as e:
+                self.failed += 1
+                metrics.WEBHOOK_EVENTS.labels("failed").inc()
+                print(f"❌ Webhook worker {index} failed to process event: {str(e)}")
+            finally:
+                self.active -= 1
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag and throughput counters"""
+        return {
+            "running": self.running,
+            "workers": self.worker_count,
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "last_lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4)
+        }
+
+
+webhook_queue = WebhookQueue(
+    handler=process_event,
+    maxsize=settings.WEBHOOK_QUEUE_MAXSIZE,
+    workers=settings.WEBHOOK_WORKERS
+)
+metrics.WEBHOOK_QUEUE_DEPTH.set_function(lambda: webhook_queue.depth)
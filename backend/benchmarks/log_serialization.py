@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""
+Logs API serialization benchmark
+
+Times turning one page of stored comment or DM logs into the response
+body of GET /api/logs/comments and /api/logs/dms, without storage or HTTP:
+
+  schema   full documents, _id stringified, validated and serialized through
+           the response_model (PaginatedLogsSchema) and encoded with the
+           standard JSONResponse, as the routes did before
+  orjson   documents projected to the displayed fields and encoded by the
+           routes' DocumentResponse
+  fields   the same with a trimmed fields= selection
+
+    cd backend
+    python -m benchmarks.log_serialization
+    python -m benchmarks.log_serialization --page-sizes 20 100 --rounds 20
+
+Reports microseconds per page (median and best round) and response size,
+and saves them as JSON under benchmarks/results/. With MongoDB the
+projection also saves transfer and BSON decoding, which is not included.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.routes.logs import COMMENT_LOG_FIELDS, DM_LOG_FIELDS, _paginated
+from app.models.models import CommentLog, DMLog, StatusEnum
+from app.models.schemas import PaginatedDMLogsSchema, PaginatedLogsSchema
+from benchmarks.payloads import FILLER
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+TRIMMED_FIELDS = {
+    "comments": ["username", "comment_text", "status"],
+    "dms": ["recipient_username", "status"]
+}
+
+
+def comment_logs(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    """Comment logs as stored, newest first"""
+    now = datetime.utcnow()
+    logs = []
+    for i in range(count):
+        timestamp = now - timedelta(seconds=i * 7)
+        logs.append(CommentLog(
+            user_id="bench-account",
+            post_id=str(rng.randint(10 ** 16, 10 ** 17)),
+            comment_id=str(rng.randint(10 ** 16, 10 ** 17)),
+            username=f"user{rng.randint(1, 10 ** 6)}",
+            comment_text=" ".join(rng.choices(FILLER, k=rng.randint(2, 20))),
+            reply_sent="Thanks! Check your DMs 💌",
+            rule_applied=f"rule {rng.randint(0, 9)}",
+            status=StatusEnum.SENT,
+            timestamp=timestamp,
+            matched_at=timestamp + timedelta(milliseconds=rng.randint(1, 50)),
+            sent_at=timestamp + timedelta(milliseconds=rng.randint(100, 900)),
+            _id=ObjectId()
+        ).to_dict())
+    return logs
+
+
+def dm_logs(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    """DM logs as stored, newest first"""
+    now = datetime.utcnow()
+    logs = []
+    for i in range(count):
+        timestamp = now - timedelta(seconds=i * 7)
+        logs.append(DMLog(
+            user_id="bench-account",
+            recipient_id=str(17841400000000000 + rng.randint(1, 10 ** 6)),
+            recipient_username=f"user{rng.randint(1, 10 ** 6)}",
+            message_sent="Here is the link you asked for: https://example.com",
+            rule_applied=f"rule {rng.randint(0, 9)}",
+            status=StatusEnum.SENT,
+            timestamp=timestamp,
+            sent_at=timestamp + timedelta(milliseconds=rng.randint(100, 900)),
+            _id=ObjectId()
+        ).to_dict())
+    return logs
+
+
+def schema_path(response_model) -> Callable[[List[Dict[str, Any]]], Any]:
+    """The response path before the projection and DocumentResponse"""
+    field = create_response_field(name="response", type_=response_model, mode="serialization")
+
+    async def render(stored: List[Dict[str, Any]]) -> bytes:
+        logs = [dict(log) for log in stored]
+        for log in logs:
+            log["_id"] = str(log["_id"])
+        content = await serialize_response(field=field, response_content={
+            "data": logs,
+            "pagination": {
+                "total": None, "page": 1, "page_size": len(logs), "has_next": True,
+                "has_previous": False, "total_pages": None, "next_cursor": "x"
+            }
+        })
+        return JSONResponse(content).body
+    return render
+
+
+def document_path(fields: List[str]) -> Callable[[List[Dict[str, Any]]], Any]:
+    """The current response path; the projection mirrors the in-memory storage"""
+    keys = list(dict.fromkeys(["_id", "timestamp", *fields]))
+
+    async def render(stored: List[Dict[str, Any]]) -> bytes:
+        logs = [{k: log[k] for k in keys if k in log} for log in stored]
+        return _paginated(logs, None, "x", 1, len(logs)).body
+    return render
+
+
+async def measure(render, logs: List[Dict[str, Any]], rounds: int, number: int) -> Dict[str, Any]:
+    """Microseconds per page over rounds of number renders"""
+    size = len(await render(logs))
+    per_page = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            await render(logs)
+        per_page.append((time.perf_counter() - started) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(per_page), 1),
+        "best_us": round(min(per_page), 1),
+        "bytes": size
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    kinds = {
+        "comments": (comment_logs, PaginatedLogsSchema, COMMENT_LOG_FIELDS),
+        "dms": (dm_logs, PaginatedDMLogsSchema, DM_LOG_FIELDS)
+    }
+    results: Dict[str, Any] = {}
+    for kind, (generate, response_model, displayed) in kinds.items():
+        paths = {
+            "schema": schema_path(response_model),
+            "orjson": document_path(list(displayed)),
+            "fields": document_path(TRIMMED_FIELDS[kind])
+        }
+        for page_size in args.page_sizes:
+            logs = generate(rng, page_size)
+            number = max(1, args.logs_per_round // page_size)
+            results[f"{kind}/{page_size}"] = {
+                name: await measure(render, logs, args.rounds, number)
+                for name, render in paths.items()
+            }
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time the logs API response serialization paths")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--rounds", type=int, default=15, help="timed rounds per path")
+    parser.add_argument("--logs-per-round", type=int, default=20000, help="logs rendered per round")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/log_serialization-<time>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    report = {
+        "benchmark": "log_serialization",
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"log_serialization-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'page':<14}{'path':<8}{'median µs':>12}{'best µs':>10}{'bytes':>9}{'speedup':>9}")
+    for page, paths in results.items():
+        baseline = paths["schema"]["median_us"]
+        for name, figures in paths.items():
+            print(
+                f"{page:<14}{name:<8}{figures['median_us']:>12}{figures['best_us']:>10}"
+                f"{figures['bytes']:>9}{baseline / figures['median_us']:>8.1f}x"
+            )
+    print(f"💾 Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""Synthetic Instagram comment webhooks for load replay"""
+
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Words rules trigger on; a few are multi-word or emoji, as in real rules
+KEYWORDS = [
+    "price", "link", "info", "details", "shipping", "discount", "code", "size",
+    "available", "buy", "order", "restock", "giveaway", "collab", "dm me",
+    "how much", "where to buy", "❤", "🔥", "😍"
+]
+
+# Filler vocabulary of comments that should not match any rule
+FILLER = [
+    "love", "this", "so", "cute", "amazing", "wow", "the", "colors", "beautiful",
+    "great", "post", "nice", "shot", "omg", "yes", "need", "that", "vibe",
+    "looks", "good", "perfect", "awesome", "obsessed", "with", "your", "feed"
+]
+
+SHAPES = ("steady", "burst", "ramp")
+
+
+class Workload:
+    """
+    Accounts, their rules and the comment stream sent at them
+
+    Account popularity follows a Zipf distribution with exponent skew, so a
+    few accounts receive most comments, as on a real install. hit_rate is
+    the fraction of comments that contain one of the account's keywords and
+    dm_rate the fraction of rules that also DM the commenter.
+    """
+
+    def __init__(
+        self,
+        accounts: int,
+        rules_per_account: int,
+        keywords_per_rule: int,
+        hit_rate: float,
+        dm_rate: float,
+        skew: float,
+        seed: int
+    ):
+        self.random = random.Random(seed)
+        self.run_id = uuid.UUID(int=self.random.getrandbits(128)).hex[:8]
+        self.hit_rate = hit_rate
+        # Numeric, like the Instagram account ids that are the app's user ids
+        self.account_ids = [f"{int(self.run_id, 16)}{i:06d}" for i in range(accounts)]
+        weights = [1 / (i + 1) ** skew for i in range(accounts)]
+        total = sum(weights)
+        self.cumulative: List[float] = []
+        running = 0.0
+        for weight in weights:
+            running += weight / total
+            self.cumulative.append(running)
+
+        self.rules: Dict[str, List[Dict[str, Any]]] = {}
+        for account_id in self.account_ids:
+            self.rules[account_id] = [
+                self._rule(account_id, n, keywords_per_rule, self.random.random() < dm_rate)
+                for n in range(rules_per_account)
+            ]
+        self._comment_seq = 0
+
+    def _rule(self, account_id: str, n: int, keywords: int, send_dm: bool) -> Dict[str, Any]:
+        return {
+            "user_id": account_id,
+            "rule_name": f"rule {n}",
+            "keywords": self.random.sample(KEYWORDS, min(keywords, len(KEYWORDS))),
+            "comment_reply": "Thanks! Check your DMs 💌" if send_dm else "Thanks for your comment!",
+            "toggle": {
+                "comment_only": not send_dm,
+                "send_dm": send_dm,
+                "dm_message": "Here is the link you asked for: https://example.com" if send_dm else None
+            },
+            "is_active": True,
+            "priority": 0
+        }
+
+    def _account(self) -> str:
+        x = self.random.random()
+        low, high = 0, len(self.cumulative) - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self.cumulative[mid] < x:
+                low = mid + 1
+            else:
+                high = mid
+        return self.account_ids[low]
+
+    def _text(self, account_id: str) -> Tuple[str, bool]:
+        words = self.random.choices(FILLER, k=self.random.randint(2, 12))
+        hit = self.random.random() < self.hit_rate
+        if hit:
+            keyword = self.random.choice(self.random.choice(self.rules[account_id])["keywords"])
+            words.insert(self.random.randint(0, len(words)), keyword)
+        return " ".join(words), hit
+
+    def comment(self) -> Dict[str, Any]:
+        """
+        Next comment as {"account_id", "comment_id", "hit", "change"}
+        change is the entry[].changes[] item of the webhook
+        """
+        account_id = self._account()
+        self._comment_seq += 1
+        comment_id = f"{self.run_id}{self._comment_seq:012d}"
+        commenter = self.random.randint(1, 10 ** 6)
+        text, hit = self._text(account_id)
+        return {
+            "account_id": account_id,
+            "comment_id": comment_id,
+            "hit": hit,
+            "change": {
+                "field": "comments",
+                "value": {
+                    "item": "comment",
+                    "id": comment_id,
+                    "text": text,
+                    "from": {"id": str(17841400000000000 + commenter), "username": f"user{commenter}"},
+                    "media": {"id": f"1790{self.random.randint(10 ** 11, 10 ** 12 - 1)}", "media_product_type": "FEED"}
+                }
+            }
+        }
+
+
+def webhook_body(comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Webhook body delivering comments, one entry per account"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    now = int(time.time())
+    for comment in comments:
+        entry = entries.setdefault(comment["account_id"], {
+            "id": comment["account_id"],
+            "time": now,
+            "changes": []
+        })
+        entry["changes"].append(comment["change"])
+    return {"object": "instagram", "entry": list(entries.values())}
+
+
+def rate_at(shape: str, rate: float, elapsed: float, duration: float, burst_factor: float, burst_period: float) -> float:
+    """
+    Target comments per second at a point of the run
+    burst: the base rate with burst_factor times more traffic during the
+    first fifth of every burst_period seconds; ramp: linear from 0 to rate
+    """
+    if shape == "steady":
+        return rate
+    if shape == "burst":
+        in_burst = (elapsed % burst_period) < burst_period / 5
+        return rate * burst_factor if in_burst else rate
+    if shape == "ramp":
+        return max(rate * elapsed / duration, rate / 100)
+    raise ValueError(f"Unknown shape: {shape}")
+
+
+def arrivals(
+    shape: str,
+    rate: float,
+    duration: float,
+    burst_factor: float = 5.0,
+    burst_period: float = 10.0,
+    rng: Optional[random.Random] = None
+) -> Iterator[float]:
+    """
+    Offsets in seconds from the start of the run at which comments arrive
+    Poisson arrivals at the shape's instantaneous rate
+    """
+    rng = rng or random.Random()
+    elapsed = 0.0
+    while True:
+        current = rate_at(shape, rate, elapsed, duration, burst_factor, burst_period)
+        elapsed += rng.expovariate(current) if current > 0 else math.inf
+        if elapsed >= duration:
+            return
+        yield elapsed
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Document record micro-benchmark
+
+Compares the slotted CommentLog of app.models.models with the dict-backed
+class it replaced (kept below as LegacyCommentLog):
+
+  memory      bytes allocated per record, field values excluded
+  construct   records built per second
+  to_dict     records built and converted to a MongoDB document per second
+  bson_encode records built, converted and encoded to BSON per second
+  from_dict   records decoded from a MongoDB document per second
+  bson_decode records decoded from raw BSON and converted per second
+
+    cd backend
+    python -m benchmarks.record_types
+    python -m benchmarks.record_types --records 200000 --rounds 7
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import bson
+from bson import ObjectId
+
+from app.models.models import CommentLog, StatusEnum
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class LegacyCommentLog:
+    """CommentLog as it was before the slotted records, for comparison"""
+
+    def __init__(
+        self,
+        user_id: str,
+        post_id: str,
+        comment_id: str,
+        username: str,
+        comment_text: str,
+        reply_sent: str,
+        rule_applied: str,
+        status: str = StatusEnum.SENT,
+        timestamp: datetime = None,
+        matched_at: Optional[datetime] = None,
+        sent_at: Optional[datetime] = None,
+        _id: Optional[str] = None
+    ):
+        self._id = _id
+        self.user_id = user_id
+        self.post_id = post_id
+        self.comment_id = comment_id
+        self.username = username
+        self.comment_text = comment_text
+        self.reply_sent = reply_sent
+        self.rule_applied = rule_applied
+        self.status = status
+        self.timestamp = timestamp or datetime.utcnow()
+        self.matched_at = matched_at
+        self.sent_at = sent_at
+        self.created_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "user_id": self.user_id,
+            "post_id": self.post_id,
+            "comment_id": self.comment_id,
+            "username": self.username,
+            "comment_text": self.comment_text,
+            "reply_sent": self.reply_sent,
+            "rule_applied": self.rule_applied,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "matched_at": self.matched_at,
+            "sent_at": self.sent_at,
+            "created_at": self.created_at
+        }
+        if self._id:
+            data["_id"] = self._id
+        return data
+
+
+def arguments(count: int) -> List[Dict[str, Any]]:
+    """Constructor arguments of count comment logs, as the webhook processor passes them"""
+    now = datetime.utcnow()
+    return [
+        {
+            "user_id": "17841400000000001",
+            "post_id": f"1790{i:012d}",
+            "comment_id": f"1800{i:012d}",
+            "username": f"user{i}",
+            "comment_text": "how much is this? love the colors",
+            "reply_sent": "Thanks! Check your DMs 💌",
+            "rule_applied": "price",
+            "status": StatusEnum.PENDING,
+            "timestamp": now - timedelta(milliseconds=i),
+            "matched_at": now
+        }
+        for i in range(count)
+    ]
+
+
+def bytes_per_record(record_type, args: List[Dict[str, Any]]) -> float:
+    """Memory allocated per record; the field values already exist"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [record_type(**a) for a in args]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the records is not part of a record
+    return round((after - before - len(records) * 8) / len(records), 1)
+
+
+def throughput(work: Callable[[], Any], count: int, rounds: int) -> int:
+    """Median records per second over rounds of work on count records"""
+    rates = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        work()
+        rates.append(count / (time.perf_counter() - started))
+    return round(statistics.median(rates))
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    values = arguments(args.records)
+    documents = [CommentLog(**a, _id=ObjectId()).to_dict() for a in values]
+    raw = [bson.encode(d) for d in documents]
+    n, rounds = args.records, args.rounds
+
+    results: Dict[str, Any] = {}
+    for name, record_type in (("legacy", LegacyCommentLog), ("slotted", CommentLog)):
+        figures = {
+            "bytes_per_record": bytes_per_record(record_type, values[:args.memory_records]),
+            "construct": throughput(lambda: [record_type(**a) for a in values], n, rounds),
+            "to_dict": throughput(lambda: [record_type(**a).to_dict() for a in values], n, rounds),
+            "bson_encode": throughput(lambda: [bson.encode(record_type(**a).to_dict()) for a in values], n, rounds)
+        }
+        if name == "slotted":
+            figures["from_dict"] = throughput(lambda: [CommentLog.from_dict(d) for d in documents], n, rounds)
+            figures["bson_decode"] = throughput(
+                lambda: [CommentLog.from_dict(bson.decode(b)) for b in raw], n, rounds
+            )
+        results[name] = figures
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure memory and encode/decode throughput of the document records")
+    parser.add_argument("--records", type=int, default=100000, help="records per timed round")
+    parser.add_argument("--memory-records", type=int, default=10000, help="records allocated for the memory figure")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/record_types-<time>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = run(args)
+    report = {
+        "benchmark": "record_types",
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"record_types-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'':<18}{'legacy':>12}{'slotted':>12}")
+    for metric in results["slotted"]:
+        legacy = results["legacy"].get(metric, "-")
+        unit = "" if metric == "bytes_per_record" else "/s"
+        print(f"{metric + unit:<18}{legacy:>12}{results['slotted'][metric]:>12}")
+    print(f"💾 Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
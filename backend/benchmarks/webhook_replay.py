@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+"""
+Webhook load replay
+
+Drives POST /api/webhook/instagram of an in-process app at a target rate
+of synthetic comments (see benchmarks.payloads) and follows every matched
+comment until its reply is sent to a fake Graph API. Reports throughput,
+end-to-end latency percentiles and per-stage timings, and saves them as
+JSON for comparison between runs:
+
+    cd backend
+    python -m benchmarks.webhook_replay --rate 200 --duration 30
+    python -m benchmarks.webhook_replay --shape burst --compare benchmarks/results/<earlier>.json
+
+Storage defaults to the in-memory backend, so no database is needed; use
+--storage mongo to include MongoDB (rules are seeded under fresh account
+ids and the run's logs are left in place). The fake Graph API
+(tools/fake_graph_api.py) runs in-process unless --graph-url points at a
+separately started one, which keeps its CPU out of the measurement.
+
+Stages, from the stored logs:
+  ack      POST sent -> response received
+  match    webhook receipt -> rule matched and comment claimed (queue wait included)
+  send     matched -> reply sent (scheduler wait and Graph API call)
+  reply    POST sent -> reply sent (end to end)
+  dm       webhook receipt -> DM sent, for rules that DM
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.payloads import SHAPES, Workload, arrivals, webhook_body
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Metrics printed side by side with --compare
+HEADLINE = [
+    ("throughput", "replies_per_second"),
+    ("latency_ms", "reply", "p50"),
+    ("latency_ms", "reply", "p95"),
+    ("latency_ms", "reply", "p99"),
+    ("latency_ms", "ack", "p99"),
+    ("latency_ms", "match", "p99"),
+    ("latency_ms", "send", "p99")
+]
+
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    """Count, mean, p50/p95/p99 and max (nearest rank) of a sample"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1], 3)
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay synthetic Instagram comment webhooks at a target rate")
+    load = parser.add_argument_group("load")
+    load.add_argument("--rate", type=float, default=100, help="comments per second (base rate of the shape)")
+    load.add_argument("--duration", type=float, default=20, help="seconds of traffic")
+    load.add_argument("--shape", choices=SHAPES, default="steady")
+    load.add_argument("--burst-factor", type=float, default=5, help="rate multiplier during bursts")
+    load.add_argument("--burst-period", type=float, default=10, help="seconds between burst starts")
+    load.add_argument("--batch", type=int, default=1, help="comments per webhook request")
+    load.add_argument("--duplicate-rate", type=float, default=0.0, help="fraction of requests redelivered")
+    load.add_argument("--seed", type=int, default=1)
+
+    workload = parser.add_argument_group("workload")
+    workload.add_argument("--accounts", type=int, default=20)
+    workload.add_argument("--rules-per-account", type=int, default=5)
+    workload.add_argument("--keywords-per-rule", type=int, default=3)
+    workload.add_argument("--hit-rate", type=float, default=0.3, help="fraction of comments matching a rule")
+    workload.add_argument("--dm-rate", type=float, default=0.5, help="fraction of rules that also DM")
+    workload.add_argument("--account-skew", type=float, default=1.0, help="Zipf exponent of account popularity")
+
+    system = parser.add_argument_group("system under test")
+    system.add_argument("--storage", choices=("memory", "mongo"), default="memory")
+    system.add_argument("--graph-url", help="base URL of a running fake Graph API (default: in-process)")
+    system.add_argument("--graph-latency-ms", type=float, default=20, help="in-process fake Graph API delay")
+    system.add_argument("--graph-error-rate", type=float, default=0.0, help="in-process fake Graph API failure rate")
+    system.add_argument("--calls-per-hour", type=int, default=10 ** 9, help="Graph API quota per account")
+    system.add_argument("--webhook-workers", type=int, help="override WEBHOOK_WORKERS")
+    system.add_argument("--send-workers", type=int, help="override SEND_WORKERS")
+    system.add_argument("--drain-timeout", type=float, default=30, help="seconds to wait for in-flight work")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output", help="result file (default: benchmarks/results/webhook_replay-<time>.json)")
+    output.add_argument("--compare", help="earlier result file to compare against")
+    output.add_argument("--verbose", action="store_true", help="keep the app's per-event output")
+    return parser.parse_args(argv)
+
+
+def configure(args: argparse.Namespace) -> None:
+    """Point the app's settings at the benchmark setup; must run before app imports"""
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ["GRAPH_API_BASE_URL"] = args.graph_url or "http://fake-graph"
+    os.environ["GRAPH_API_CALLS_PER_HOUR"] = str(args.calls_per_hour)
+    os.environ["GRAPH_API_BURST"] = str(max(20, args.calls_per_hour // 3600))
+    os.environ["RULE_CACHE_CHANGE_STREAM"] = "False"
+    if args.webhook_workers:
+        os.environ["WEBHOOK_WORKERS"] = str(args.webhook_workers)
+    if args.send_workers:
+        os.environ["SEND_WORKERS"] = str(args.send_workers)
+
+
+async def wait_until_idle(timeout: float) -> bool:
+    """Wait for queued webhooks, sends and retries to finish"""
+    from app.services.retry_queue import retry_queue
+    from app.services.send_scheduler import send_scheduler
+    from app.services.webhook_queue import webhook_queue
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        retries = await retry_queue.stats()
+        if (
+            webhook_queue.depth == 0
+            and webhook_queue.processed + webhook_queue.failed >= webhook_queue.enqueued
+            and send_scheduler.pending == 0
+            and send_scheduler.inflight == 0
+            and retries["pending"] + retries["leased"] == 0
+        ):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def collect_logs(account_ids: List[str], since: datetime) -> Dict[str, List[Dict[str, Any]]]:
+    """Comment and DM logs the run wrote, by collection"""
+    from app.repositories import get_storage
+
+    storage = get_storage()
+    until = datetime.utcnow() + timedelta(minutes=1)
+    logs: Dict[str, List[Dict[str, Any]]] = {"comment_logs": [], "dm_logs": []}
+    for collection in logs:
+        repository = storage.logs(collection)
+        for account_id in account_ids:
+            logs[collection] += await repository.page(account_id, since, until, limit=10 ** 9)
+    return logs
+
+
+def summarize(
+    logs: Dict[str, List[Dict[str, Any]]],
+    posted_at: Dict[str, datetime],
+    ack_ms: List[float],
+    started: datetime
+) -> Dict[str, Any]:
+    """Throughput and latency figures of a run"""
+
+    def ms(later: datetime, earlier: datetime) -> float:
+        return (later - earlier).total_seconds() * 1000
+
+    stages: Dict[str, List[float]] = {"ack": ack_ms, "match": [], "send": [], "reply": [], "dm": []}
+    statuses: Dict[str, Dict[str, int]] = {"comment_logs": {}, "dm_logs": {}}
+    last_sent = started
+    for log in logs["comment_logs"]:
+        status = statuses["comment_logs"]
+        status[log["status"]] = status.get(log["status"], 0) + 1
+        if log.get("matched_at"):
+            stages["match"].append(ms(log["matched_at"], log["timestamp"]))
+        if log.get("sent_at"):
+            last_sent = max(last_sent, log["sent_at"])
+            stages["send"].append(ms(log["sent_at"], log["matched_at"] or log["timestamp"]))
+            stages["reply"].append(ms(log["sent_at"], posted_at.get(log["comment_id"], log["timestamp"])))
+
+    # DM logs do not keep the comment id; their timestamp is the comment's receipt
+    for log in logs["dm_logs"]:
+        status = statuses["dm_logs"]
+        status[log["status"]] = status.get(log["status"], 0) + 1
+        if log.get("sent_at"):
+            stages["dm"].append(ms(log["sent_at"], log["timestamp"]))
+
+    replies = len(stages["reply"])
+    span = max((last_sent - started).total_seconds(), 1e-9)
+    return {
+        "throughput": {
+            "replies_sent": replies,
+            "dms_sent": len(stages["dm"]),
+            "replies_per_second": round(replies / span, 2),
+            "busy_seconds": round(span, 3)
+        },
+        "latency_ms": {stage: percentiles(values) for stage, values in stages.items()},
+        "log_statuses": statuses
+    }
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from app.main import app
+    from app.repositories import get_storage
+    from app.services.graph_client import graph_client
+    from app.services.log_buffer import log_buffer
+    from app.services.send_scheduler import send_scheduler
+    from app.services.webhook_queue import webhook_queue
+    from app.services.event_dedup import recent_events
+
+    fake_graph = None
+    if not args.graph_url:
+        from tools import fake_graph_api as fake_graph
+        fake_graph.LATENCY_MS = args.graph_latency_ms
+        fake_graph.ERROR_RATE = args.graph_error_rate
+        graph_client.transport = httpx.ASGITransport(app=fake_graph.app)
+
+    workload = Workload(
+        accounts=args.accounts,
+        rules_per_account=args.rules_per_account,
+        keywords_per_rule=args.keywords_per_rule,
+        hit_rate=args.hit_rate,
+        dm_rate=args.dm_rate,
+        skew=args.account_skew,
+        seed=args.seed
+    )
+    schedule = list(arrivals(
+        args.shape, args.rate, args.duration,
+        burst_factor=args.burst_factor,
+        burst_period=args.burst_period,
+        rng=random.Random(args.seed)
+    ))
+    comments = [workload.comment() for _ in schedule]
+
+    posted_at: Dict[str, datetime] = {}
+    ack_ms: List[float] = []
+    responses: Dict[str, int] = {}
+
+    async def post(client: httpx.AsyncClient, batch: List[Dict[str, Any]]) -> None:
+        body = webhook_body(batch)
+        now = datetime.utcnow()
+        for comment in batch:
+            posted_at.setdefault(comment["comment_id"], now)
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/webhook/instagram", json=body)
+            code = str(response.status_code)
+        except httpx.HTTPError as e:
+            code = type(e).__name__
+        ack_ms.append((time.perf_counter() - start) * 1000)
+        responses[code] = responses.get(code, 0) + 1
+
+    async with app.router.lifespan_context(app):
+        storage = get_storage()
+        for rules in workload.rules.values():
+            for rule in rules:
+                rule["created_at"] = rule["updated_at"] = datetime.utcnow()
+                await storage.rules.create(dict(rule))
+
+        started = datetime.utcnow()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            with open(os.devnull, "w") as devnull, (
+                contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+            ):
+                tasks = []
+                origin = time.perf_counter()
+                rng = random.Random(args.seed + 1)
+                # Open loop: requests go out on schedule whether or not
+                # earlier ones were answered, so queueing shows in latency
+                for i in range(0, len(comments), args.batch):
+                    delay = schedule[i] - (time.perf_counter() - origin)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    tasks.append(asyncio.create_task(post(client, comments[i:i + args.batch])))
+                    if args.duplicate_rate and rng.random() < args.duplicate_rate:
+                        tasks.append(asyncio.create_task(post(client, comments[i:i + args.batch])))
+                await asyncio.gather(*tasks)
+                sending_seconds = time.perf_counter() - origin
+                drained = await wait_until_idle(args.drain_timeout)
+                await log_buffer.flush()
+
+        logs = await collect_logs(workload.account_ids, started - timedelta(seconds=1))
+        result = summarize(logs, posted_at, ack_ms, started)
+        result["offered"] = {
+            "comments": len(comments),
+            "matching_comments": sum(1 for c in comments if c["hit"]),
+            "requests": len(tasks),
+            "comments_per_second": round(len(comments) / max(sending_seconds, 1e-9), 2),
+            "sending_seconds": round(sending_seconds, 3),
+            "responses": responses,
+            "drained": drained
+        }
+        result["server"] = {
+            "webhook_queue": webhook_queue.stats(),
+            "duplicates_dropped": recent_events.duplicates,
+            "send_scheduler": {"workers": send_scheduler.worker_count, "pending": send_scheduler.pending},
+            "graph_client": {k: v for k, v in graph_client.stats().items() if k != "tokens"},
+            "log_buffer": log_buffer.stats()
+        }
+        if fake_graph is not None:
+            result["server"]["fake_graph_calls"] = dict(fake_graph.calls)
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print headline metrics of two runs side by side"""
+    print(f"{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    for path in HEADLINE:
+        values = []
+        for run in (baseline["results"], current["results"]):
+            value: Any = run
+            for key in path:
+                value = value.get(key, {}) if isinstance(value, dict) else {}
+            values.append(value if isinstance(value, (int, float)) else None)
+        old, new = values
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "-"
+        print(f"{'.'.join(path):<32}{old if old is not None else '-':>12}{new if new is not None else '-':>12}{change:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    configure(args)
+
+    results = asyncio.run(replay(args))
+    report = {
+        "benchmark": "webhook_replay",
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"webhook_replay-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    offered, throughput = results["offered"], results["throughput"]
+    print(
+        f"📨 {offered['comments']} comments ({offered['matching_comments']} matching) "
+        f"at {offered['comments_per_second']}/s, responses {offered['responses']}"
+    )
+    print(f"📤 {throughput['replies_sent']} replies, {throughput['dms_sent']} DMs, {throughput['replies_per_second']} replies/s")
+    for stage, figures in results["latency_ms"].items():
+        if figures["count"]:
+            print(f"   {stage:<6} p50 {figures['p50']:>9} ms  p95 {figures['p95']:>9} ms  p99 {figures['p99']:>9} ms")
+    if not offered["drained"]:
+        print(f"⚠️ Work was still in flight after {args.drain_timeout}s; latencies miss the slowest events")
+    print(f"💾 Saved results to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""Shared fixtures: every storage backend, opened fresh per test"""
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db.indexes import create_indexes
+from app.repositories.base import Storage
+from app.repositories.memory import MemoryStorage
+from app.repositories.mongo import MongoStorage
+
+
+async def _memory() -> Storage:
+    return MemoryStorage()
+
+
+async def _mongo() -> Storage:
+    # mongomock enforces the unique indexes the claim and upserts rely on
+    db = AsyncMongoMockClient()["test"]
+    await create_indexes(db)
+    return MongoStorage(db)
+
+
+@pytest.fixture(params=[_memory, _mongo], ids=["memory", "mongo"])
+async def storage(request) -> Storage:
+    storage = await request.param()
+    yield storage
+    await storage.close()
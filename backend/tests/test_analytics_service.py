@@ -0,0 +1,46 @@
+"""Dashboard metrics counted in the user's timezone"""
+
+from datetime import date, datetime
+
+import pytest
+
+import app.repositories as repositories
+import app.services.analytics_service as analytics_module
+from app.repositories.memory import MemoryStorage
+from app.services import latency_histogram, local_time
+from app.services.analytics_service import analytics_service
+
+TODAY = date(2024, 3, 8)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    previous = repositories.storage
+    repositories.storage = MemoryStorage()
+    monkeypatch.setattr(analytics_module.local_time, "local_today", lambda tz: TODAY)
+    yield repositories.storage
+    repositories.storage = previous
+
+
+async def _reply_latency(storage, utc_date, seconds):
+    ms = seconds * 1000
+    await storage.daily_stats.bulk_upsert([(
+        {"user_id": "u1", "date": utc_date},
+        {"$inc": {f"latency_hist.{latency_histogram.bucket_for(ms)}": 1, "latency_count": 1, "latency_sum_ms": ms}}
+    )], datetime.utcnow())
+
+
+@pytest.mark.parametrize("timezone, avg", [
+    # The week starts 2024-03-02 00:00 local, which is 2024-03-01 10:00 UTC
+    ("Pacific/Kiritimati", 20.0),
+    # and 2024-03-02 08:00 UTC here
+    ("America/Los_Angeles", 10.0),
+    ("UTC", 10.0)
+])
+async def test_response_times_cover_the_local_week(storage, timezone, avg):
+    await _reply_latency(storage, "2024-02-29", 100)
+    await _reply_latency(storage, "2024-03-01", 30)
+    await _reply_latency(storage, "2024-03-08", 10)
+
+    times = await analytics_service._get_response_times("u1", local_time.get_timezone(timezone))
+    assert times["avg"] == avg
@@ -0,0 +1,51 @@
+"""The query plan check covers every MongoDB repository query"""
+
+import inspect
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db.diagnostics import _RecordingDatabase, sample_calls, service_queries
+from app.db.indexes import INDEXES
+from app.repositories.mongo import MongoStorage
+
+
+def _repository_methods():
+    storage = MongoStorage(_RecordingDatabase())
+    methods = set()
+    for name, repository in vars(storage).items():
+        if name == "db":
+            continue
+        for method, function in inspect.getmembers(type(repository)):
+            if method.startswith("_"):
+                continue
+            if inspect.iscoroutinefunction(function) or inspect.isasyncgenfunction(function):
+                methods.add((name, method))
+    return methods
+
+
+def test_every_repository_method_has_a_sample_call():
+    sampled = {(repository, method) for repository, method, _ in sample_calls()}
+    missing = _repository_methods() - sampled
+    assert not missing, f"Add these to app.db.diagnostics.sample_calls: {sorted(missing)}"
+    assert sampled <= _repository_methods()
+
+
+async def test_sample_calls_run_against_mongo():
+    # Keeps the sample arguments valid for the real method signatures
+    storage = MongoStorage(AsyncMongoMockClient()["test"])
+    for repository, method, arguments in sample_calls():
+        call = getattr(getattr(storage, repository), method)(**arguments)
+        if inspect.isasyncgen(call):
+            async for _ in call:
+                pass
+        else:
+            await call
+
+
+async def test_every_query_targets_an_indexed_collection():
+    queries = await service_queries()
+    names = [name for name, _ in queries]
+    assert len(names) == len(set(names))
+    for name, command in queries:
+        collection = next(iter(command.values()))
+        assert collection in INDEXES, name
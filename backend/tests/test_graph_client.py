@@ -0,0 +1,189 @@
+"""Graph API client against the local fake Graph API"""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import app.services.graph_client as graph_module
+from app.services.graph_client import (
+    MAX_BATCH_SIZE,
+    GraphAPIClient,
+    GraphAPIError,
+    TokenBucket,
+    dm_request,
+    reply_request
+)
+from tools import fake_graph_api
+
+
+class Clock:
+    """Monotonic time that only moves when the bucket sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(graph_module, "time", SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    monkeypatch.setattr(graph_module, "asyncio", SimpleNamespace(sleep=clock.sleep, Lock=asyncio.Lock))
+    return clock
+
+
+@pytest.fixture
+async def connect():
+    clients = []
+
+    async def start(transport):
+        client = GraphAPIClient(
+            base_url="http://graph.test",
+            api_version="v18.0",
+            access_token="token",
+            calls_per_hour=360000,
+            burst=100,
+            transport=transport
+        )
+        await client.start()
+        clients.append(client)
+        return client
+
+    yield start
+    for client in clients:
+        await client.close()
+
+
+@pytest.fixture
+async def fake_graph(connect, monkeypatch):
+    monkeypatch.setattr(fake_graph_api, "ERROR_RATE", 0)
+    fake_graph_api.calls.clear()
+    return await connect(httpx.ASGITransport(app=fake_graph_api.app))
+
+
+def _answer(status_code, content, headers=None):
+    """A transport that answers every request with the same response"""
+    return httpx.MockTransport(lambda request: httpx.Response(status_code, content=content, headers=headers))
+
+
+# TokenBucket
+
+
+async def test_token_bucket_spends_its_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    for _ in range(4):
+        await bucket.acquire()
+    assert clock.slept == []
+
+    await bucket.acquire()
+    assert clock.slept == [0.5]
+
+
+async def test_token_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    await bucket.acquire(4)
+    clock.now += 60
+
+    await bucket.acquire(4)
+    assert clock.slept == [] and bucket.tokens == 0
+    await bucket.acquire()
+    assert clock.slept == [0.5]
+
+
+async def test_oversized_acquire_goes_into_debt(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    await bucket.acquire(10)
+    assert clock.slept == [] and bucket.tokens == -6
+
+    # The debt and the next token are paid back before the next call
+    await bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(3.5)
+
+
+# Requests and batches
+
+
+async def test_send_reply(fake_graph):
+    result = await fake_graph.send("acct", reply_request("c1", "Thanks!"))
+    assert "id" in result
+    assert fake_graph_api.calls["replies"] == 1
+
+
+async def test_batch_encodes_every_body(fake_graph):
+    results = await fake_graph.batch("acct", [
+        reply_request("c1", "Thanks!"),
+        dm_request("acct", {"comment_id": "c1"}, "Check this out")
+    ])
+
+    # The fake decodes the form-encoded bodies, nested JSON included
+    reply, dm = results
+    assert "id" in reply
+    assert dm["recipient_id"] == "c1"
+    assert dict(fake_graph_api.calls) == {"batch": 1, "replies": 1, "messages": 1}
+    assert fake_graph.calls["batch"] == 1
+
+
+async def test_batch_item_errors_are_returned_per_request(fake_graph, monkeypatch):
+    monkeypatch.setattr(fake_graph_api, "ERROR_RATE", 1)
+    results = await fake_graph.batch("acct", [reply_request("c1", "a"), reply_request("c2", "b")])
+
+    for error in results:
+        assert isinstance(error, GraphAPIError)
+        assert error.status_code == 500 and error.transient
+    assert fake_graph.errors["500"] == 2
+
+
+async def test_batch_size_is_limited(fake_graph):
+    with pytest.raises(ValueError):
+        await fake_graph.batch("acct", [reply_request(f"c{i}", "hi") for i in range(MAX_BATCH_SIZE + 1)])
+    assert not fake_graph_api.calls
+
+
+async def test_batch_result_count_mismatch_is_transient(connect):
+    client = await connect(_answer(200, json.dumps([{"code": 200, "body": "{}"}])))
+    with pytest.raises(GraphAPIError) as raised:
+        await client.batch("acct", [reply_request("c1", "a"), reply_request("c2", "b")])
+
+    assert raised.value.status_code == 502 and raised.value.transient
+    assert "1 results for 2 requests" in str(raised.value)
+    assert client.errors["invalid_response"] == 1
+
+
+async def test_non_json_error_body(connect):
+    client = await connect(_answer(502, b"<html>Bad Gateway</html>", {"content-type": "text/html"}))
+    with pytest.raises(GraphAPIError) as raised:
+        await client.send("acct", reply_request("c1", "a"))
+
+    assert raised.value.status_code == 502 and raised.value.transient
+    assert raised.value.error == {}
+
+
+async def test_non_json_success_body_is_transient(connect):
+    client = await connect(_answer(200, b"<html>maintenance</html>", {"content-type": "text/html"}))
+    with pytest.raises(GraphAPIError) as raised:
+        await client.send("acct", reply_request("c1", "a"))
+
+    assert raised.value.status_code == 502 and raised.value.transient
+    assert client.errors["invalid_response"] == 1
+
+
+async def test_non_json_batch_item_body(connect):
+    client = await connect(_answer(200, json.dumps([
+        {"code": 500, "body": "<html>oops</html>"},
+        {"code": 200, "body": json.dumps({"id": "r1"})}
+    ])))
+    error, reply = await client.batch("acct", [reply_request("c1", "a"), reply_request("c2", "b")])
+
+    assert isinstance(error, GraphAPIError) and error.status_code == 500 and error.error == {}
+    assert reply == {"id": "r1"}
@@ -0,0 +1,38 @@
+"""Distinct commenter sketches"""
+
+from app.services import hyperloglog
+
+
+def test_empty_sketch_estimates_zero():
+    assert hyperloglog.estimate({}) == 0
+    assert hyperloglog.merge() == {}
+
+
+def test_duplicates_do_not_change_the_sketch():
+    values = [f"user{i}" for i in range(100)]
+    assert hyperloglog.build(values) == hyperloglog.build(values * 3)
+
+
+def test_register_index_and_rank_in_range():
+    for i in range(1000):
+        index, rank = hyperloglog.register_for(f"user{i}")
+        assert 0 <= index < hyperloglog.REGISTERS
+        assert 1 <= rank <= 64 - hyperloglog.PRECISION + 1
+
+
+def test_merge_keeps_highest_rank():
+    assert hyperloglog.merge({1: 2, 3: 1}, {1: 1, 2: 5}, {3: 4}) == {1: 2, 2: 5, 3: 4}
+
+
+def test_merged_sketches_equal_sketch_of_union():
+    first = [f"user{i}" for i in range(0, 3000)]
+    second = [f"user{i}" for i in range(2000, 5000)]
+    merged = hyperloglog.merge(hyperloglog.build(first), hyperloglog.build(second))
+    assert merged == hyperloglog.build(first + second)
+
+
+def test_estimate_is_close():
+    for count in (10, 500, 20000):
+        estimate = hyperloglog.estimate(hyperloglog.build(f"user{i}" for i in range(count)))
+        # ~3.3% standard error; allow four of them
+        assert abs(estimate - count) <= max(1, 0.13 * count)
@@ -0,0 +1,38 @@
+"""Reply latency histograms"""
+
+import pytest
+
+from app.services import latency_histogram
+
+
+def test_sub_millisecond_latencies_share_bucket_zero():
+    assert latency_histogram.bucket_for(0) == 0
+    assert latency_histogram.bucket_for(0.999) == 0
+    assert latency_histogram.bucket_bounds(0) == (0.0, 1.0)
+
+
+@pytest.mark.parametrize("ms", [1, 1.1, 7.5, 100, 999.9, 1024, 65000.3])
+def test_value_lies_within_its_bucket(ms):
+    low, high = latency_histogram.bucket_bounds(latency_histogram.bucket_for(ms))
+    assert low <= ms < high
+    # Eight sub-buckets per power of two: ~6% from the midpoint at most
+    assert abs((low + high) / 2 - ms) <= 0.0625 * ms
+
+
+def test_buckets_are_contiguous():
+    for index in range(1, 200):
+        assert latency_histogram.bucket_bounds(index)[1] == latency_histogram.bucket_bounds(index + 1)[0]
+
+
+def test_build_counts_per_bucket():
+    histogram = latency_histogram.build([0.5, 1.0, 1.05, 3.0])
+    assert histogram == {0: 1, 1: 2, latency_histogram.bucket_for(3.0): 1}
+
+
+def test_percentile():
+    assert latency_histogram.percentile({}, 50) == 0.0
+    histogram = latency_histogram.build([10] * 90 + [1000] * 10)
+    assert latency_histogram.percentile(histogram, 50) == pytest.approx(10, rel=0.07)
+    assert latency_histogram.percentile(histogram, 90) == pytest.approx(10, rel=0.07)
+    assert latency_histogram.percentile(histogram, 95) == pytest.approx(1000, rel=0.07)
+    assert latency_histogram.percentile(histogram, 100) == pytest.approx(1000, rel=0.07)
@@ -0,0 +1,39 @@
+"""UTC quarter-hour buckets and users' local days"""
+
+from datetime import date, datetime
+
+import pytest
+
+from app.services import local_time
+
+
+def test_hour_bucket_quarters():
+    hour = datetime(2024, 3, 1, 12)
+    assert local_time.hour_bucket(datetime(2024, 3, 1, 12, 0)) == (hour, 0)
+    assert local_time.hour_bucket(datetime(2024, 3, 1, 12, 14, 59, 999999)) == (hour, 0)
+    assert local_time.hour_bucket(datetime(2024, 3, 1, 12, 15)) == (hour, 1)
+    assert local_time.hour_bucket(datetime(2024, 3, 1, 12, 59, 59)) == (hour, 3)
+
+
+@pytest.mark.parametrize("name", [
+    "UTC", "America/New_York", "Asia/Kolkata", "Asia/Kathmandu", "Australia/Eucla", "Pacific/Chatham"
+])
+def test_local_midnights_fall_on_quarter_boundaries(name):
+    tz = local_time.get_timezone(name)
+    for day in (date(2024, 1, 15), date(2024, 7, 15)):
+        midnight = local_time.local_midnight(tz, day)
+        hour, quarter = local_time.hour_bucket(midnight)
+        assert midnight == hour + quarter * local_time.QUARTER
+        assert local_time.local_date(tz, midnight) == day.isoformat()
+
+
+def test_local_midnight_and_date():
+    tz = local_time.get_timezone("Asia/Kathmandu")  # UTC+05:45
+    assert local_time.local_midnight(tz, date(2024, 3, 2)) == datetime(2024, 3, 1, 18, 15)
+    assert local_time.local_date(tz, datetime(2024, 3, 1, 18, 14)) == "2024-03-01"
+    assert local_time.local_date(tz, datetime(2024, 3, 1, 18, 15)) == "2024-03-02"
+
+
+def test_unknown_timezone_raises():
+    with pytest.raises(local_time.UnknownTimezoneError):
+        local_time.get_timezone("Mars/Olympus_Mons")
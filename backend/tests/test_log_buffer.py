@@ -0,0 +1,199 @@
+"""Write-behind log buffer: merging, retries, spilling and replay"""
+
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import app.repositories as repositories
+from app.repositories.base import StorageError
+from app.repositories.memory import MemoryStorage
+from app.services.log_buffer import LogBuffer
+
+T0 = datetime(2024, 3, 1, 12, 0, 0)
+DAY = {"user_id": "u1", "date": "2024-03-01"}
+
+
+@pytest.fixture
+def storage():
+    previous = repositories.storage
+    repositories.storage = MemoryStorage()
+    yield repositories.storage
+    repositories.storage = previous
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    return LogBuffer(max_batch=100, flush_interval=0.01, max_attempts=3, spill_dir=str(tmp_path))
+
+
+def _log(i, **fields):
+    return {"_id": ObjectId(), "user_id": "u1", "comment_id": f"c{i}", "status": "pending", "timestamp": T0, **fields}
+
+
+async def _comment_logs(storage):
+    return await storage.comment_logs.page("u1", T0, T0, limit=100)
+
+
+def _fail_once(repository, method, failing):
+    """Make the next call of a bulk method fail for the positions failing returns"""
+    original = getattr(repository, method)
+
+    async def flaky(operations, *args):
+        setattr(repository, method, original)
+        positions = failing(operations)
+        if isinstance(operations, dict):
+            kept = {k: v for i, (k, v) in enumerate(operations.items()) if i not in positions}
+        else:
+            kept = [op for i, op in enumerate(operations) if i not in positions]
+        written = await original(kept, *args) if kept else 0
+        raise StorageError("write failed", written=written, failed=sorted(positions))
+
+    setattr(repository, method, flaky)
+
+
+async def test_update_merges_into_pending_insert(storage, buffer):
+    _id = buffer.insert("comment_logs", _log(0))
+    buffer.update("comment_logs", _id, {"status": "sent"})
+    assert buffer.pending == 1
+
+    await buffer.flush()
+    [log] = await _comment_logs(storage)
+    assert log["_id"] == _id and log["status"] == "sent"
+    assert buffer.stats()["written"] == 1
+
+
+async def test_increments_fold_into_one_upsert(storage, buffer):
+    buffer.increment("daily_stats", DAY, {"comments_count": 1})
+    buffer.increment("daily_stats", DAY, {"comments_count": 2, "dms_count": 1})
+    buffer.maximize("daily_stats", DAY, {"commenters_hll.3": 2})
+    buffer.maximize("daily_stats", DAY, {"commenters_hll.3": 5})
+    assert buffer.pending == 1
+
+    await buffer.flush()
+    assert await storage.daily_stats.sum_counters("u1", ["comments_count", "dms_count"]) == {
+        "comments_count": 3, "dms_count": 1
+    }
+    assert await storage.daily_stats.merge_commenters("u1") == {3: 5}
+
+
+async def test_partial_bulk_failure_is_retried(storage, buffer):
+    ids = [buffer.insert("comment_logs", _log(i)) for i in range(3)]
+    _fail_once(storage.comment_logs, "bulk_insert", lambda documents: {1})
+
+    await buffer.flush()
+    assert [log["_id"] for log in await _comment_logs(storage)] == [ids[2], ids[0]]
+    stats = buffer.stats()
+    assert (stats["pending"], stats["failed"], stats["retrying"]) == (1, 1, 1)
+
+    await buffer.flush()
+    assert {log["_id"] for log in await _comment_logs(storage)} == set(ids)
+    stats = buffer.stats()
+    assert (stats["pending"], stats["retrying"], stats["written"]) == (0, 0, 3)
+
+
+async def test_failed_update_keeps_newer_fields(storage, buffer):
+    _id = buffer.insert("comment_logs", _log(0))
+    await buffer.flush()
+
+    buffer.update("comment_logs", _id, {"status": "sent", "attempts": 1})
+    _fail_once(storage.comment_logs, "bulk_update", lambda changes: {0})
+    await buffer.flush()
+    # A newer status buffered before the retry wins over the failed one
+    buffer.update("comment_logs", _id, {"status": "failed"})
+    await buffer.flush()
+
+    [log] = await _comment_logs(storage)
+    assert (log["status"], log["attempts"]) == ("failed", 1)
+
+
+async def test_failed_increment_merges_with_newer_ones(storage, buffer):
+    buffer.increment("daily_stats", DAY, {"comments_count": 2})
+    _fail_once(storage.daily_stats, "bulk_upsert", lambda operations: {0})
+    await buffer.flush()
+    buffer.increment("daily_stats", DAY, {"comments_count": 1})
+    assert buffer.pending == 1
+
+    await buffer.flush()
+    assert await storage.daily_stats.sum_counters("u1", ["comments_count"]) == {"comments_count": 3}
+
+
+async def test_unexpected_error_puts_the_batch_back(storage, buffer, monkeypatch):
+    buffer.insert("comment_logs", _log(0))
+    buffer.increment("daily_stats", DAY, {"comments_count": 1})
+
+    def broken(collection):
+        raise RuntimeError("storage closed")
+
+    monkeypatch.setattr(storage, "rollups", broken)
+    with pytest.raises(RuntimeError):
+        await buffer.flush()
+    # The insert was written; the upsert is buffered again
+    assert len(await _comment_logs(storage)) == 1
+    assert buffer.pending == 1
+
+    monkeypatch.undo()
+    await buffer.flush()
+    assert await storage.daily_stats.sum_counters("u1", ["comments_count"]) == {"comments_count": 1}
+
+
+async def test_flusher_survives_unexpected_errors(storage, buffer, monkeypatch):
+    calls = []
+
+    def broken_once(collection):
+        calls.append(collection)
+        monkeypatch.undo()
+        raise RuntimeError("storage closed")
+
+    monkeypatch.setattr(storage, "logs", broken_once)
+    buffer.start()
+    buffer.insert("comment_logs", _log(0))
+    for _ in range(100):
+        if await _comment_logs(storage):
+            break
+        await asyncio.sleep(0.01)
+    await buffer.stop()
+
+    assert calls == ["comment_logs"]
+    assert len(await _comment_logs(storage)) == 1
+
+
+async def test_spilled_writes_are_replayed_on_start(storage, buffer, tmp_path, monkeypatch):
+    async def down(*args):
+        raise ConnectionError("storage down")
+
+    monkeypatch.setattr(storage.comment_logs, "bulk_insert", down)
+    monkeypatch.setattr(storage.daily_stats, "bulk_upsert", down)
+    _id = buffer.insert("comment_logs", _log(0))
+    buffer.increment("daily_stats", DAY, {"comments_count": 2})
+    for _ in range(buffer.max_attempts):
+        await buffer.flush()
+
+    assert buffer.pending == 0
+    assert buffer.stats()["spilled"] == 2
+    [spill_file] = os.listdir(tmp_path)
+
+    monkeypatch.undo()
+    restarted = LogBuffer(max_batch=100, flush_interval=0.01, spill_dir=str(tmp_path))
+    restarted.start()
+    assert restarted.pending == 2 and restarted.stats()["restored"] == 2
+    await restarted.stop()
+
+    assert os.listdir(tmp_path) == []
+    [log] = await _comment_logs(storage)
+    assert log["_id"] == _id
+    assert await storage.daily_stats.sum_counters("u1", ["comments_count"]) == {"comments_count": 2}
+
+
+async def test_stop_spills_what_cannot_be_written(storage, buffer, tmp_path, monkeypatch):
+    async def down(*args):
+        raise ConnectionError("storage down")
+
+    monkeypatch.setattr(storage.comment_logs, "bulk_insert", down)
+    buffer.insert("comment_logs", _log(0))
+    await buffer.stop()
+
+    assert buffer.pending == 0 and buffer.stats()["spilled"] == 1
+    assert len(os.listdir(tmp_path)) == 1
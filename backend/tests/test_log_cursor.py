@@ -0,0 +1,35 @@
+"""Keyset pagination cursors of the logs API"""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.log_cursor import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    log = {"timestamp": datetime(2024, 3, 1, 12, 30, 15, 123000), "_id": ObjectId()}
+    cursor = decode_cursor(encode_cursor(log, 3))
+    assert (cursor.timestamp, cursor._id, cursor.page) == (log["timestamp"], log["_id"], 3)
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor({"timestamp": datetime(2024, 3, 1), "_id": ObjectId()}, 2)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+def test_page_is_at_least_one():
+    cursor = encode_cursor({"timestamp": datetime(2024, 3, 1), "_id": ObjectId()}, -4)
+    assert decode_cursor(cursor).page == 1
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor",
+    "eyJ0IjoiMjAyNCJ9",  # {"t":"2024"}: no id
+    "eyJ0IjoieCIsImlkIjoieCJ9"  # {"t":"x","id":"x"}
+])
+def test_invalid_cursor_raises(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
@@ -0,0 +1,51 @@
+"""Logs API responses and their OpenAPI schema"""
+
+from datetime import datetime
+
+import httpx
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+
+import app.repositories as repositories
+from app.api.routes import logs
+from app.core.security import get_current_user
+from app.repositories.memory import MemoryStorage
+
+ACCOUNT = "17841400000000001"
+
+
+@pytest.fixture
+def api():
+    app = FastAPI()
+    app.include_router(logs.router, prefix="/api/logs")
+    app.dependency_overrides[get_current_user] = lambda: ACCOUNT
+    return app
+
+
+@pytest.fixture
+async def client(api):
+    previous = repositories.storage
+    repositories.storage = MemoryStorage()
+    await repositories.storage.comment_logs.claim({
+        "_id": ObjectId(), "user_id": ACCOUNT, "post_id": "p1", "comment_id": "c1", "username": "ann",
+        "comment_text": "price?", "reply_sent": "Check your DMs", "rule_applied": "price",
+        "status": "sent", "timestamp": datetime.utcnow()
+    })
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test") as client:
+        yield client
+    repositories.storage = previous
+
+
+async def test_fields_returns_partial_logs(client):
+    response = await client.get("/api/logs/comments", params={"fields": "username,status"})
+    assert response.status_code == 200
+    [log] = response.json()["data"]
+    assert set(log) == {"_id", "timestamp", "username", "status"}
+
+
+async def test_schema_allows_partial_logs(api):
+    schemas = api.openapi()["components"]["schemas"]
+    for name in ("ProjectedCommentLogSchema", "ProjectedDMLogSchema"):
+        assert schemas[name]["required"] == ["timestamp"]
+        assert "_id" in schemas[name]["properties"]
@@ -0,0 +1,54 @@
+"""Slotted document records"""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.models import ActivityLog, AutomationRule, CommentLog, DailyStats, DMLog, StatusEnum
+
+T0 = datetime(2024, 3, 1, 12, 0, 0)
+
+RECORDS = [
+    CommentLog(
+        user_id="u1", post_id="p1", comment_id="c1", username="ann", comment_text="price?",
+        reply_sent="Check your DMs", rule_applied="price", status=StatusEnum.PENDING, timestamp=T0
+    ),
+    DMLog(user_id="u1", recipient_id="r1", recipient_username="ann", message_sent="Hi", rule_applied="price"),
+    ActivityLog(user_id="u1", action="rule_created", details={"rule": "price"}),
+    DailyStats(user_id="u1", date="2024-03-01", comments_count=3),
+    AutomationRule(user_id="u1", name="price", keyword_trigger="price,cost", comment_reply="Thanks!")
+]
+
+
+@pytest.mark.parametrize("record", RECORDS, ids=lambda r: type(r).__name__)
+def test_to_dict_has_every_slot(record):
+    document = record.to_dict()
+    assert set(document) == set(type(record).__slots__) - {"_id"}
+    assert document == {name: getattr(record, name) for name in document}
+
+
+def test_to_dict_adds_id_once_set():
+    record = CommentLog(
+        user_id="u1", post_id="p1", comment_id="c1", username="ann", comment_text="hi",
+        reply_sent="hey", rule_applied="r", _id=ObjectId()
+    )
+    assert record.to_dict()["_id"] == record._id
+    assert list(record.to_dict())[-1] == "_id"
+
+
+@pytest.mark.parametrize("record", RECORDS, ids=lambda r: type(r).__name__)
+def test_from_dict_round_trip(record):
+    record._id = ObjectId()
+    assert type(record).from_dict(record.to_dict()).to_dict() == record.to_dict()
+
+
+def test_from_dict_fills_missing_fields_with_defaults():
+    rule = AutomationRule.from_dict({"user_id": "u1", "name": "price"})
+    assert rule._id is None
+    assert (rule.is_active, rule.priority, rule.total_triggered, rule.dm_message) == (True, 0, 0, None)
+
+
+def test_records_have_no_instance_dict():
+    for record in RECORDS:
+        assert not hasattr(record, "__dict__")
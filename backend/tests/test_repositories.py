@@ -0,0 +1,220 @@
+"""Contract of the repository interfaces, run against every storage backend"""
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.repositories.memory import MAX_ID, MIN_ID
+
+T0 = datetime(2024, 3, 1, 12, 0, 0)
+
+
+async def _add_logs(storage, count, user_id="u1", step=timedelta(minutes=1)):
+    """count comment logs, one per step from T0, oldest first"""
+    logs = []
+    for i in range(count):
+        log = {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "comment_id": f"{user_id}-c{i}",
+            "username": f"user{i}",
+            "status": "sent",
+            "timestamp": T0 + i * step
+        }
+        assert await storage.comment_logs.claim(dict(log)) == log["_id"]
+        logs.append(log)
+    return logs
+
+
+def _ids(logs):
+    return [log["_id"] for log in logs]
+
+
+# page and count
+
+
+async def test_page_is_newest_first_with_inclusive_bounds(storage):
+    logs = await _add_logs(storage, 5)
+    page = await storage.comment_logs.page("u1", logs[1]["timestamp"], logs[3]["timestamp"], limit=10)
+    assert _ids(page) == _ids(logs[3:0:-1])
+
+
+async def test_page_limit_and_skip(storage):
+    logs = await _add_logs(storage, 5)
+    newest_first = logs[::-1]
+    page = await storage.comment_logs.page("u1", T0, logs[-1]["timestamp"], limit=2, skip=1)
+    assert _ids(page) == _ids(newest_first[1:3])
+    assert await storage.comment_logs.page("u1", T0, logs[-1]["timestamp"], limit=2, skip=5) == []
+
+
+async def test_page_resumes_strictly_after_position(storage):
+    logs = await _add_logs(storage, 5)
+    after = (logs[3]["timestamp"], logs[3]["_id"])
+    page = await storage.comment_logs.page("u1", T0, logs[-1]["timestamp"], limit=10, after=after)
+    assert _ids(page) == _ids(logs[2::-1])
+
+
+async def test_page_orders_equal_timestamps_by_id(storage):
+    # Keyset paging must not skip or repeat logs sharing a timestamp
+    logs = await _add_logs(storage, 4, step=timedelta(0))
+    newest_first = sorted(logs, key=lambda log: log["_id"], reverse=True)
+
+    seen = []
+    after = None
+    while True:
+        page = await storage.comment_logs.page("u1", T0, T0, limit=3, after=after)
+        if not page:
+            break
+        seen.extend(page)
+        after = (page[-1]["timestamp"], page[-1]["_id"])
+    assert _ids(seen) == _ids(newest_first)
+
+
+async def test_page_after_with_skip(storage):
+    logs = await _add_logs(storage, 6)
+    after = (logs[4]["timestamp"], logs[4]["_id"])
+    page = await storage.comment_logs.page("u1", T0, logs[-1]["timestamp"], limit=2, skip=1, after=after)
+    assert _ids(page) == _ids([logs[2], logs[1]])
+
+
+async def test_page_fields_keep_id(storage):
+    await _add_logs(storage, 1)
+    [log] = await storage.comment_logs.page("u1", T0, T0, limit=1, fields=["username"])
+    assert set(log) == {"_id", "username"}
+
+
+async def test_page_is_per_user(storage):
+    await _add_logs(storage, 2, user_id="u1")
+    other = await _add_logs(storage, 2, user_id="u2")
+    page = await storage.comment_logs.page("u2", T0, T0 + timedelta(hours=1), limit=10)
+    assert _ids(page) == _ids(other[::-1])
+
+
+async def test_count_bounds_are_inclusive(storage):
+    logs = await _add_logs(storage, 5)
+    await _add_logs(storage, 2, user_id="u2")
+    first, last = logs[0]["timestamp"], logs[-1]["timestamp"]
+    assert await storage.comment_logs.count(first, last, "u1") == 5
+    assert await storage.comment_logs.count(logs[1]["timestamp"], logs[3]["timestamp"], "u1") == 3
+    assert await storage.comment_logs.count(first, last) == 7
+    assert await storage.comment_logs.count(last + timedelta(seconds=1), last + timedelta(hours=1), "u1") == 0
+
+
+def test_memory_position_bounds_cover_every_id():
+    _id = ObjectId()
+    assert (T0, MIN_ID) < (T0, _id) < (T0, MAX_ID)
+
+
+# claim and bulk writes
+
+
+async def test_claim_rejects_duplicate_comment_id(storage):
+    first = await storage.comment_logs.claim({"user_id": "u1", "comment_id": "c1", "timestamp": T0})
+    assert first is not None
+    assert await storage.comment_logs.claim({"user_id": "u1", "comment_id": "c1", "timestamp": T0}) is None
+    assert await storage.comment_logs.count(T0, T0, "u1") == 1
+
+
+async def test_bulk_insert_skips_claimed_comment_ids(storage):
+    await storage.comment_logs.claim({"user_id": "u1", "comment_id": "c1", "timestamp": T0})
+    written = await storage.comment_logs.bulk_insert([
+        {"_id": ObjectId(), "user_id": "u1", "comment_id": "c1", "timestamp": T0},
+        {"_id": ObjectId(), "user_id": "u1", "comment_id": "c2", "timestamp": T0}
+    ])
+    assert written == 1
+    assert await storage.comment_logs.count(T0, T0, "u1") == 2
+
+
+async def test_bulk_update_sets_fields(storage):
+    [log] = await _add_logs(storage, 1)
+    await storage.comment_logs.bulk_update({log["_id"]: {"status": "failed"}})
+    [page] = await storage.comment_logs.page("u1", T0, T0, limit=1)
+    assert page["status"] == "failed"
+
+
+async def test_bulk_upsert_applies_dotted_inc_and_max(storage):
+    key = {"user_id": "u1", "date": "2024-03-01"}
+    await storage.daily_stats.bulk_upsert([
+        (key, {"$inc": {"comments_sent": 2, "latency_hist.5": 1}, "$max": {"commenters_hll.7": 3}})
+    ], T0)
+    await storage.daily_stats.bulk_upsert([
+        (key, {"$inc": {"comments_sent": 1, "latency_hist.5": 2}, "$max": {"commenters_hll.7": 2, "commenters_hll.9": 4}})
+    ], T0)
+
+    assert await storage.daily_stats.sum_counters("u1", ["comments_sent"]) == {"comments_sent": 3}
+    assert await storage.daily_stats.merge_commenters("u1") == {7: 3, 9: 4}
+    histogram, _, _ = await storage.daily_stats.merge_latencies("u1", "2024-03-01")
+    assert histogram == {5: 3}
+    assert await storage.daily_stats.user_ids("2024-03-01") == ["u1"]
+
+
+async def test_bulk_upsert_hourly_quarters(storage):
+    hour = T0.replace(minute=0)
+    await storage.hourly_stats.bulk_upsert([
+        ({"user_id": "u1", "hour": hour}, {"$inc": {"quarters.2.comments_sent": 1}}),
+        ({"user_id": "u1", "hour": hour}, {"$inc": {"quarters.2.comments_sent": 1, "quarters.3.dms_sent": 1}})
+    ], T0)
+    [row] = await storage.hourly_stats.find_range("u1", hour, hour + timedelta(hours=1))
+    assert row["hour"] == hour
+    assert row["quarters"] == {"2": {"comments_sent": 2}, "3": {"dms_sent": 1}}
+
+
+# retry job leases
+
+
+def _job(next_attempt_at):
+    return {"_id": ObjectId(), "state": "pending", "attempts": 0, "next_attempt_at": next_attempt_at}
+
+
+async def test_lease_takes_earliest_due_job(storage):
+    jobs = storage.retry_jobs
+    late, early, future = _job(T0 - timedelta(seconds=10)), _job(T0 - timedelta(seconds=30)), _job(T0 + timedelta(hours=1))
+    for job in (late, early, future):
+        await jobs.insert(job)
+
+    expires = T0 + timedelta(minutes=1)
+    assert (await jobs.lease("a", T0, expires))["_id"] == early["_id"]
+    assert (await jobs.lease("a", T0, expires))["_id"] == late["_id"]
+    assert await jobs.lease("a", T0, expires) is None
+
+
+async def test_lease_retakes_expired_lease(storage):
+    jobs = storage.retry_jobs
+    job = _job(T0)
+    await jobs.insert(job)
+    await jobs.lease("a", T0, T0 + timedelta(minutes=1))
+
+    assert await jobs.lease("b", T0 + timedelta(seconds=30), T0 + timedelta(minutes=2)) is None
+    leased = await jobs.lease("b", T0 + timedelta(minutes=1), T0 + timedelta(minutes=2))
+    assert leased["_id"] == job["_id"] and leased["lease_owner"] == "b"
+    # The previous owner lost the job
+    assert not await jobs.complete(job["_id"], "a")
+
+
+async def test_renew_extends_only_own_leases(storage):
+    jobs = storage.retry_jobs
+    mine, theirs = _job(T0), _job(T0 + timedelta(seconds=1))
+    await jobs.insert(mine)
+    await jobs.insert(theirs)
+    await jobs.lease("a", T0 + timedelta(seconds=1), T0 + timedelta(minutes=1))
+    await jobs.lease("b", T0 + timedelta(seconds=1), T0 + timedelta(minutes=1))
+
+    assert await jobs.renew([mine["_id"], theirs["_id"]], "a", T0 + timedelta(minutes=5)) == 1
+    assert await jobs.lease("c", T0 + timedelta(minutes=2), T0 + timedelta(minutes=3)) is not None
+    assert await jobs.lease("c", T0 + timedelta(minutes=2), T0 + timedelta(minutes=3)) is None
+
+
+async def test_release_and_complete(storage):
+    jobs = storage.retry_jobs
+    job = _job(T0)
+    await jobs.insert(job)
+    await jobs.lease("a", T0, T0 + timedelta(minutes=1))
+
+    assert not await jobs.release(job["_id"], "b", {"state": "pending"})
+    assert await jobs.release(job["_id"], "a", {"state": "pending", "next_attempt_at": T0 + timedelta(seconds=5)})
+    assert await jobs.count_by_state(["pending", "leased"]) == {"pending": 1, "leased": 0}
+
+    leased = await jobs.lease("b", T0 + timedelta(seconds=5), T0 + timedelta(minutes=1))
+    assert leased["attempts"] == 1 and "lease_owner" in leased
+    assert await jobs.complete(job["_id"], "b")
+    assert await jobs.count_by_state(["pending", "leased"]) == {"pending": 0, "leased": 0}
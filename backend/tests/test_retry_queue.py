@@ -0,0 +1,200 @@
+"""Persistent retry queue: leases, renewal, backoff and dead jobs"""
+
+import asyncio
+from datetime import datetime
+from typing import List
+
+import pytest
+from bson import ObjectId
+
+import app.repositories as repositories
+import app.services.retry_queue as retry_module
+from app.models.models import StatusEnum
+from app.repositories.memory import MemoryStorage
+from app.services.graph_client import GraphAPIError
+from app.services.retry_queue import DEAD, LEASED, PENDING, RetryQueue
+from app.services.send_scheduler import REPLY, SendJob
+
+T0 = datetime(2024, 3, 1, 12, 0, 0)
+TRANSIENT = GraphAPIError(503, {"message": "try again", "is_transient": True})
+
+
+class FakeScheduler:
+    """Holds submitted jobs until the test sends them"""
+
+    def __init__(self):
+        self.submitted: List[SendJob] = []
+
+    async def submit(self, job: SendJob) -> None:
+        self.submitted.append(job)
+
+
+async def _send(job: SendJob, result) -> bool:
+    """Run a job the way the send scheduler does"""
+    if not await job.before_send():
+        return False
+    await job.on_result(result)
+    return True
+
+
+@pytest.fixture
+def storage():
+    previous = repositories.storage
+    repositories.storage = MemoryStorage()
+    yield repositories.storage
+    repositories.storage = previous
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Log status updates, in order"""
+    updates = []
+
+    async def update_log_status(collection, log_id, user_id, timestamp, status, details=None):
+        updates.append((status, details))
+
+    monkeypatch.setattr(retry_module.analytics_service, "update_log_status", update_log_status)
+    return updates
+
+
+@pytest.fixture
+async def queues():
+    created = []
+
+    def make(**options):
+        settings = {
+            "max_attempts": 3, "base_delay": 0, "max_delay": 0, "visibility_timeout": 60,
+            "poll_interval": 0.01, "lease_batch": 10, "dead_ttl_days": 14, **options
+        }
+        queue = RetryQueue(scheduler=FakeScheduler(), **settings)
+        created.append(queue)
+        return queue
+
+    yield make
+    for queue in created:
+        await queue.stop()
+
+
+async def _schedule(queue, error=TRANSIENT):
+    await queue.schedule("acct", REPLY, {"method": "POST", "relative_url": "c1/replies"},
+                         "comment_logs", str(ObjectId()), T0, error)
+
+
+async def _lease_and_submit(queue):
+    job = await queue._lease()
+    await queue._submit(job)
+    return queue.scheduler.submitted[-1]
+
+
+async def test_transient_failure_is_queued(storage, statuses, queues):
+    queue = queues()
+    await _schedule(queue)
+
+    assert await queue.stats() == {PENDING: 1, LEASED: 0, DEAD: 0}
+    assert statuses == [(StatusEnum.PENDING, {"attempts": 1, "last_error": "try again"})]
+
+
+async def test_permanent_failure_fails_the_log(storage, statuses, queues):
+    queue = queues()
+    await _schedule(queue, GraphAPIError(400, {"message": "bad request"}))
+
+    assert await queue.stats() == {PENDING: 0, LEASED: 0, DEAD: 0}
+    assert [status for status, _ in statuses] == [StatusEnum.FAILED]
+
+
+async def test_failed_insert_fails_the_log(storage, statuses, queues, monkeypatch):
+    async def down(job):
+        raise ConnectionError("storage down")
+
+    monkeypatch.setattr(storage.retry_jobs, "insert", down)
+    await _schedule(queues())
+
+    assert statuses == [(StatusEnum.FAILED, {"attempts": 1, "last_error": "try again"})]
+
+
+async def test_a_leased_job_is_invisible_to_others(storage, statuses, queues):
+    first, second = queues(), queues()
+    await _schedule(first)
+
+    job = await _lease_and_submit(first)
+    assert await second._lease() is None
+    assert await _send(job, {"id": "reply"})
+
+    assert await first.stats() == {PENDING: 0, LEASED: 0, DEAD: 0}
+    assert statuses[-1] == (StatusEnum.SENT, {"attempts": 2})
+    assert not first._inflight
+
+
+async def test_expired_lease_is_taken_over_and_not_sent_twice(storage, statuses, queues):
+    first, second = queues(visibility_timeout=0.02), queues()
+    await _schedule(first)
+    stale = await _lease_and_submit(first)
+
+    await asyncio.sleep(0.03)
+    taken = await _lease_and_submit(second)
+    # The first holder lost its lease: it neither sends nor settles the job
+    assert not await _send(stale, {"id": "reply"})
+    assert not first._inflight
+    assert await _send(taken, {"id": "reply"})
+
+    assert [status for status, _ in statuses] == [StatusEnum.PENDING, StatusEnum.SENT]
+
+
+async def test_leases_are_renewed_while_jobs_wait(storage, statuses, queues):
+    first, second = queues(visibility_timeout=0.06), queues()
+    await _schedule(first)
+    first.start()
+    for _ in range(100):
+        if first.scheduler.submitted:
+            break
+        await asyncio.sleep(0.005)
+
+    # Well past the visibility timeout, the renewed lease still holds
+    await asyncio.sleep(0.15)
+    assert await second._lease() is None
+    # Polling re-leased nothing and did not submit the job again
+    assert len(first.scheduler.submitted) == 1
+    assert await _send(first.scheduler.submitted[0], {"id": "reply"})
+
+
+async def test_transient_failures_back_off_then_die(storage, statuses, queues):
+    queue = queues(max_attempts=3)
+    await _schedule(queue)
+
+    job = await _lease_and_submit(queue)
+    await _send(job, TRANSIENT)
+    assert await queue.stats() == {PENDING: 1, LEASED: 0, DEAD: 0}
+    assert statuses[-1] == (StatusEnum.PENDING, {"attempts": 2, "last_error": "try again"})
+
+    job = await _lease_and_submit(queue)
+    await _send(job, TRANSIENT)
+    assert await queue.stats() == {PENDING: 0, LEASED: 0, DEAD: 1}
+    assert statuses[-1] == (StatusEnum.FAILED, {"attempts": 3, "last_error": "try again"})
+    assert await queue._lease() is None
+
+    [dead] = storage.retry_jobs._jobs.values()
+    assert (dead["expires_at"] - dead["updated_at"]).days == 14
+
+
+async def test_permanent_retry_failure_dies_at_once(storage, statuses, queues):
+    queue = queues(max_attempts=5)
+    await _schedule(queue)
+
+    job = await _lease_and_submit(queue)
+    await _send(job, GraphAPIError(400, {"message": "comment deleted"}))
+    assert await queue.stats() == {PENDING: 0, LEASED: 0, DEAD: 1}
+    assert statuses[-1][0] == StatusEnum.FAILED
+
+
+async def test_own_expired_lease_is_not_submitted_again(storage, statuses, queues):
+    queue = queues(visibility_timeout=0.02)
+    await _schedule(queue)
+    job = await _lease_and_submit(queue)
+
+    await asyncio.sleep(0.03)
+    queue.start()
+    await asyncio.sleep(0.05)
+    # The poller re-leased the job it still holds, without a second send
+    assert len(queue.scheduler.submitted) == 1
+    assert await _send(job, {"id": "reply"})
+    assert [status for status, _ in statuses] == [StatusEnum.PENDING, StatusEnum.SENT]
@@ -0,0 +1,132 @@
+"""Rule cache: invalidation, load races and eviction"""
+
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.services.rule_cache import RuleCache
+
+
+class ControlledRuleCache(RuleCache):
+    """Loads from a dict of rules per user; loads wait for the gate when it is closed"""
+
+    def __init__(self, maxsize=100):
+        super().__init__(ttl=60, maxsize=maxsize)
+        self.rules = {}
+        self.loads = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def _load(self, user_id):
+        self.loads += 1
+        rules = list(self.rules.get(user_id, []))
+        await self.gate.wait()
+        if user_id == "broken":
+            raise ConnectionError("storage down")
+        return rules
+
+
+def _rule(keyword):
+    return {"_id": ObjectId(), "user_id": "u1", "name": keyword, "keyword_trigger": keyword, "is_active": True}
+
+
+def _state(cache, user_id):
+    """Which per-user structures still hold the user"""
+    return {
+        "entry": user_id in cache._entries,
+        "version": user_id in cache._versions,
+        "lock": user_id in cache._locks,
+        "owners": user_id in cache._rule_owners.values()
+    }
+
+
+async def test_cached_until_invalidated():
+    cache = ControlledRuleCache()
+    cache.rules["u1"] = [_rule("price")]
+    first = await cache.get("u1")
+    assert await cache.get("u1") is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.rules["u1"] = [_rule("link")]
+    cache.invalidate("u1")
+    reloaded = await cache.get("u1")
+    assert reloaded.matcher.first_match("the link?")["name"] == "link"
+    assert cache.loads == 2
+
+
+async def test_invalidate_evicts_every_trace_of_the_user():
+    cache = ControlledRuleCache()
+    cache.rules["u1"] = [_rule("price")]
+    await cache.get("u1")
+    assert _state(cache, "u1")["owners"]
+
+    cache.invalidate("u1")
+    assert not any(_state(cache, "u1").values())
+    # Invalidating a user that was never loaded leaves nothing behind either
+    cache.invalidate("u2")
+    assert not any(_state(cache, "u2").values())
+
+
+async def test_invalidation_during_a_load_forces_a_reload():
+    cache = ControlledRuleCache()
+    cache.rules["u1"] = [_rule("price")]
+    cache.gate.clear()
+    loading = asyncio.create_task(cache.get("u1"))
+    await asyncio.sleep(0)
+
+    # The rule changes while the old rules are being loaded
+    cache.rules["u1"] = [_rule("link")]
+    cache.invalidate("u1")
+    cache.gate.set()
+    stale = await loading
+    assert stale.matcher.first_match("the link?") is None
+
+    fresh = await cache.get("u1")
+    assert fresh.matcher.first_match("the link?")["name"] == "link"
+    assert cache.loads == 2
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = ControlledRuleCache()
+    cache.rules["u1"] = [_rule("price")]
+    cache.gate.clear()
+    waiting = [asyncio.create_task(cache.get("u1")) for _ in range(5)]
+    await asyncio.sleep(0)
+    cache.gate.set()
+
+    entries = await asyncio.gather(*waiting)
+    assert cache.loads == 1
+    assert all(entry is entries[0] for entry in entries)
+
+
+async def test_least_recently_used_user_is_evicted():
+    cache = ControlledRuleCache(maxsize=2)
+    for user_id in ("u1", "u2"):
+        cache.rules[user_id] = [_rule("price")]
+        await cache.get(user_id)
+    await cache.get("u1")
+
+    cache.rules["u3"] = [_rule("price")]
+    await cache.get("u3")
+    assert list(cache._entries) == ["u1", "u3"]
+    assert not any(_state(cache, "u2").values())
+    assert cache.stats()["users"] == 2
+
+
+async def test_failed_load_leaves_nothing_behind():
+    cache = ControlledRuleCache()
+    with pytest.raises(ConnectionError):
+        await cache.get("broken")
+    assert not any(_state(cache, "broken").values())
+
+
+async def test_change_to_a_deleted_rule_invalidates_its_owner():
+    cache = ControlledRuleCache()
+    rule = _rule("price")
+    cache.rules["u1"] = [rule]
+    await cache.get("u1")
+
+    # Delete events carry no fullDocument; the owner comes from the cache
+    cache._apply_change({"operationType": "delete", "documentKey": {"_id": rule["_id"]}})
+    assert not _state(cache, "u1")["entry"]
@@ -0,0 +1,63 @@
+"""Keyword matching of automation rules"""
+
+from datetime import datetime
+
+from app.services.rule_matcher import RuleMatcher, normalize_text, rule_keywords
+
+
+def _rule(name, keywords, **fields):
+    return {"_id": name, "rule_name": name, "keywords": keywords, **fields}
+
+
+def test_normalize_text_folds_case_width_and_emoji_modifiers():
+    assert normalize_text("  ＰＲＩＣＥ\tPlease ") == "price please"
+    assert normalize_text("👍🏽 ❤️") == "👍 ❤"
+    assert normalize_text(None) == ""
+
+
+def test_rule_keywords_from_list_or_trigger():
+    assert rule_keywords({"keywords": ["Price", " ", 3, "LINK "]}) == ["price", "link"]
+    assert rule_keywords({"keyword_trigger": "price, info,,"}) == ["price", "info"]
+
+
+def test_keywords_match_on_word_boundaries():
+    matcher = RuleMatcher([_rule("price", ["price"])])
+    assert matcher.first_match("What's the PRICE?")["rule_name"] == "price"
+    assert matcher.first_match("priceless") is None
+    assert matcher.first_match("overprice") is None
+
+
+def test_keywords_with_symbols_match_inside_words():
+    matcher = RuleMatcher([_rule("heart", ["❤"]), _rule("tag", ["#sale"])])
+    assert matcher.first_match("love it❤️❤️")["rule_name"] == "heart"
+    assert matcher.first_match("shop#sale now")["rule_name"] == "tag"
+    assert matcher.first_match("#sales") is None
+
+
+def test_overlapping_keywords_all_match():
+    matcher = RuleMatcher([_rule("he", ["he"]), _rule("she", ["she"]), _rule("hers", ["hers"])])
+    assert {r["rule_name"] for r in matcher.match("she said hers")} == {"she", "hers"}
+    assert {r["rule_name"] for r in matcher.match("he")} == {"he"}
+
+
+def test_match_orders_by_priority_then_age():
+    rules = [
+        _rule("new", ["buy"], created_at=datetime(2024, 2, 1)),
+        _rule("old", ["buy"], created_at=datetime(2024, 1, 1)),
+        _rule("urgent", ["buy"], priority=5, created_at=datetime(2024, 3, 1))
+    ]
+    matcher = RuleMatcher(rules)
+    assert [r["rule_name"] for r in matcher.match("buy now")] == ["urgent", "old", "new"]
+    assert matcher.first_match("buy now")["rule_name"] == "urgent"
+
+
+def test_inactive_rules_are_skipped():
+    matcher = RuleMatcher([_rule("off", ["price"], is_active=False), _rule("on", ["link"])])
+    assert matcher.first_match("price") is None
+    assert matcher.first_match("link")["rule_name"] == "on"
+
+
+def test_shared_keyword_triggers_every_rule():
+    matcher = RuleMatcher([_rule("a", ["price"]), _rule("b", ["price", "cost"])])
+    assert [r["rule_name"] for r in matcher.match("the price")] == ["a", "b"]
+    assert matcher.keywords == ["price", "cost"]
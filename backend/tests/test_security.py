@@ -0,0 +1,128 @@
+"""Bearer token checks and the verified token cache"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import app.core.security as security
+from app.core.security import (
+    VerifiedTokenCache,
+    create_access_token,
+    get_current_user,
+    is_account_id,
+    revoke_token,
+    token_key,
+    verify_token
+)
+
+
+def _bearer(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_account_ids_are_numeric_strings():
+    assert is_account_id("17841400000000001")
+    for value in ("", "acct", "1784-1", None, 17841400000000001):
+        assert not is_account_id(value)
+
+
+async def test_current_user_is_the_account_id_of_the_token():
+    token = create_access_token({"sub": "17841400000000001"})
+    assert await get_current_user(_bearer(token)) == "17841400000000001"
+
+
+@pytest.mark.parametrize("claims", [{}, {"sub": "someone@example.com"}])
+async def test_tokens_not_for_an_account_are_rejected(claims):
+    with pytest.raises(HTTPException) as raised:
+        await get_current_user(_bearer(create_access_token(claims)))
+    assert raised.value.status_code == 401
+
+
+# VerifiedTokenCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(security, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def _key(i):
+    return token_key(f"token-{i}")
+
+
+def test_cached_payload_expires_at_exp(clock):
+    cache = VerifiedTokenCache(maxsize=10)
+    cache.put(_key(0), {"sub": "1", "exp": clock.now + 60})
+    assert cache.get(_key(0)) == {"sub": "1", "exp": clock.now + 60}
+
+    clock.now += 60
+    assert cache.get(_key(0)) is None
+    assert len(cache) == 0 and (cache.hits, cache.misses) == (1, 1)
+
+
+def test_payloads_without_exp_are_not_cached(clock):
+    cache = VerifiedTokenCache(maxsize=10)
+    cache.put(_key(0), {"sub": "1"})
+    assert cache.get(_key(0)) is None
+
+
+def test_callers_cannot_change_a_cached_payload(clock):
+    cache = VerifiedTokenCache(maxsize=10)
+    payload = {"sub": "1", "exp": clock.now + 60}
+    cache.put(_key(0), payload)
+    payload["sub"] = "2"
+    cache.get(_key(0))["sub"] = "3"
+    assert cache.get(_key(0))["sub"] == "1"
+
+
+def test_size_is_bounded_least_recently_used_first(clock):
+    cache = VerifiedTokenCache(maxsize=3)
+    for i in range(3):
+        cache.put(_key(i), {"sub": str(i), "exp": clock.now + 60})
+    cache.get(_key(0))
+    cache.put(_key(3), {"sub": "3", "exp": clock.now + 60})
+
+    assert len(cache) == 3
+    assert cache.get(_key(1)) is None
+    assert cache.get(_key(0)) is not None
+
+
+def test_revoked_token_is_dropped_and_rejected_until_it_expires(clock):
+    cache = VerifiedTokenCache(maxsize=10)
+    cache.put(_key(0), {"sub": "1", "exp": clock.now + 60})
+    cache.revoke(_key(0), clock.now + 60)
+    assert cache.get(_key(0)) is None
+    assert cache.is_revoked(_key(0))
+
+    clock.now += 60
+    assert not cache.is_revoked(_key(0))
+
+
+def test_expired_revocations_are_pruned_on_lookup(clock):
+    cache = VerifiedTokenCache(maxsize=10)
+    for i in range(100):
+        cache.revoke(_key(i), clock.now + i + 1)
+
+    clock.now += 50
+    # Any lookup forgets every revocation that expired, not just its own
+    assert not cache.is_revoked(_key(1000))
+    assert len(cache._revoked) == 50 and len(cache._revoked_expiry) == 50
+
+
+def test_logout_revokes_the_token():
+    token = create_access_token({"sub": "17841400000000002"})
+    assert verify_token(token) is not None
+    revoke_token(token)
+    assert verify_token(token) is None
@@ -0,0 +1,192 @@
+"""Per-account send scheduling"""
+
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services.graph_client import GraphAPIError
+from app.services.send_scheduler import DM, REPLY, SendJob, SendScheduler
+
+
+class FakeGraphClient:
+    """Records every call; each takes delay seconds, or until released when delay is None"""
+
+    def __init__(self, delay=0.01, results=None):
+        self.delay = delay
+        self.results = results
+        self.calls: List[Dict[str, Any]] = []
+        self.active: Dict[str, int] = defaultdict(int)
+        self.max_active: Dict[str, int] = defaultdict(int)
+        self.released = asyncio.Event()
+
+    async def send(self, account_id, request):
+        return (await self.batch(account_id, [request]))[0]
+
+    async def batch(self, account_id, requests):
+        call = {"account_id": account_id, "urls": [r["relative_url"] for r in requests]}
+        self.calls.append(call)
+        self.active[account_id] += 1
+        self.max_active[account_id] = max(self.max_active[account_id], self.active[account_id])
+        try:
+            if self.delay is None:
+                await self.released.wait()
+            else:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.active[account_id] -= 1
+        if self.results is not None:
+            return self.results(requests)
+        return [{"id": r["relative_url"]} for r in requests]
+
+
+def _job(account_id, kind, url, results=None):
+    async def on_result(result):
+        if results is not None:
+            results[url].append(result)
+    return SendJob(account_id, kind, {"method": "POST", "relative_url": url}, on_result=on_result)
+
+
+async def _drain(scheduler):
+    while scheduler.pending or scheduler.inflight:
+        await asyncio.sleep(0.005)
+
+
+@pytest.fixture
+async def started():
+    schedulers = []
+
+    async def start(client, workers=1, batch_size=2, max_inflight=1):
+        scheduler = SendScheduler(client, workers, batch_size, max_inflight)
+        await scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield start
+    for scheduler in schedulers:
+        await scheduler.stop(timeout=1)
+
+
+async def test_accounts_take_turns(started):
+    client = FakeGraphClient()
+    scheduler = await started(client, workers=1, batch_size=2)
+    for i in range(10):
+        await scheduler.submit(_job("busy", REPLY, f"busy/{i}"))
+    await scheduler.submit(_job("quiet", REPLY, "quiet/0"))
+    await scheduler.submit(_job("quiet", REPLY, "quiet/1"))
+    await _drain(scheduler)
+
+    accounts = [call["account_id"] for call in client.calls]
+    assert accounts[:3] == ["busy", "quiet", "busy"]
+    assert all(len(call["urls"]) <= 2 for call in client.calls)
+    assert sum(len(call["urls"]) for call in client.calls) == 12
+
+
+async def test_replies_are_sent_before_dms(started):
+    client = FakeGraphClient(delay=0.05)
+    scheduler = await started(client, workers=4, batch_size=10, max_inflight=4)
+    await scheduler.submit(_job("a", DM, "dm/0"))
+    await scheduler.submit(_job("a", REPLY, "reply/0"))
+    await scheduler.submit(_job("a", REPLY, "reply/1"))
+    await _drain(scheduler)
+
+    # One call per kind, and the DMs only once the replies completed
+    reply_call, dm_call = client.calls
+    assert reply_call["urls"] == ["reply/0", "reply/1"]
+    assert dm_call["urls"] == ["dm/0"]
+    assert client.max_active["a"] == 1
+
+
+async def test_dms_wait_for_replies_in_flight(started):
+    client = FakeGraphClient(delay=0.05)
+    scheduler = await started(client, workers=4, batch_size=10, max_inflight=4)
+    await scheduler.submit(_job("a", REPLY, "reply/0"))
+    await asyncio.sleep(0.01)
+    await scheduler.submit(_job("a", DM, "dm/0"))
+    await asyncio.sleep(0.01)
+
+    assert [call["urls"] for call in client.calls] == [["reply/0"]]
+    await _drain(scheduler)
+    assert [call["urls"] for call in client.calls] == [["reply/0"], ["dm/0"]]
+
+
+async def test_in_flight_calls_are_capped_per_account(started):
+    client = FakeGraphClient(delay=0.02)
+    scheduler = await started(client, workers=6, batch_size=1, max_inflight=2)
+    for i in range(12):
+        await scheduler.submit(_job("a", REPLY, f"a/{i}"))
+    for i in range(3):
+        await scheduler.submit(_job("b", REPLY, f"b/{i}"))
+    await _drain(scheduler)
+
+    assert client.max_active["a"] == 2
+    assert client.max_active["b"] == 2
+    # b was not stuck behind a's backlog
+    b_calls = [i for i, call in enumerate(client.calls) if call["account_id"] == "b"]
+    assert b_calls[0] < 4
+
+
+async def test_every_job_gets_a_result(started):
+    # Meta answered with fewer results than requests
+    client = FakeGraphClient(results=lambda requests: [{"id": "only"}])
+    scheduler = await started(client, batch_size=3)
+    results = defaultdict(list)
+    for i in range(3):
+        await scheduler.submit(_job("a", REPLY, f"r/{i}", results))
+    await _drain(scheduler)
+
+    assert results["r/0"] == [{"id": "only"}]
+    for url in ("r/1", "r/2"):
+        [error] = results[url]
+        assert isinstance(error, GraphAPIError) and error.transient
+
+
+async def test_unexpected_client_error_is_transient(started):
+    def fail(requests):
+        raise RuntimeError("connection reset")
+
+    client = FakeGraphClient(results=fail)
+    scheduler = await started(client)
+    results = defaultdict(list)
+    await scheduler.submit(_job("a", REPLY, "r/0", results))
+    await _drain(scheduler)
+
+    [error] = results["r/0"]
+    assert isinstance(error, GraphAPIError) and error.transient
+
+
+async def test_stop_settles_unsent_jobs():
+    client = FakeGraphClient(delay=None)
+    scheduler = SendScheduler(client, workers=1, batch_size=1, max_inflight_per_account=1)
+    await scheduler.start()
+    results = defaultdict(list)
+    for i in range(3):
+        await scheduler.submit(_job("a", REPLY, f"r/{i}", results))
+    await asyncio.sleep(0.01)
+    assert len(client.calls) == 1
+
+    await scheduler.stop(timeout=0.05)
+
+    # The job being sent and the two still queued are all handed back, once
+    assert set(results) == {"r/0", "r/1", "r/2"}
+    for [error] in results.values():
+        assert isinstance(error, GraphAPIError) and error.transient
+    assert scheduler.pending == 0 and scheduler.inflight == 0
+
+
+async def test_dropped_by_send_check_gets_no_result(started):
+    client = FakeGraphClient()
+    scheduler = await started(client)
+    results = defaultdict(list)
+    job = _job("a", REPLY, "r/0", results)
+
+    async def lease_lost():
+        return False
+
+    job.before_send = lease_lost
+    await scheduler.submit(job)
+    await _drain(scheduler)
+    await scheduler.stop(timeout=0)
+
+    assert client.calls == [] and not results
@@ -0,0 +1,124 @@
+"""Dashboard stats cache: single-flight loads and stale-while-revalidate"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.stats_cache as stats_module
+from app.services.stats_cache import StatsCache
+
+
+class Loader:
+    """Counts its calls and returns them; waits for the gate when it is closed"""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self):
+        self.calls += 1
+        value = {"load": self.calls}
+        await self.gate.wait()
+        return value
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the cache's clock; the event loop keeps the real one
+    monkeypatch.setattr(stats_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _cache(maxsize=100):
+    return StatsCache(ttl=10, stale_ttl=60, maxsize=maxsize)
+
+
+async def test_concurrent_misses_share_one_load():
+    cache, loader = _cache(), Loader()
+    loader.gate.clear()
+    waiting = [asyncio.create_task(cache.get("u1", loader)) for _ in range(10)]
+    await asyncio.sleep(0)
+    loader.gate.set()
+
+    assert await asyncio.gather(*waiting) == [{"load": 1}] * 10
+    assert loader.calls == 1
+    assert await cache.get("u1", loader) == {"load": 1}
+    assert cache.stats()["hits"] == 1
+
+
+async def test_stale_value_is_served_while_it_refreshes(clock):
+    cache, loader = _cache(), Loader()
+    assert await cache.get("u1", loader) == {"load": 1}
+
+    clock.now += 30
+    loader.gate.clear()
+    # Past ttl but within stale_ttl: the old value, one refresh in the background
+    assert await cache.get("u1", loader) == {"load": 1}
+    assert await cache.get("u1", loader) == {"load": 1}
+    assert cache.stats()["stale_hits"] == 2 and cache.stats()["refreshing"] == 1
+
+    loader.gate.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert await cache.get("u1", loader) == {"load": 2}
+    assert loader.calls == 2
+
+
+async def test_too_stale_value_is_reloaded(clock):
+    cache, loader = _cache(), Loader()
+    await cache.get("u1", loader)
+
+    clock.now += 100
+    assert await cache.get("u1", loader) == {"load": 2}
+    assert cache.stats()["misses"] == 2
+
+
+async def test_invalidation_during_a_load_forces_a_reload():
+    cache, loader = _cache(), Loader()
+    loader.gate.clear()
+    loading = asyncio.create_task(cache.get("u1", loader))
+    await asyncio.sleep(0)
+
+    cache.invalidate("u1")
+    loader.gate.set()
+    assert await loading == {"load": 1}
+    # The value loaded across the invalidation is not served again
+    assert await cache.get("u1", loader) == {"load": 2}
+
+
+async def test_failed_refresh_keeps_serving_the_stale_value(clock):
+    cache = _cache()
+
+    async def ok():
+        return {"load": 1}
+
+    async def broken():
+        raise ConnectionError("storage down")
+
+    await cache.get("u1", ok)
+    clock.now += 30
+    assert await cache.get("u1", broken) == {"load": 1}
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache.stats()["refresh_errors"] == 1
+    assert await cache.get("u1", broken) == {"load": 1}
+
+
+async def test_least_recently_used_user_is_evicted():
+    cache, loader = _cache(maxsize=2), Loader()
+    for user_id in ("u1", "u2", "u1", "u3"):
+        await cache.get(user_id, loader)
+
+    assert list(cache._entries) == ["u1", "u3"]
+    assert "u2" not in cache._versions
@@ -0,0 +1,102 @@
+"""Webhook intake: validation, backpressure and shutdown"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import webhooks
+from app.core.config import settings
+from app.services.webhook_queue import WebhookQueue
+
+ACCOUNT = "17841400000000001"
+
+
+def _payload(*changes):
+    return {"object": "instagram", "entry": [{"id": ACCOUNT, "time": 0, "changes": list(changes)}]}
+
+
+def _comment(i=0):
+    return {"field": "comments", "value": {"id": f"c{i}", "text": "price?"}}
+
+
+class BlockingHandler:
+    """Holds every event until released"""
+
+    def __init__(self):
+        self.events = []
+        self.released = asyncio.Event()
+
+    async def __call__(self, event):
+        self.events.append(event)
+        await self.released.wait()
+
+
+@pytest.fixture
+async def queue(monkeypatch):
+    queue = WebhookQueue(handler=BlockingHandler(), maxsize=2, workers=1)
+    await queue.start()
+    monkeypatch.setattr(webhooks, "webhook_queue", queue)
+    yield queue
+    queue.handler.released.set()
+    await queue.stop(timeout=1)
+
+
+@pytest.fixture
+async def client(queue):
+    app = FastAPI()
+    app.include_router(webhooks.router, prefix="/api/webhook")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_changes_are_queued(client, queue):
+    response = await client.post("/api/webhook/instagram", json=_payload(_comment(0), _comment(1)))
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "queued": 2}
+    assert queue.enqueued == 2
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"entry": {}},
+    {"entry": ["acct"]},
+    {"entry": [{"id": "acct", "changes": [_comment()]}]},
+    {"entry": [{"id": ACCOUNT, "changes": {"field": "comments"}}]},
+    {"entry": [{"id": ACCOUNT, "changes": 3}]},
+    {"entry": [{"id": ACCOUNT, "changes": ["comments"]}]},
+    {"entry": [{"id": ACCOUNT, "changes": [{"field": "comments", "value": "c1"}]}]}
+], ids=["list", "entry dict", "entry string", "account id", "changes dict", "changes number", "change string", "value string"])
+async def test_malformed_payloads_are_rejected(client, queue, payload):
+    response = await client.post("/api/webhook/instagram", json=payload)
+    assert response.status_code == 400
+    assert queue.enqueued == 0
+
+
+async def test_invalid_json_is_rejected(client):
+    response = await client.post("/api/webhook/instagram", content=b"{not json")
+    assert response.status_code == 400
+
+
+async def test_full_queue_asks_meta_to_retry(client, queue):
+    # The worker holds the first event; the queue takes two more
+    assert (await client.post("/api/webhook/instagram", json=_payload(_comment(0)))).status_code == 200
+    await asyncio.sleep(0.01)
+    assert (await client.post("/api/webhook/instagram", json=_payload(_comment(1)))).status_code == 200
+
+    # All or nothing: two more changes do not fit in the one free slot
+    response = await client.post("/api/webhook/instagram", json=_payload(_comment(2), _comment(3)))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.WEBHOOK_RETRY_AFTER_SECONDS)
+    assert queue.depth == 1 and queue.rejected == 2
+
+
+async def test_stop_reports_dropped_events(queue, capsys):
+    assert queue.enqueue_many([{"received_at": 0}, {"received_at": 0}])
+    await asyncio.sleep(0.01)
+    assert queue.enqueue_many([{"received_at": 0}])
+
+    await queue.stop(timeout=0.01)
+    assert queue.dropped == 3
+    assert "Dropping 2 queued and 1 in-progress webhook events" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Local fake of the Instagram Graph API endpoints used by the app
+
+Run it and point GRAPH_API_BASE_URL at it:
+    uvicorn tools.fake_graph_api:app --port 9000
+    GRAPH_API_BASE_URL=http://localhost:9000
+
+FAKE_GRAPH_LATENCY_MS adds a fixed delay per call and FAKE_GRAPH_ERROR_RATE
+makes that fraction of calls fail with a transient 500.
+"""
+
+import asyncio
+import json
+import os
+import random
+import uuid
+from collections import Counter
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.getenv("FAKE_GRAPH_LATENCY_MS", 0))
+ERROR_RATE = float(os.getenv("FAKE_GRAPH_ERROR_RATE", 0))
+
+app = FastAPI(title="Fake Instagram Graph API")
+calls: Counter = Counter()
+
+
+def _respond(kind: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    calls[kind] += 1
+    if random.random() < ERROR_RATE:
+        calls["errors"] += 1
+        return 500, {"error": {"message": "An unexpected error has occurred", "code": 2, "is_transient": True}}
+    if kind == "replies":
+        return 200, {"id": uuid.uuid4().hex}
+    recipient = payload.get("recipient") or {}
+    if isinstance(recipient, str):
+        recipient = json.loads(recipient)
+    return 200, {
+        "recipient_id": recipient.get("id") or recipient.get("comment_id"),
+        "message_id": f"m_{uuid.uuid4().hex}"
+    }
+
+
+async def _delay() -> None:
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+
+@app.post("/{version}/{object_id}/replies")
+async def reply_to_comment(version: str, object_id: str, request: Request):
+    await _delay()
+    code, body = _respond("replies", await request.json())
+    return JSONResponse(body, status_code=code)
+
+
+@app.post("/{version}/{account_id}/messages")
+async def send_message(version: str, account_id: str, request: Request):
+    await _delay()
+    code, body = _respond("messages", await request.json())
+    return JSONResponse(body, status_code=code)
+
+
+@app.post("/{version}/")
+async def batch(version: str, request: Request):
+    """Graph API batch endpoint; one round trip for all requests"""
+    await _delay()
+    calls["batch"] += 1
+    results = []
+    for item in (await request.json()).get("batch", []):
+        kind = "replies" if item["relative_url"].endswith("/replies") else "messages"
+        body = dict(parse_qsl(item.get("body", "")))
+        code, result = _respond(kind, body)
+        results.append({"code": code, "body": json.dumps(result)})
+    return results
+
+
+@app.get("/stats")
+async def stats():
+    """Number of calls received per endpoint"""
+    return dict(calls)
+
+
+@app.post("/reset")
+async def reset():
+    """Reset the call counters"""
+    calls.clear()
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_GRAPH_PORT", 9000)))
@@ -58,10 +58,10 @@ export const rules = {
 
 // Logs endpoints
 export const logs = {
-  getComments: (skip = 0, limit = 20) =>
-    api.get('/api/logs/comments', { params: { skip, limit } }),
-  getDMs: (skip = 0, limit = 20) =>
-    api.get('/api/logs/dms', { params: { skip, limit } }),
+  getComments: (skip = 0, limit = 20, cursor) =>
+    api.get('/api/logs/comments', { params: { skip, limit, cursor } }),
+  getDMs: (skip = 0, limit = 20, cursor) =>
+    api.get('/api/logs/dms', { params: { skip, limit, cursor } }),
   getStats: () => api.get('/api/logs/stats'),
 }
 